@@ -0,0 +1,87 @@
+"""Import-time regression benchmark for the worker and CLI entry points.
+
+Each module is imported in a fresh interpreter (with the same sys.path layout
+the code uses at runtime) and checked against a wall-time budget and a list
+of heavy dependencies that must not be imported eagerly. Exits non-zero on a
+regression so it can run in CI:
+
+    python benchmarks/import_time.py [--repeat 5] [--budget-scale 1.0]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# heavy libraries and client libraries that should only load on first use
+DEFERRED = [
+    "torch", "transformers", "sentence_transformers", "sklearn", "langchain",
+    "langchain_community", "streamlit", "redis", "pymongo", "neo4j", "pandas",
+]
+
+# (module, extra sys.path entries, budget in seconds for the import itself;
+# interpreter start-up is not included)
+ENTRY_POINTS = [
+    ("cache", ["database"], 0.6),
+    ("handlers", ["database"], 0.3),
+    ("dataset.graph", [], 0.3),
+    ("dataset.pipeline", [], 0.2),
+    ("llm", ["model", "database"], 0.6),
+]
+
+_PROBE = """
+import importlib, json, sys, time
+started = time.perf_counter()
+importlib.import_module({module!r})
+elapsed = time.perf_counter() - started
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {deferred!r} if m in sys.modules]}}))
+"""
+
+
+def measure(module: str, paths: list[str], repeat: int) -> dict:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([ROOT] + [os.path.join(ROOT, path) for path in paths])
+    samples, loaded = [], []
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, "-c", _PROBE.format(module=module, deferred=DEFERRED)],
+            env=env, cwd=ROOT, capture_output=True, text=True,
+        )
+        if result.returncode != 0:
+            return {"module": module, "error": result.stderr.strip().splitlines()[-1:]}
+        probe = json.loads(result.stdout.strip().splitlines()[-1])
+        samples.append(probe["seconds"])
+        loaded = probe["loaded"]
+    return {"module": module, "seconds": statistics.median(samples), "eager_imports": loaded}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--budget-scale", type=float, default=1.0,
+                        help="multiply every budget, e.g. on slow CI machines")
+    args = parser.parse_args()
+
+    failures = 0
+    for module, paths, budget in ENTRY_POINTS:
+        report = measure(module, paths, args.repeat)
+        budget *= args.budget_scale
+        if "error" in report:
+            status = "ERROR"
+            failures += 1
+        elif report["eager_imports"] or report["seconds"] > budget:
+            status = "FAIL"
+            failures += 1
+        else:
+            status = "ok"
+        print(f"{status:5} {module:20} {report.get('seconds', float('nan')):7.3f}s "
+              f"(budget {budget:.2f}s) {report.get('eager_imports') or report.get('error') or ''}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
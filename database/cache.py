@@ -1,18 +1,23 @@
-import redis 
-import pymongo
-from pymongo import MongoClient
-import sklearn
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from __future__ import annotations
+
 import numpy as np
-import pickle
 import hashlib
-from typing import List, Dict, Optional, Tuple, Any
-from datetime import datetime, timedelta
-from dataclasses import dataclass
+import time
+from typing import TYPE_CHECKING, List, Dict, Optional, Tuple, Any
 import json
 import logging
-from sentence_transformers import SentenceTransformer
+from lexical import BM25Index, reciprocal_rank_fusion
+from embedder import load_embedder
+from embedding_codec import (decode_embeddings, encode_embedding, ensure_embedding_indexes, migrate_embeddings,
+                             with_embedding)
+from quantized import QuantizedEmbeddingStore
+from sharded import ShardedEmbeddingIndex
+from database import metrics
+from database.tracing import current_span, span, traced
+
+# redis, pymongo and the embedding model are imported on first use to keep startup cheap
+if TYPE_CHECKING:
+    from pymongo import MongoClient
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -20,16 +25,38 @@ logger = logging.getLogger(__name__)
 
 class RedisCache:
     def __init__(self , host = 'localhost' , port = 6379 , db = 0  , ttl = 3600):
-        self.client = redis.StrictRedis(host=host, port=port, db=db)
+        self._connection_kwargs = {"host": host, "port": port, "db": db}
+        self._client = None
         self.default_ttl = ttl
 
+    @property
+    def client(self):
+        """Connect on first use"""
+        if self._client is None:
+            import redis
+            self._client = redis.StrictRedis(**self._connection_kwargs)
+        return self._client
+
+    redis_client = client
+
     def _generate_key(self , prefix: str , identifier: str) -> str:
         return f"{prefix}:{hashlib.md5(identifier.encode()).hexdigest()}"
+
+    def _lookup(self, prefix: str, key: str) -> Optional[bytes]:
+        with span("redis.get", prefix=prefix) as s:
+            value = self.redis_client.get(key)
+            s.set(cache_hit=bool(value), bytes=len(value) if value else 0)
+        metrics.record_cache_lookup(prefix, bool(value))
+        return value
+
+    def _store(self, prefix: str, key: str, ttl: int, value: str) -> None:
+        with span("redis.set", prefix=prefix, bytes=len(value)):
+            self.redis_client.setex(key, ttl, value)
     
     def get_paper_analysis(self, paper_id: str) -> Optional[Dict]:
         """Get cached paper analysis results"""
         key = self._generate_key("paper_analysis", paper_id)
-        cached_data = self.redis_client.get(key)
+        cached_data = self._lookup("paper_analysis", key)
         if cached_data:
             logger.info(f"Cache hit for paper analysis: {paper_id}")
             return json.loads(cached_data)
@@ -40,7 +67,7 @@ class RedisCache:
         key = self._generate_key("paper_analysis", paper_id)
         ttl = ttl or self.default_ttl
         try:
-            self.redis_client.setex(key, ttl, json.dumps(analysis_data))
+            self._store("paper_analysis", key, ttl, json.dumps(analysis_data))
             logger.info(f"Cached paper analysis: {paper_id}")
             return True
         except Exception as e:
@@ -50,7 +77,7 @@ class RedisCache:
     def get_embedding(self, text: str) -> Optional[np.ndarray]:
         """Get cached text embedding"""
         key = self._generate_key("embedding", text[:100])  # Use first 100 chars for key
-        cached_embedding = self.redis_client.get(key)
+        cached_embedding = self._lookup("embedding", key)
         if cached_embedding:
             logger.info("Cache hit for embedding")
             return np.frombuffer(eval(cached_embedding), dtype=np.float32)
@@ -62,7 +89,7 @@ class RedisCache:
         ttl = ttl or self.default_ttl
         try:
             embedding_bytes = embedding.astype(np.float32).tobytes()
-            self.redis_client.setex(key, ttl, str(embedding_bytes))
+            self._store("embedding", key, ttl, str(embedding_bytes))
             return True
         except Exception as e:
             logger.error(f"Failed to cache embedding: {e}")
@@ -71,7 +98,7 @@ class RedisCache:
     def get_similar_papers(self, query_hash: str) -> Optional[List[Dict]]:
         """Get cached similarity search results"""
         key = self._generate_key("similar_papers", query_hash)
-        cached_results = self.redis_client.get(key)
+        cached_results = self._lookup("similar_papers", key)
         if cached_results:
             logger.info("Cache hit for similarity search")
             return json.loads(cached_results)
@@ -82,7 +109,7 @@ class RedisCache:
         key = self._generate_key("similar_papers", query_hash)
         ttl = ttl or self.default_ttl
         try:
-            self.redis_client.setex(key, ttl, json.dumps(similar_papers))
+            self._store("similar_papers", key, ttl, json.dumps(similar_papers))
             return True
         except Exception as e:
             logger.error(f"Failed to cache similar papers: {e}")
@@ -107,26 +134,38 @@ class RedisCache:
 class SimilaritySearch:
     """Semantic similarity search for retracted papers"""
     
-    def __init__(self, model_name: str = 'all-MiniLM-L6-v2', cache: RedisCache = None):
-        self.model = SentenceTransformer(model_name)
+    def __init__(self, model_name: str = 'all-MiniLM-L6-v2', cache: RedisCache = None,
+                 lexical_index: BM25Index = None, backend: str = "torch", num_threads: int = None,
+                 warmup: int = 2):
+        self.model = load_embedder(model_name, backend=backend, num_threads=num_threads, warmup=warmup)
+        self.model_name = model_name
         self.cache = cache
+        self.lexical_index = lexical_index
         
     def generate_embedding(self, text: str) -> np.ndarray:
         """Generate embedding for text with caching support"""
-        if self.cache:
-            cached_embedding = self.cache.get_embedding(text)
-            if cached_embedding is not None:
-                return cached_embedding
-        
-        # Generate new embedding
-        embedding = self.model.encode([text])[0]
-        
-        # Cache the embedding
-        if self.cache:
-            self.cache.cache_embedding(text, embedding)
-        
-        return embedding
+        with span("similarity.generate_embedding", input_chars=len(text)) as s:
+            if self.cache:
+                cached_embedding = self.cache.get_embedding(text)
+                if cached_embedding is not None:
+                    s.set(cache_hit=True)
+                    metrics.EMBEDDINGS.inc(source="cache")
+                    return cached_embedding
+            
+            # Generate new embedding
+            started = time.perf_counter()
+            embedding = self.model.encode([text])[0]
+            metrics.EMBEDDING_LATENCY.observe(time.perf_counter() - started, operation="query")
+            metrics.EMBEDDINGS.inc(source="model")
+            s.set(cache_hit=False)
+            
+            # Cache the embedding
+            if self.cache:
+                self.cache.cache_embedding(text, embedding)
+            
+            return embedding
     
+    @traced("similarity.find_similar_papers")
     def find_similar_papers(self, db: MongoClient, query_text: str, top_k: int = 10, 
                           similarity_threshold: float = 0.5) -> List[Dict]:
         """Find papers similar to the query text"""
@@ -136,58 +175,205 @@ class SimilaritySearch:
         if self.cache:
             cached_results = self.cache.get_similar_papers(query_hash)
             if cached_results:
+                current_span().set(cache_hit=True)
                 return cached_results
         
         query_embedding = self.generate_embedding(query_text)
         
-        papers_cursor = db.papers.find({"embedding": {"$exists": True}})
+        papers = list(db.papers.find(
+            with_embedding(),
+            {"_id": 0, "paper_id": 1, "title": 1, "authors": 1, "retraction_reason": 1, "DOI": 1, "embedding": 1},
+        ))
+        scores, positions = self._score_embeddings(query_embedding, (paper.pop('embedding') for paper in papers))
         
         similarities = []
-        for paper in papers_cursor:
-            if 'embedding' in paper and paper['embedding']:
-                paper_embedding = np.array(paper['embedding'])
-                similarity = cosine_similarity([query_embedding], [paper_embedding])[0][0]
-                
-                if similarity >= similarity_threshold:
-                    similarities.append({
-                        'paper_id': paper.get('paper_id'),
-                        'title': paper.get('title'),
-                        'authors': paper.get('authors'),
-                        'similarity_score': float(similarity),
-                        'retraction_reason': paper.get('retraction_reason'),
-                        'doi': paper.get('DOI')
-                    })
+        for position, similarity in zip(positions, scores):
+            if similarity >= similarity_threshold:
+                paper = papers[position]
+                similarities.append({
+                    'paper_id': paper.get('paper_id'),
+                    'title': paper.get('title'),
+                    'authors': paper.get('authors'),
+                    'similarity_score': float(similarity),
+                    'retraction_reason': paper.get('retraction_reason'),
+                    'doi': paper.get('DOI')
+                })
         
         similarities.sort(key=lambda x: x['similarity_score'], reverse=True)
         results = similarities[:top_k]
+        current_span().set(cache_hit=False, candidates=len(positions), results=len(results))
         
         if self.cache:
             self.cache.cache_similar_papers(query_hash, results)
         
         return results
     
+    @traced("similarity.find_similar_entities")
     def find_similar_entities(self, db: MongoClient, entity_text: str, top_k: int = 5) -> List[Dict]:
         """Find similar entities based on text content"""
         entity_embedding = self.generate_embedding(entity_text)
         
-        # Get entities with embeddings
-        entities_cursor = db.entities.find({"embedding": {"$exists": True}})
+        entities = list(db.entities.find(
+            with_embedding(),
+            {"_id": 0, "EntityID": 1, "TextContent": 1, "Category": 1, "Relevance_score": 1, "embedding": 1},
+        ))
+        scores, positions = self._score_embeddings(entity_embedding, (entity.pop('embedding') for entity in entities))
         
         similarities = []
-        for entity in entities_cursor:
-            if 'embedding' in entity and entity['embedding']:
-                entity_emb = np.array(entity['embedding'])
-                similarity = cosine_similarity([entity_embedding], [entity_emb])[0][0]
-                
-                similarities.append({
-                    'entity_id': entity.get('EntityID'),
-                    'text_content': entity.get('TextContent'),
-                    'category': entity.get('Category'),
-                    'similarity_score': float(similarity),
-                    'relevance_score': entity.get('Relevance_score')
-                })
+        for position, similarity in zip(positions, scores):
+            entity = entities[position]
+            similarities.append({
+                'entity_id': entity.get('EntityID'),
+                'text_content': entity.get('TextContent'),
+                'category': entity.get('Category'),
+                'similarity_score': float(similarity),
+                'relevance_score': entity.get('Relevance_score')
+            })
         
         similarities.sort(key=lambda x: x['similarity_score'], reverse=True)
+        current_span().set(candidates=len(positions))
         return similarities[:top_k]
     
-    
\ No newline at end of file
+    @staticmethod
+    def _score_embeddings(query_embedding: np.ndarray, stored) -> Tuple[np.ndarray, List[int]]:
+        """Cosine similarity of the query against stored (binary or legacy list) embeddings"""
+        matrix, positions = decode_embeddings(stored, dim=len(query_embedding))
+        if not positions:
+            return np.zeros(0, dtype=np.float32), []
+        norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query_embedding)
+        return matrix @ query_embedding / np.maximum(norms, 1e-12), positions
+
+    @traced("similarity.embed_papers")
+    def embed_papers(self, db: MongoClient, fields: Tuple[str, ...] = ("title", "abstract"),
+                     batch_size: int = 64, dtype: str = "float32") -> int:
+        """Embed papers that have no embedding yet and store them as packed binary"""
+        cursor = db.papers.find({"embedding": {"$exists": False}}, {"_id": 1, **{field: 1 for field in fields}})
+        stored = 0
+        batch = []
+        for paper in cursor:
+            batch.append(paper)
+            if len(batch) >= batch_size:
+                stored += self._store_embeddings(db, batch, fields, dtype)
+                batch = []
+        if batch:
+            stored += self._store_embeddings(db, batch, fields, dtype)
+        return stored
+
+    def _store_embeddings(self, db: MongoClient, papers: List[Dict], fields: Tuple[str, ...], dtype: str) -> int:
+        from pymongo import UpdateOne
+        texts = [" ".join(str(paper.get(field) or '') for field in fields) for paper in papers]
+        started = time.perf_counter()
+        vectors = self.model.encode(texts, batch_size=len(texts))
+        metrics.EMBEDDING_LATENCY.observe(time.perf_counter() - started, operation="batch")
+        metrics.EMBEDDINGS.inc(len(texts), source="model")
+        result = db.papers.bulk_write([
+            UpdateOne({"_id": paper["_id"]},
+                              {"$set": {"embedding": encode_embedding(vector, model=self.model_name, dtype=dtype)}})
+            for paper, vector in zip(papers, vectors)
+        ], ordered=False)
+        return result.modified_count
+
+    def migrate_embeddings(self, db: MongoClient, dtype: str = "float32") -> int:
+        """Convert stored float-list embeddings to packed binary and create the lookup indexes"""
+        ensure_embedding_indexes(db)
+        return sum(migrate_embeddings(collection, model=self.model_name, dtype=dtype)
+                   for collection in (db.papers, db.entities))
+
+    def _load_embeddings(self, db: MongoClient, kind: str) -> Tuple[List[str], np.ndarray]:
+        collection, id_field = (db.papers, 'paper_id') if kind == "paper" else (db.entities, 'EntityID')
+        # store entries are keyed by id, so documents without one cannot be used here
+        query = {**with_embedding(), id_field: {"$exists": True}}
+        docs = list(collection.find(query, {"_id": 0, id_field: 1, "embedding": 1}))
+        matrix, positions = decode_embeddings(doc.pop('embedding') for doc in docs)
+        return [str(docs[position].get(id_field)) for position in positions], matrix
+
+    def build_quantized_store(self, db: MongoClient, path: str, kind: str = "paper",
+                              method: str = "int8", **kwargs) -> QuantizedEmbeddingStore:
+        """Snapshot stored paper or entity embeddings into a compressed store for first-pass scoring"""
+        ids, matrix = self._load_embeddings(db, kind)
+        logger.info(f"Quantizing {len(ids)} {kind} embeddings with {method}")
+        return QuantizedEmbeddingStore.build(path, ids, matrix, method=method, **kwargs)
+
+    def build_sharded_index(self, db: MongoClient, path: str, kind: str = "paper",
+                            num_shards: int = 4) -> ShardedEmbeddingIndex:
+        """Snapshot stored embeddings into shard files for a ShardedSearchService"""
+        ids, matrix = self._load_embeddings(db, kind)
+        logger.info(f"Sharding {len(ids)} {kind} embeddings into {num_shards} shards")
+        return ShardedEmbeddingIndex.build(path, ids, matrix, num_shards=num_shards)
+
+    def build_lexical_index(self, db: MongoClient, path: str = None) -> BM25Index:
+        """Add papers (title, abstract, DOI, authors) and entity texts to the BM25 index"""
+        if self.lexical_index is None:
+            self.lexical_index = BM25Index()
+
+        papers = db.papers.find({}, {"paper_id": 1, "title": 1, "abstract": 1, "DOI": 1, "authors": 1})
+        added = self.lexical_index.add_documents(
+            (f"paper:{paper.get('paper_id')}", " ".join([
+                str(paper.get('title') or ''),
+                str(paper.get('abstract') or ''),
+                str(paper.get('DOI') or ''),
+                json.dumps(paper.get('authors') or [], default=str),
+            ]))
+            for paper in papers if paper.get('paper_id')
+        )
+        entities = db.entities.find({}, {"EntityID": 1, "TextContent": 1})
+        added += self.lexical_index.add_documents(
+            (f"entity:{entity.get('EntityID')}", str(entity.get('TextContent') or ''))
+            for entity in entities if entity.get('EntityID')
+        )
+        logger.info(f"Added {added} documents to the lexical index")
+
+        if path:
+            self.lexical_index.save(path)
+        return self.lexical_index
+
+    @traced("similarity.lexical_search")
+    def lexical_search(self, query_text: str, top_k: int = 10, kind: str = "paper") -> List[Tuple[str, float]]:
+        """BM25 search returning (id, score) pairs for papers or entities"""
+        if self.lexical_index is None:
+            raise ValueError("No lexical index. Call build_lexical_index() first.")
+        prefix = f"{kind}:"
+        hits = self.lexical_index.search(query_text, top_k=top_k, prefix=prefix)
+        return [(doc_id[len(prefix):], score) for doc_id, score in hits]
+
+    @traced("similarity.hybrid_search_papers")
+    def hybrid_search_papers(self, db: MongoClient, query_text: str, top_k: int = 10,
+                             candidates: int = 50, rrf_k: int = 60) -> List[Dict]:
+        """Fuse BM25 and embedding rankings of papers with reciprocal rank fusion"""
+        # the lexical index keys papers as strings, so fuse on str(paper_id)
+        lexical = [paper_id for paper_id, _ in self.lexical_search(query_text, top_k=candidates)]
+        vector_results = self.find_similar_papers(db, query_text, top_k=candidates, similarity_threshold=-1.0)
+        vector = [str(result['paper_id']) for result in vector_results]
+
+        fused = reciprocal_rank_fusion([lexical, vector], k=rrf_k)[:top_k]
+        by_id = {str(result['paper_id']): result for result in vector_results}
+        missing = [paper_id for paper_id, _ in fused if paper_id not in by_id]
+        if missing:
+            lookup = [native for paper_id in missing for native in _paper_id_variants(paper_id)]
+            for paper in db.papers.find({"paper_id": {"$in": lookup}},
+                                        {"paper_id": 1, "title": 1, "authors": 1, "retraction_reason": 1, "DOI": 1}):
+                by_id[str(paper['paper_id'])] = {
+                    'paper_id': paper.get('paper_id'),
+                    'title': paper.get('title'),
+                    'authors': paper.get('authors'),
+                    'similarity_score': None,
+                    'retraction_reason': paper.get('retraction_reason'),
+                    'doi': paper.get('DOI')
+                }
+
+        results = []
+        for paper_id, score in fused:
+            if paper_id in by_id:
+                results.append({**by_id[paper_id], 'fused_score': score})
+        return results
+
+
+def _paper_id_variants(paper_id: str) -> List[Any]:
+    """Stored types a stringified paper_id may have come from (str, int or ObjectId)"""
+    from bson import ObjectId
+    variants: List[Any] = [paper_id]
+    if paper_id.lstrip('-').isdigit():
+        variants.append(int(paper_id))
+    if ObjectId.is_valid(paper_id):
+        variants.append(ObjectId(paper_id))
+    return variants
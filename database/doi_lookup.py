@@ -0,0 +1,141 @@
+"""In-memory "is this DOI retracted, and why?" lookup tier.
+
+A Bloom filter answers the common negative case without touching the main
+table; positives are confirmed against a sorted array of 64-bit DOI
+fingerprints with a parallel array of reason codes. Both are rebuilt in bulk
+from `db.papers` and snapshotted to a single `.npz` for fast startup.
+"""
+
+import hashlib
+import math
+import re
+from collections.abc import Iterable
+from urllib.parse import unquote
+
+import numpy as np
+
+from reasons import UNKNOWN_REASON, reason_code
+
+_DOI_PREFIXES = re.compile(r"^(?:https?://(?:dx\.)?doi\.org/|doi:\s*|info:doi/)", re.IGNORECASE)
+_DOI_RE = re.compile(r"^10\.\d{4,9}/\S+$")
+
+
+def normalize_doi(raw: str | None) -> str | None:
+    """Canonical lower-case DOI without resolver prefixes, or None if not a DOI."""
+    if not raw:
+        return None
+    doi = unquote(str(raw).strip())
+    doi = _DOI_PREFIXES.sub("", doi).strip().rstrip(".,;)]}>\"'").lower()
+    return doi if _DOI_RE.match(doi) else None
+
+
+def _snapshot_path(path: str) -> str:
+    # np.savez appends .npz, so save and load agree on the name either way
+    return path if path.endswith(".npz") else f"{path}.npz"
+
+
+def _hash_pairs(dois: list[str]) -> np.ndarray:
+    """Two independent 64-bit hashes per DOI, shape (n, 2)."""
+    digest = b"".join(hashlib.blake2b(doi.encode(), digest_size=16).digest() for doi in dois)
+    return np.frombuffer(digest, dtype=np.uint64).reshape(-1, 2)
+
+
+class DOILookup:
+    """Bloom filter plus sorted fingerprint table of retracted DOIs."""
+
+    def __init__(self, bloom_bits: np.ndarray, num_hashes: int, fingerprints: np.ndarray, reasons: np.ndarray):
+        self.bloom_bits = bloom_bits
+        self.num_hashes = num_hashes
+        self.fingerprints = fingerprints
+        self.reasons = reasons
+
+    def __len__(self) -> int:
+        return len(self.fingerprints)
+
+    @classmethod
+    def build(cls, records: Iterable[tuple[str, int | str | None]], false_positive_rate: float = 0.001) -> "DOILookup":
+        """Build from (doi, reason) pairs; invalid DOIs are dropped, last reason wins."""
+        table: dict[str, int] = {}
+        for raw, reason in records:
+            doi = normalize_doi(raw)
+            if doi:
+                table[doi] = reason_code(reason)
+        dois = list(table)
+        n = max(len(dois), 1)
+        num_bits = max(64, int(-n * math.log(false_positive_rate) / math.log(2) ** 2))
+        num_bits = (num_bits + 7) // 8 * 8
+        num_hashes = max(1, round(num_bits / n * math.log(2)))
+
+        hashes = _hash_pairs(dois) if dois else np.zeros((0, 2), dtype=np.uint64)
+        bits = np.zeros(num_bits, dtype=bool)
+        if len(hashes):
+            bits[cls._bit_positions(hashes, num_hashes, num_bits).ravel()] = True
+
+        fingerprints = hashes[:, 0].copy()
+        order = np.argsort(fingerprints)
+        reasons = np.fromiter((table[doi] for doi in dois), dtype=np.uint8, count=len(dois))
+        return cls(np.packbits(bits), num_hashes, fingerprints[order], reasons[order])
+
+    @classmethod
+    def from_mongo(cls, db, false_positive_rate: float = 0.001) -> "DOILookup":
+        papers = db.papers.find({"DOI": {"$exists": True}}, {"_id": 0, "DOI": 1, "retraction_reason": 1})
+        return cls.build(
+            ((paper.get("DOI"), paper.get("retraction_reason")) for paper in papers),
+            false_positive_rate=false_positive_rate,
+        )
+
+    @staticmethod
+    def _bit_positions(hashes: np.ndarray, num_hashes: int, num_bits: int) -> np.ndarray:
+        # Kirsch-Mitzenmacher double hashing: h1 + i * h2
+        steps = np.arange(num_hashes, dtype=np.uint64)
+        return (hashes[:, :1] + steps * hashes[:, 1:2]) % np.uint64(num_bits)
+
+    def lookup_many(self, dois: Iterable[str]) -> list[int | None]:
+        """Reason code for each retracted DOI (0 if unknown), None if not retracted."""
+        normalized = [normalize_doi(doi) for doi in dois]
+        results: list[int | None] = [None] * len(normalized)
+        valid = [i for i, doi in enumerate(normalized) if doi]
+        if not valid or len(self.fingerprints) == 0:
+            return results
+        hashes = _hash_pairs([normalized[i] for i in valid])
+        num_bits = len(self.bloom_bits) * 8
+        positions = self._bit_positions(hashes, self.num_hashes, num_bits)
+        bytes_, offsets = positions // np.uint64(8), positions % np.uint64(8)
+        # packbits stores the first bit in the most significant position
+        present = ((self.bloom_bits[bytes_] >> (np.uint8(7) - offsets.astype(np.uint8))) & 1).all(axis=1)
+        candidates = np.flatnonzero(present)
+        if len(candidates) == 0:
+            return results
+        fingerprints = hashes[candidates, 0]
+        slots = np.searchsorted(self.fingerprints, fingerprints)
+        slots = np.minimum(slots, len(self.fingerprints) - 1)
+        found = self.fingerprints[slots] == fingerprints
+        for candidate, slot, hit in zip(candidates, slots, found):
+            if hit:
+                results[valid[candidate]] = int(self.reasons[slot])
+        return results
+
+    def lookup(self, doi: str) -> int | None:
+        return self.lookup_many([doi])[0]
+
+    def is_retracted(self, doi: str) -> bool:
+        return self.lookup(doi) is not None
+
+    def save(self, path: str) -> None:
+        np.savez(
+            _snapshot_path(path),
+            bloom_bits=self.bloom_bits,
+            num_hashes=np.array(self.num_hashes),
+            fingerprints=self.fingerprints,
+            reasons=self.reasons,
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "DOILookup":
+        with np.load(_snapshot_path(path)) as arrays:
+            return cls(
+                arrays["bloom_bits"],
+                int(arrays["num_hashes"]),
+                arrays["fingerprints"],
+                arrays["reasons"],
+            )
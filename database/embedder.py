@@ -0,0 +1,158 @@
+"""CPU-optimised loading of the SentenceTransformer embedder.
+
+Backends:
+    torch       fp32 PyTorch (reference)
+    torch-int8  PyTorch with dynamic int8 quantisation of the Linear layers
+    onnx        ONNX Runtime
+    onnx-int8   ONNX Runtime with a dynamically quantised int8 model file
+"""
+
+import logging
+import platform
+import time
+from collections.abc import Sequence
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("torch", "torch-int8", "onnx", "onnx-int8")
+
+# pre-exported quantised files shipped in the sentence-transformers model repos,
+# best first; each needs the CPU features listed with it
+ONNX_INT8_FILES = (
+    ("onnx/model_qint8_avx512_vnni.onnx", {"avx512_vnni"}),
+    ("onnx/model_qint8_avx512.onnx", {"avx512f", "avx512bw"}),
+    ("onnx/model_quint8_avx2.onnx", {"avx2"}),
+)
+ONNX_INT8_ARM64_FILE = "onnx/model_qint8_arm64.onnx"
+# uint8 weights do not saturate without VNNI, so this file is safe on any x86 CPU
+PORTABLE_ONNX_INT8_FILE = "onnx/model_quint8_avx2.onnx"
+
+
+def _cpu_flags() -> set[str]:
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("flags"):
+                    return set(line.split(":", 1)[1].split())
+    except OSError:
+        pass
+    return set()
+
+
+def default_onnx_int8_file(flags: set[str] | None = None) -> str:
+    """The quantised ONNX file that matches this CPU."""
+    if platform.machine().lower() in ("arm64", "aarch64"):
+        return ONNX_INT8_ARM64_FILE
+    flags = _cpu_flags() if flags is None else flags
+    for file_name, required in ONNX_INT8_FILES:
+        if required <= flags:
+            return file_name
+    return PORTABLE_ONNX_INT8_FILE
+
+
+def _onnx_model_kwargs(num_threads: int | None, file_name: str | None = None) -> dict[str, Any]:
+    model_kwargs: dict[str, Any] = {"provider": "CPUExecutionProvider"}
+    if file_name:
+        model_kwargs["file_name"] = file_name
+    if num_threads:
+        import onnxruntime
+
+        session_options = onnxruntime.SessionOptions()
+        session_options.intra_op_num_threads = num_threads
+        session_options.inter_op_num_threads = 1
+        model_kwargs["session_options"] = session_options
+    return model_kwargs
+
+
+def load_embedder(
+    model_name: str = "all-MiniLM-L6-v2",
+    backend: str = "torch",
+    num_threads: int | None = None,
+    warmup: int = 2,
+    onnx_file: str | None = None,
+) -> "SentenceTransformer":
+    """Load the embedder on CPU with the given backend, thread count and warm-up passes.
+
+    For onnx-int8 the quantised file is picked from the CPU features unless
+    `onnx_file` is given.
+    """
+    # importing sentence_transformers pulls in torch; only pay for it when a model is loaded
+    from sentence_transformers import SentenceTransformer
+
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend {backend!r}, expected one of {BACKENDS}")
+    if num_threads:
+        import torch
+
+        # tokenisation and pooling still run in torch for the ONNX backends
+        torch.set_num_threads(num_threads)
+
+    started = time.perf_counter()
+    if backend == "torch":
+        model = SentenceTransformer(model_name, device="cpu")
+    elif backend == "torch-int8":
+        import torch
+
+        model = SentenceTransformer(model_name, device="cpu")
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    elif backend == "onnx":
+        model = SentenceTransformer(model_name, device="cpu", backend="onnx",
+                                    model_kwargs=_onnx_model_kwargs(num_threads))
+    else:
+        onnx_file = onnx_file or default_onnx_int8_file()
+        logger.info(f"Using quantised ONNX file {onnx_file}")
+        model = SentenceTransformer(model_name, device="cpu", backend="onnx",
+                                    model_kwargs=_onnx_model_kwargs(num_threads, onnx_file))
+
+    # the first calls pay for lazy allocations and kernel selection
+    for _ in range(warmup):
+        model.encode(["warm-up sentence for the embedding model"] * 8)
+    logger.info(f"Loaded {model_name} with {backend} backend in {time.perf_counter() - started:.2f}s")
+    return model
+
+
+def benchmark_backends(
+    texts: Sequence[str],
+    model_name: str = "all-MiniLM-L6-v2",
+    backends: Sequence[str] = BACKENDS,
+    num_threads: int | None = None,
+    batch_size: int = 32,
+) -> list[dict[str, Any]]:
+    """Embeddings/s per backend and cosine agreement with the fp32 torch model.
+
+    The torch reference must load; other backends that fail are skipped.
+    """
+    texts = list(texts)
+    reference = None
+    results = []
+    for backend in ("torch", *[b for b in backends if b != "torch"]):
+        try:
+            model = load_embedder(model_name, backend=backend, num_threads=num_threads)
+        except Exception as e:
+            if backend == "torch":
+                raise RuntimeError("The fp32 torch reference failed to load, cannot compare backends") from e
+            logger.warning(f"Skipping {backend} backend: {e}")
+            continue
+        started = time.perf_counter()
+        embeddings = model.encode(texts, batch_size=batch_size, normalize_embeddings=True)
+        elapsed = time.perf_counter() - started
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if backend == "torch":
+            reference = embeddings
+        agreement = (embeddings * reference).sum(axis=1)
+        if backend in backends:
+            results.append({
+                "backend": backend,
+                "embeddings_per_second": len(texts) / elapsed if elapsed else float("inf"),
+                "mean_cosine": float(agreement.mean()),
+                "min_cosine": float(agreement.min()),
+            })
+            logger.info(f"{backend}: {results[-1]['embeddings_per_second']:.1f} embeddings/s, "
+                        f"cosine vs fp32 mean {agreement.mean():.4f} min {agreement.min():.4f}")
+    return results
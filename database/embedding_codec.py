@@ -0,0 +1,128 @@
+"""Compact BSON encoding of embedding vectors.
+
+Embeddings are stored as a single BSON binary (user-defined subtype) holding a
+small header (magic, dtype, dimension, model name) followed by the packed
+little-endian float32 or float16 values, instead of a BSON array of doubles.
+"""
+
+import logging
+import struct
+from collections.abc import Iterable
+
+import numpy as np
+from bson.binary import Binary, USER_DEFINED_SUBTYPE
+
+logger = logging.getLogger(__name__)
+
+_MAGIC = b"EMB1"
+# magic, dtype code, dimension, model name length
+_HEADER = struct.Struct("<4sBIH")
+_DTYPES = {0: np.dtype("<f4"), 1: np.dtype("<f2")}
+_DTYPE_CODES = {"float32": 0, "float16": 1}
+
+
+def encode_embedding(vector, model: str = "", dtype: str = "float32") -> Binary:
+    """Pack a vector as BSON binary with a dim/model header."""
+    code = _DTYPE_CODES[dtype]
+    values = np.asarray(vector, dtype=_DTYPES[code]).ravel()
+    model_bytes = model.encode()
+    header = _HEADER.pack(_MAGIC, code, len(values), len(model_bytes))
+    return Binary(header + model_bytes + values.tobytes(), USER_DEFINED_SUBTYPE)
+
+
+def embedding_header(value: bytes) -> tuple[np.dtype, int, str, int]:
+    """Return (dtype, dimension, model, data offset) of an encoded embedding."""
+    magic, code, dim, model_length = _HEADER.unpack_from(value)
+    if magic != _MAGIC:
+        raise ValueError("Not an encoded embedding")
+    offset = _HEADER.size + model_length
+    return _DTYPES[code], dim, bytes(value[_HEADER.size:offset]).decode(), offset
+
+
+def decode_embedding(value) -> np.ndarray | None:
+    """Decode a stored embedding as float32; legacy float lists are accepted too."""
+    if value is None:
+        return None
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        dtype, dim, _, offset = embedding_header(value)
+        return np.frombuffer(value, dtype=dtype, count=dim, offset=offset).astype(np.float32)
+    return np.asarray(value, dtype=np.float32)
+
+
+def normalize_embeddings(vectors) -> np.ndarray:
+    """L2-normalise float32 vectors along the last axis; zero vectors stay zero."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def decode_embeddings(values: Iterable, dim: int | None = None) -> tuple[np.ndarray, list[int]]:
+    """Stack embeddings into an (n, dim) float32 matrix.
+
+    Returns the matrix and the positions of the values that were used. Empty
+    values and vectors of another dimension are skipped; pass the query's
+    `dim` when scoring, otherwise the first vector decides it.
+    """
+    vectors, positions = [], []
+    for position, value in enumerate(values):
+        vector = decode_embedding(value)
+        if vector is None or vector.size == 0:
+            continue
+        if dim is None:
+            dim = vector.size
+        elif vector.size != dim:
+            continue
+        vectors.append(vector)
+        positions.append(position)
+    if not vectors:
+        return np.zeros((0, dim or 0), dtype=np.float32), []
+    return np.vstack(vectors), positions
+
+
+def migrate_embeddings(collection, model: str = "", dtype: str = "float32", batch_size: int = 1000) -> int:
+    """Rewrite float-list embeddings of a collection as packed binary, returning the count."""
+    from pymongo import UpdateOne
+
+    cursor = collection.find({"embedding": {"$type": "array"}}, {"embedding": 1}, batch_size=batch_size)
+    migrated = 0
+    batch = []
+    for doc in cursor:
+        batch.append(UpdateOne(
+            {"_id": doc["_id"], "embedding": {"$type": "array"}},
+            {"$set": {"embedding": encode_embedding(doc["embedding"], model=model, dtype=dtype)}},
+        ))
+        if len(batch) >= batch_size:
+            migrated += collection.bulk_write(batch, ordered=False).modified_count
+            batch = []
+    if batch:
+        migrated += collection.bulk_write(batch, ordered=False).modified_count
+    logger.info(f"Migrated {migrated} embeddings in {collection.name} to {dtype} binary")
+    return migrated
+
+
+def with_embedding() -> dict:
+    """Filter for documents that have an embedding, whatever other fields they have."""
+    return {"embedding": {"$exists": True}}
+
+
+# partial indexes created by earlier versions; they duplicated the full index on the same key
+_SUPERSEDED_INDEXES = {"papers": ["paper_id_with_embedding"], "entities": ["EntityID_with_embedding"]}
+
+
+def ensure_embedding_indexes(db) -> None:
+    """Create one index per lookup key: `paper_id` and `DOI` on papers, `EntityID` on entities.
+
+    Embedding scans read every document that has an embedding, so they are
+    served by a collection scan with a projection rather than an index.
+    """
+    from pymongo import ASCENDING
+
+    db.papers.create_index([("paper_id", ASCENDING)], name="paper_id")
+    db.papers.create_index([("DOI", ASCENDING)], name="DOI")
+    db.entities.create_index([("EntityID", ASCENDING)], name="EntityID")
+    for collection_name, names in _SUPERSEDED_INDEXES.items():
+        collection = db[collection_name]
+        existing = collection.index_information()
+        for name in names:
+            if name in existing:
+                collection.drop_index(name)
@@ -1,86 +1,426 @@
-import sqlite3
-import os
+"""A module containing the SQLite 'PipelineStorage' implementation."""
+
+import asyncio
+import pickle
+import queue
 import re
+import sqlite3
+import threading
+import uuid
+from collections.abc import Callable, Iterable, Iterator, Mapping
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import closing
 from datetime import datetime
-from typing import Any, Iterator
-from store import PipelineStorage  
+from typing import Any, TypeVar
 
-class SQLStore(PipelineStorage):
-    def __init__(self, db_path: str):
+from store import PipelineStorage
+
+T = TypeVar("T")
+
+_STOP = object()
+
+# Keep well below SQLITE_MAX_VARIABLE_NUMBER on older builds.
+_MAX_SQL_VARIABLES = 500
+
+_REGEX_SPECIAL = set(".^$*+?{}[]\\|()")
+
+_MAX_CODEPOINT = chr(0x10FFFF)
+
+
+class _SQLiteBackend:
+    """Connections shared by a root `SQLStore` and all of its child namespaces.
+
+    Writes are queued to a single writer thread, which commits everything
+    pending in one transaction (each write runs in its own savepoint so one
+    failure does not roll back its neighbours). Reads borrow a pooled
+    connection and, thanks to WAL, never wait on the writer.
+
+    ``:memory:`` is opened as a named shared-cache database so every
+    connection sees the same tables. There is no WAL in memory, so readers
+    run uncommitted to avoid table locks and may see a batch before it commits.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        read_pool_size: int,
+        max_batch: int,
+        busy_timeout_ms: int,
+        find_batch_size: int,
+    ):
         self.db_path = db_path
-        self.conn = sqlite3.connect(self.db_path)
+        self.max_batch = max_batch
+        self.busy_timeout_ms = busy_timeout_ms
+        self.find_batch_size = find_batch_size
+        self.closed = False
+        self._in_memory = db_path in ("", ":memory:")
+        if self._in_memory:
+            self._uri = f"file:sqlstore-{uuid.uuid4().hex}?mode=memory&cache=shared"
+
+        self._writer_conn = self._connect()
+        self._writer_conn.execute("PRAGMA journal_mode=WAL")
         self._ensure_table()
 
+        self._readers: queue.Queue[sqlite3.Connection] = queue.Queue()
+        for _ in range(read_pool_size):
+            reader = self._connect()
+            if self._in_memory:
+                reader.execute("PRAGMA read_uncommitted=true")
+            self._readers.put(reader)
+        self._executor = ThreadPoolExecutor(
+            max_workers=read_pool_size, thread_name_prefix="sqlstore-read"
+        )
+
+        self._write_queue: queue.Queue[Any] = queue.Queue()
+        self._writer = threading.Thread(
+            target=self._writer_loop, name="sqlstore-writer", daemon=True
+        )
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        # autocommit mode: transactions are opened explicitly by the writer
+        if self._in_memory:
+            conn = sqlite3.connect(self._uri, uri=True, isolation_level=None, check_same_thread=False)
+        else:
+            conn = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False)
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
     def _ensure_table(self):
-        cursor = self.conn.cursor()
-        cursor.execute("""
+        self._writer_conn.execute("""
         CREATE TABLE IF NOT EXISTS storage (
             id TEXT PRIMARY KEY,
             value TEXT,
-            created_at TEXT
+            created_at TEXT,
+            blob BLOB
         )
         """)
-        self.conn.commit()
+        columns = {row[1] for row in self._writer_conn.execute("PRAGMA table_info(storage)")}
+        if "blob" not in columns:
+            self._writer_conn.execute("ALTER TABLE storage ADD COLUMN blob BLOB")
+
+    def _writer_loop(self) -> None:
+        stop = False
+        while not stop:
+            job = self._write_queue.get()
+            if job is _STOP:
+                break
+            jobs = [job]
+            while len(jobs) < self.max_batch:
+                try:
+                    job = self._write_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if job is _STOP:
+                    stop = True
+                    break
+                jobs.append(job)
+            self._run_write_batch(jobs)
+        self._writer_conn.close()
+
+    def _run_write_batch(self, jobs: list[tuple[Callable[[sqlite3.Connection], Any], Future]]) -> None:
+        conn = self._writer_conn
+        outcomes = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for fn, future in jobs:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                conn.execute("SAVEPOINT job")
+                try:
+                    outcomes.append((future, fn(conn), None))
+                except Exception as e:
+                    conn.execute("ROLLBACK TO job")
+                    outcomes.append((future, None, e))
+                conn.execute("RELEASE job")
+            conn.execute("COMMIT")
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            for _, future in jobs:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for future, result, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def submit_write(self, fn: Callable[[sqlite3.Connection], T]) -> "Future[T]":
+        if self.closed:
+            raise RuntimeError("SQLStore is closed")
+        future: Future[T] = Future()
+        self._write_queue.put((fn, future))
+        return future
+
+    def write(self, fn: Callable[[sqlite3.Connection], T]) -> T:
+        return self.submit_write(fn).result()
+
+    async def awrite(self, fn: Callable[[sqlite3.Connection], T]) -> T:
+        return await asyncio.wrap_future(self.submit_write(fn))
+
+    def read(self, fn: Callable[[sqlite3.Connection], T]) -> T:
+        if self.closed:
+            raise RuntimeError("SQLStore is closed")
+        conn = self._readers.get()
+        try:
+            return fn(conn)
+        finally:
+            self._readers.put(conn)
+
+    async def aread(self, fn: Callable[[sqlite3.Connection], T]) -> T:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.read, fn)
+
+    def iter_keys(self, prefix: str = "") -> Iterator[str]:
+        """Stream keys starting with `prefix` in index order."""
+        if self.closed:
+            raise RuntimeError("SQLStore is closed")
+        conn = self._readers.get()
+        cursor = None
+        try:
+            sql, params = _prefix_range("SELECT id FROM storage", prefix)
+            cursor = conn.execute(sql + " ORDER BY id", params)
+            while rows := cursor.fetchmany(self.find_batch_size):
+                for (key,) in rows:
+                    yield key
+        finally:
+            if cursor is not None:
+                cursor.close()
+            self._readers.put(conn)
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        self._write_queue.put(_STOP)
+        self._writer.join()
+        self._executor.shutdown(wait=True)
+        while not self._readers.empty():
+            self._readers.get_nowait().close()
+
+
+class SQLStore(PipelineStorage):
+    """SQLite storage with WAL journaling, a read connection pool and a single writer thread.
+
+    `child(name)` returns a namespace over the same database whose keys are
+    stored under a ``name/`` prefix, so clearing a namespace is one range
+    delete on the primary key. Binary values (``bytes``, pickled objects via
+    `set_object`) go to a BLOB column without any text encoding. The async
+    methods run on worker threads so they do not block the event loop.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        read_pool_size: int = 4,
+        max_batch: int = 1000,
+        busy_timeout_ms: int = 5000,
+        find_batch_size: int = 1000,
+    ):
+        self.db_path = db_path
+        self.prefix = ""
+        self._backend = _SQLiteBackend(
+            db_path, read_pool_size, max_batch, busy_timeout_ms, find_batch_size
+        )
+
+    def _key(self, key: str) -> str:
+        return self.prefix + key
 
     def find(self, file_pattern: re.Pattern[str], base_dir: str = None, file_filter: dict[str, Any] = None, max_count=-1) -> Iterator[tuple[str, dict[str, Any]]]:
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT id, value FROM storage")
+        """Find keys in this namespace matching the pattern.
+
+        Keys are matched relative to the namespace. An anchored literal prefix
+        of the pattern (e.g. ``^chunks/2024``) is pushed down to a range query
+        on the ``id`` primary key, and rows are streamed from the cursor so
+        the table is never materialized.
+        """
         count = 0
-        for row in cursor.fetchall():
-            match = file_pattern.search(row)
-            if match:
-                if file_filter is None or all(str(match.groupdict().get(k, "")) == v for k,v in (file_filter or {}).items()):
-                    yield (row, match.groupdict())
-                    count += 1
-                    if max_count > 0 and count >= max_count:
-                        break
+        offset = len(self.prefix)
+        scan_prefix = self.prefix + _literal_prefix(file_pattern)
+        with closing(self._backend.iter_keys(scan_prefix)) as keys:
+            for full_key in keys:
+                key = full_key[offset:]
+                match = file_pattern.search(key)
+                if match:
+                    if file_filter is None or all(str(match.groupdict().get(k, "")) == v for k,v in (file_filter or {}).items()):
+                        yield (key, match.groupdict())
+                        count += 1
+                        if max_count > 0 and count >= max_count:
+                            break
 
     async def get(self, key: str, as_bytes: bool = None, encoding: str = None) -> Any:
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT value FROM storage WHERE id = ?", (key,))
-        row = cursor.fetchone()
+        row = await self._backend.aread(
+            lambda conn: conn.execute(
+                "SELECT value, blob FROM storage WHERE id = ?", (self._key(key),)
+            ).fetchone()
+        )
         if row:
-            return row.encode(encoding or "utf-8") if as_bytes else row
+            return _decode_row(row[0], row[1], as_bytes, encoding)
         return None
 
+    async def get_many(self, keys: Iterable[str], as_bytes: bool = None, encoding: str = None) -> dict[str, Any]:
+        """Get the values for many keys in one round trip. Missing keys are omitted."""
+        full_keys = [self._key(key) for key in keys]
+
+        def _get_many(conn: sqlite3.Connection) -> list[tuple[str, str | None, bytes | None]]:
+            rows = []
+            for i in range(0, len(full_keys), _MAX_SQL_VARIABLES):
+                chunk = full_keys[i:i + _MAX_SQL_VARIABLES]
+                placeholders = ",".join("?" * len(chunk))
+                rows.extend(conn.execute(
+                    f"SELECT id, value, blob FROM storage WHERE id IN ({placeholders})", chunk
+                ))
+            return rows
+
+        offset = len(self.prefix)
+        rows = await self._backend.aread(_get_many)
+        return {
+            key[offset:]: _decode_row(value, blob, as_bytes, encoding)
+            for key, value, blob in rows
+        }
+
     async def set(self, key: str, value: Any, encoding: str = None) -> None:
-        cursor = self.conn.cursor()
+        row = _encode_row(self._key(key), value, encoding, datetime.now().isoformat())
+        await self._backend.awrite(lambda conn: conn.execute(_UPSERT_SQL, row))
+
+    async def set_many(self, items: Mapping[str, Any] | Iterable[tuple[str, Any]], encoding: str = None) -> None:
+        """Set many key/value pairs in a single transaction."""
         now = datetime.now().isoformat()
-        if isinstance(value, bytes):
-            value = value.decode(encoding or "utf-8")
-        cursor.execute("INSERT OR REPLACE INTO storage (id, value, created_at) VALUES (?, ?, ?)", (key, value, now))
-        self.conn.commit()
+        pairs = items.items() if isinstance(items, Mapping) else items
+        rows = [_encode_row(self._key(key), value, encoding, now) for key, value in pairs]
+        await self._backend.awrite(lambda conn: conn.executemany(_UPSERT_SQL, rows))
+
+    async def set_object(self, key: str, value: Any) -> None:
+        """Pickle an arbitrary object (e.g. a NumPy array) into the BLOB column."""
+        await self.set(key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+
+    async def get_object(self, key: str) -> Any:
+        """Load an object stored with `set_object`."""
+        payload = await self.get(key, as_bytes=True)
+        return pickle.loads(payload) if payload is not None else None
 
     async def has(self, key: str) -> bool:
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT 1 FROM storage WHERE id = ?", (key,))
-        return bool(cursor.fetchone())
+        row = await self._backend.aread(
+            lambda conn: conn.execute("SELECT 1 FROM storage WHERE id = ?", (self._key(key),)).fetchone()
+        )
+        return bool(row)
 
     async def delete(self, key: str) -> None:
-        cursor = self.conn.cursor()
-        cursor.execute("DELETE FROM storage WHERE id = ?", (key,))
-        self.conn.commit()
+        await self._backend.awrite(
+            lambda conn: conn.execute("DELETE FROM storage WHERE id = ?", (self._key(key),))
+        )
 
     async def clear(self) -> None:
-        cursor = self.conn.cursor()
-        cursor.execute("DELETE FROM storage")
-        self.conn.commit()
+        """Clear this namespace (the whole table for the root store)."""
+        sql, params = _prefix_range("DELETE FROM storage", self.prefix)
+        await self._backend.awrite(lambda conn: conn.execute(sql, params))
 
     def keys(self) -> list[str]:
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT id FROM storage")
-        return [row for row in cursor.fetchall()]
-        
+        offset = len(self.prefix)
+        with closing(self._backend.iter_keys(self.prefix)) as keys:
+            return [key[offset:] for key in keys]
+
     def child(self, name: str = None) -> 'SQLStore':
-        # For SQLite, you could use a prefixed table or schema, or just return self
-        return self
+        """Create a namespace whose keys live under ``name/`` in the same database."""
+        if not name:
+            return self
+        child = object.__new__(SQLStore)
+        child.db_path = self.db_path
+        child.prefix = f"{self.prefix}{name.strip('/')}/"
+        child._backend = self._backend
+        return child
 
     async def get_creation_date(self, key: str) -> str:
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT created_at FROM storage WHERE id = ?", (key,))
-        row = cursor.fetchone()
+        row = await self._backend.aread(
+            lambda conn: conn.execute(
+                "SELECT created_at FROM storage WHERE id = ?", (self._key(key),)
+            ).fetchone()
+        )
         if row:
-            return row
+            return row[0]
+        return ""
+
+    def close(self) -> None:
+        """Flush pending writes, stop the writer thread and close all connections.
+
+        Closing any namespace closes the shared database for all of them.
+        """
+        self._backend.close()
+
+
+_UPSERT_SQL = "INSERT OR REPLACE INTO storage (id, value, blob, created_at) VALUES (?, ?, ?, ?)"
+
+
+def _encode_row(key: str, value: Any, encoding: str | None, created_at: str) -> tuple:
+    """Route binary payloads to the BLOB column and everything else to TEXT."""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        if encoding:
+            return (key, bytes(value).decode(encoding), None, created_at)
+        return (key, None, bytes(value), created_at)
+    return (key, value, None, created_at)
+
+
+def _decode_row(value: str | None, blob: bytes | None, as_bytes: bool | None, encoding: str | None) -> Any:
+    if blob is not None:
+        return blob if as_bytes or not encoding else blob.decode(encoding)
+    if as_bytes and value is not None:
+        return value.encode(encoding or "utf-8")
+    return value
+
+
+def _prefix_range(sql: str, prefix: str) -> tuple[str, tuple[str, ...]]:
+    """Restrict `sql` to ids starting with `prefix` using an indexed range."""
+    if not prefix:
+        return sql, ()
+    upper = _prefix_upper_bound(prefix)
+    if upper is None:
+        return f"{sql} WHERE id >= ?", (prefix,)
+    return f"{sql} WHERE id >= ? AND id < ?", (prefix, upper)
+
+
+def _literal_prefix(pattern: re.Pattern[str]) -> str:
+    """Return the literal text every match of an anchored pattern starts with.
+
+    Returns "" whenever a prefix cannot be guaranteed (unanchored patterns,
+    alternation, case-insensitive or multiline flags).
+    """
+    if pattern.flags & (re.IGNORECASE | re.MULTILINE | re.VERBOSE):
+        return ""
+    source = pattern.pattern
+    if source.startswith("^"):
+        i = 1
+    elif source.startswith("\\A"):
+        i = 2
+    else:
         return ""
-    
-    
\ No newline at end of file
+    if "|" in source:
+        return ""
+    prefix = []
+    while i < len(source):
+        ch = source[i]
+        if ch == "\\":
+            # escaped punctuation is a literal, escaped letters are classes
+            if i + 1 < len(source) and not source[i + 1].isalnum():
+                ch = source[i + 1]
+                i += 2
+            else:
+                break
+        elif ch in _REGEX_SPECIAL:
+            break
+        else:
+            i += 1
+        if i < len(source) and source[i] in "*?{":
+            break
+        prefix.append(ch)
+    return "".join(prefix)
+
+
+def _prefix_upper_bound(prefix: str) -> str | None:
+    """Smallest string greater than every string starting with `prefix`."""
+    stripped = prefix.rstrip(_MAX_CODEPOINT)
+    if not stripped:
+        return None
+    return stripped[:-1] + chr(ord(stripped[-1]) + 1)
@@ -0,0 +1,151 @@
+"""Sparse BM25 inverted index over paper titles, abstracts and entity texts."""
+
+import json
+import math
+import os
+import re
+from collections import Counter
+from collections.abc import Iterable
+
+import numpy as np
+
+# DOIs are kept as single tokens so exact-DOI queries hit one posting list
+_TOKEN_RE = re.compile(r"10\.\d{4,9}/[^\s\"<>,;]+|\w+")
+
+
+def tokenize(text: str) -> list[str]:
+    return [token.rstrip(".") for token in _TOKEN_RE.findall(text.lower())]
+
+
+class BM25Index:
+    """Term-document CSR matrix with BM25 scoring and incremental additions.
+
+    New documents are buffered and merged into the CSR arrays on the next
+    query, so bulk loads pay for one merge rather than one per document.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.vocabulary: dict[str, int] = {}
+        self.doc_ids: list[str] = []
+        self._doc_positions: dict[str, int] = {}
+        self._doc_lengths = np.zeros(0, dtype=np.float32)
+        # term-major CSR: postings of term t are indptr[t]:indptr[t + 1]
+        self._indptr = np.zeros(1, dtype=np.int64)
+        self._docs = np.zeros(0, dtype=np.int32)
+        self._tfs = np.zeros(0, dtype=np.float32)
+        self._pending_terms: list[int] = []
+        self._pending_docs: list[int] = []
+        self._pending_tfs: list[int] = []
+        self._pending_lengths: list[int] = []
+        self._prefix_masks: dict[str, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    def add_documents(self, documents: Iterable[tuple[str, str]]) -> int:
+        """Add (doc_id, text) pairs; ids already indexed are skipped."""
+        added = 0
+        for doc_id, text in documents:
+            if doc_id in self._doc_positions:
+                continue
+            position = len(self.doc_ids)
+            self.doc_ids.append(doc_id)
+            self._doc_positions[doc_id] = position
+            counts = Counter(tokenize(text))
+            for term, tf in counts.items():
+                self._pending_terms.append(self.vocabulary.setdefault(term, len(self.vocabulary)))
+                self._pending_docs.append(position)
+                self._pending_tfs.append(tf)
+            self._pending_lengths.append(sum(counts.values()))
+            added += 1
+        return added
+
+    def _merge_pending(self) -> None:
+        if not self._pending_lengths:
+            return
+        old_terms = np.repeat(np.arange(len(self._indptr) - 1), np.diff(self._indptr))
+        terms = np.concatenate([old_terms, np.asarray(self._pending_terms, dtype=np.int64)])
+        docs = np.concatenate([self._docs, np.asarray(self._pending_docs, dtype=np.int32)])
+        tfs = np.concatenate([self._tfs, np.asarray(self._pending_tfs, dtype=np.float32)])
+        order = np.argsort(terms, kind="stable")
+        self._docs, self._tfs = docs[order], tfs[order]
+        self._indptr = np.zeros(len(self.vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(terms, minlength=len(self.vocabulary)), out=self._indptr[1:])
+        self._doc_lengths = np.concatenate(
+            [self._doc_lengths, np.asarray(self._pending_lengths, dtype=np.float32)]
+        )
+        self._pending_terms, self._pending_docs, self._pending_tfs, self._pending_lengths = [], [], [], []
+        self._prefix_masks = {}
+
+    def _prefix_mask(self, prefix: str) -> np.ndarray:
+        mask = self._prefix_masks.get(prefix)
+        if mask is None:
+            mask = self._prefix_masks[prefix] = np.fromiter(
+                (doc_id.startswith(prefix) for doc_id in self.doc_ids), dtype=bool, count=len(self.doc_ids)
+            )
+        return mask
+
+    def search(self, query: str, top_k: int = 10, prefix: str | None = None) -> list[tuple[str, float]]:
+        """Return (doc_id, BM25 score) pairs, best first, optionally only ids starting with `prefix`."""
+        self._merge_pending()
+        n_docs = len(self.doc_ids)
+        if n_docs == 0:
+            return []
+        avg_length = float(self._doc_lengths.mean()) or 1.0
+        norm = self.k1 * (1 - self.b + self.b * self._doc_lengths / avg_length)
+        scores = np.zeros(n_docs, dtype=np.float32)
+        for term in set(tokenize(query)):
+            t = self.vocabulary.get(term)
+            if t is None:
+                continue
+            start, end = self._indptr[t], self._indptr[t + 1]
+            docs, tfs = self._docs[start:end], self._tfs[start:end]
+            df = end - start
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            scores[docs] += idf * tfs * (self.k1 + 1) / (tfs + norm[docs])
+        if prefix:
+            scores[~self._prefix_mask(prefix)] = 0
+        hits = np.flatnonzero(scores)
+        if len(hits) > top_k:
+            hits = hits[np.argpartition(-scores[hits], top_k - 1)[:top_k]]
+        hits = hits[np.argsort(-scores[hits])]
+        return [(self.doc_ids[i], float(scores[i])) for i in hits]
+
+    def save(self, path: str) -> None:
+        self._merge_pending()
+        os.makedirs(path, exist_ok=True)
+        np.savez(
+            os.path.join(path, "postings.npz"),
+            indptr=self._indptr,
+            docs=self._docs,
+            tfs=self._tfs,
+            doc_lengths=self._doc_lengths,
+        )
+        with open(os.path.join(path, "vocabulary.json"), "w") as f:
+            json.dump({"k1": self.k1, "b": self.b, "vocabulary": self.vocabulary, "doc_ids": self.doc_ids}, f)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with open(os.path.join(path, "vocabulary.json")) as f:
+            meta = json.load(f)
+        index = cls(k1=meta["k1"], b=meta["b"])
+        index.vocabulary = meta["vocabulary"]
+        index.doc_ids = meta["doc_ids"]
+        index._doc_positions = {doc_id: i for i, doc_id in enumerate(index.doc_ids)}
+        with np.load(os.path.join(path, "postings.npz")) as arrays:
+            index._indptr = arrays["indptr"]
+            index._docs = arrays["docs"]
+            index._tfs = arrays["tfs"]
+            index._doc_lengths = arrays["doc_lengths"]
+        return index
+
+
+def reciprocal_rank_fusion(rankings: Iterable[list[str]], k: int = 60) -> list[tuple[str, float]]:
+    """Fuse several ranked id lists; ids ranked high in any list come first."""
+    fused: dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
@@ -0,0 +1,214 @@
+"""Prometheus-style metrics registry and `/metrics` endpoint.
+
+Counters, gauges and histograms with labels are kept in process and rendered
+in the Prometheus text exposition format, so any Prometheus server (or a test
+using Flask's test client) can scrape them:
+
+    app = create_app()
+    app.run(port=9100)          # GET /metrics
+"""
+
+import bisect
+import threading
+from collections.abc import Sequence
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: dict[tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            # unlabelled series are exported as 0 before the first update
+            self._values[()] = self._initial()
+
+    def _initial(self):
+        return 0
+
+    def _key(self, labels: dict[str, str]) -> tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_sample(key, value))
+        return lines
+
+    def _render_sample(self, key: tuple[str, ...], value) -> list[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        if amount < 0:
+            raise ValueError("Counters can only increase")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = self._initial()
+            state[0][index] += 1
+            state[1] += value
+
+    def _initial(self):
+        # per-bucket counts (last slot is +Inf), sum
+        return [[0] * (len(self.buckets) + 1), 0.0]
+
+    def count(self, **labels: str) -> int:
+        state = self._values.get(self._key(labels))
+        return sum(state[0]) if state else 0
+
+    def _render_sample(self, key: tuple[str, ...], state) -> list[str]:
+        counts, total = state
+        lines = []
+        cumulative = 0
+        for bound, count in zip((*self.buckets, float("inf")), counts):
+            cumulative += count
+            le = f'le="{_format_value(bound)}"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, documentation: str, labelnames: Sequence[str], **kwargs) -> _Metric:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"Metric {name} is already registered with a different type or labels")
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+CACHE_REQUESTS = REGISTRY.counter(
+    "redis_cache_requests_total", "RedisCache lookups by key prefix and result", ["prefix", "result"])
+CACHE_HIT_RATIO = REGISTRY.gauge(
+    "redis_cache_hit_ratio", "Fraction of RedisCache lookups that hit, per key prefix", ["prefix"])
+LLM_LATENCY = REGISTRY.histogram(
+    "llm_request_seconds", "query_chat_openai latency per pipeline stage", ["stage", "model"])
+LLM_TOKENS = REGISTRY.counter(
+    "llm_tokens_total", "Tokens used by query_chat_openai per stage", ["stage", "kind"])
+LLM_ERRORS = REGISTRY.counter(
+    "llm_errors_total", "Failed query_chat_openai calls per stage", ["stage"])
+NEO4J_BATCH_LATENCY = REGISTRY.histogram(
+    "neo4j_batch_write_seconds", "Latency of one load_triplets_to_neo4j batch", ["status"])
+NEO4J_ERRORS = REGISTRY.counter(
+    "neo4j_write_errors_total", "Triples in batches that failed to load (stats['errors'])")
+EMBEDDINGS = REGISTRY.counter(
+    "embeddings_total", "Texts embedded, by where the vector came from", ["source"])
+EMBEDDING_LATENCY = REGISTRY.histogram(
+    "embedding_batch_seconds", "Embedding model encode() latency per call", ["operation"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0))
+
+
+def record_cache_lookup(prefix: str, hit: bool) -> None:
+    CACHE_REQUESTS.inc(prefix=prefix, result="hit" if hit else "miss")
+    hits = CACHE_REQUESTS.value(prefix=prefix, result="hit")
+    CACHE_HIT_RATIO.set(hits / (hits + CACHE_REQUESTS.value(prefix=prefix, result="miss")), prefix=prefix)
+
+
+def create_app(registry: MetricsRegistry = REGISTRY):
+    """Flask app serving the registry at /metrics."""
+    from flask import Flask, Response
+
+    app = Flask(__name__)
+
+    @app.get("/metrics")
+    def metrics():
+        return Response(registry.render(), content_type=CONTENT_TYPE)
+
+    @app.get("/healthz")
+    def healthz():
+        return {"status": "ok"}
+
+    return app
@@ -0,0 +1,208 @@
+"""Compressed in-memory embedding store with full-precision rescoring.
+
+Vectors are L2-normalised and written once to a float32 file that is only
+memory-mapped. The resident index is either scalar int8 codes (4x smaller)
+or product-quantisation codes (`dim * 4 / subspaces` times smaller). A query
+scores every vector approximately, then rescores the best candidates exactly
+against the memory-mapped rows.
+"""
+
+import json
+import logging
+import os
+import time
+from collections.abc import Sequence
+from typing import Any
+
+import numpy as np
+
+from embedding_codec import normalize_embeddings
+
+logger = logging.getLogger(__name__)
+
+_BLOCK = 65_536
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+def _kmeans(points: np.ndarray, k: int, iterations: int, rng: np.random.Generator) -> np.ndarray:
+    """Plain Lloyd's k-means, enough for PQ codebooks."""
+    k = min(k, len(points))
+    centroids = points[rng.choice(len(points), k, replace=False)].copy()
+    for _ in range(iterations):
+        distances = (points ** 2).sum(1)[:, None] - 2 * points @ centroids.T + (centroids ** 2).sum(1)[None, :]
+        assignment = distances.argmin(1)
+        counts = np.bincount(assignment, minlength=k)
+        sums = np.stack([np.bincount(assignment, weights=points[:, w], minlength=k) for w in range(points.shape[1])], 1)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+    return centroids
+
+
+class QuantizedEmbeddingStore:
+    """int8 or product-quantised first pass, exact rescoring from an mmap file."""
+
+    def __init__(self, path: str, ids: list[str], method: str, params: dict[str, np.ndarray], codes: np.ndarray):
+        self.path = path
+        self.ids = ids
+        self.method = method
+        self.params = params
+        self.codes = codes
+        self.vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def build(
+        cls,
+        path: str,
+        ids: Sequence[str],
+        vectors: np.ndarray,
+        method: str = "int8",
+        subspaces: int = 16,
+        centroids: int = 256,
+        train_size: int = 50_000,
+        iterations: int = 15,
+        seed: int = 0,
+    ) -> "QuantizedEmbeddingStore":
+        """Quantise vectors and persist codes plus the full-precision file under path."""
+        if method not in ("int8", "pq"):
+            raise ValueError(f"Unknown quantization method: {method}")
+        vectors = normalize_embeddings(vectors)
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "vectors.npy"), vectors)
+
+        if method == "int8":
+            low, high = vectors.min(0), vectors.max(0)
+            scale = np.maximum(high - low, 1e-12) / 255.0
+            params = {"scale": scale.astype(np.float32), "offset": (low + 128 * scale).astype(np.float32)}
+            codes = np.empty(vectors.shape, dtype=np.int8)
+            for start in range(0, len(vectors), _BLOCK):
+                block = vectors[start:start + _BLOCK]
+                codes[start:start + _BLOCK] = np.clip(np.rint((block - params["offset"]) / scale), -128, 127)
+        else:
+            dim = vectors.shape[1]
+            if dim % subspaces:
+                raise ValueError(f"Dimension {dim} is not divisible by {subspaces} subspaces")
+            if centroids > 256:
+                raise ValueError("At most 256 centroids per subspace fit a uint8 code")
+            rng = np.random.default_rng(seed)
+            sample = vectors[rng.choice(len(vectors), min(train_size, len(vectors)), replace=False)]
+            width = dim // subspaces
+            codebooks = np.stack([
+                _kmeans(sample[:, j * width:(j + 1) * width], centroids, iterations, rng)
+                for j in range(subspaces)
+            ])
+            codes = np.empty((len(vectors), subspaces), dtype=np.uint8)
+            for j, codebook in enumerate(codebooks):
+                squared = (codebook ** 2).sum(1)
+                for start in range(0, len(vectors), _BLOCK):
+                    block = vectors[start:start + _BLOCK, j * width:(j + 1) * width]
+                    codes[start:start + _BLOCK, j] = (squared[None, :] - 2 * block @ codebook.T).argmin(1)
+            params = {"codebooks": codebooks.astype(np.float32)}
+
+        np.save(os.path.join(path, "codes.npy"), codes)
+        np.savez(os.path.join(path, "params.npz"), **params)
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump({"method": method, "ids": list(ids)}, f)
+        return cls(path, list(ids), method, params, codes)
+
+    @classmethod
+    def load(cls, path: str) -> "QuantizedEmbeddingStore":
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        with np.load(os.path.join(path, "params.npz")) as arrays:
+            params = {name: arrays[name] for name in arrays.files}
+        return cls(path, meta["ids"], meta["method"], params, np.load(os.path.join(path, "codes.npy")))
+
+    @property
+    def memory_bytes(self) -> int:
+        """Resident size of the codes and quantiser parameters (the mmap file is excluded)."""
+        return self.codes.nbytes + sum(array.nbytes for array in self.params.values())
+
+    def approximate_scores(self, query: np.ndarray) -> np.ndarray:
+        query = normalize_embeddings(query)
+        scores = np.empty(len(self.codes), dtype=np.float32)
+        if self.method == "int8":
+            # q . (code * scale + offset) = code . (q * scale) + q . offset
+            weights = query * self.params["scale"]
+            bias = float(query @ self.params["offset"])
+            for start in range(0, len(self.codes), _BLOCK):
+                block = self.codes[start:start + _BLOCK].astype(np.float32)
+                scores[start:start + _BLOCK] = block @ weights + bias
+        else:
+            codebooks = self.params["codebooks"]
+            subspaces, _, width = codebooks.shape
+            # asymmetric distance: one lookup table of q_j . c_jk per subspace
+            table = np.einsum("jkw,jw->jk", codebooks, query.reshape(subspaces, width))
+            columns = np.arange(subspaces)
+            for start in range(0, len(self.codes), _BLOCK):
+                scores[start:start + _BLOCK] = table[columns, self.codes[start:start + _BLOCK]].sum(1)
+        return scores
+
+    def search(self, query: np.ndarray, top_k: int = 10, rescore: int | None = None) -> list[tuple[str, float]]:
+        """Return (id, cosine similarity) pairs, best first.
+
+        rescore is the number of approximate candidates re-ranked against the
+        full-precision vectors (default 10 * top_k); 0 returns approximate scores.
+        """
+        if not self.ids:
+            return []
+        rescore = 10 * top_k if rescore is None else rescore
+        approximate = self.approximate_scores(query)
+        if rescore <= 0:
+            return [(self.ids[i], float(approximate[i])) for i in _top_k(approximate, top_k)]
+        candidates = _top_k(approximate, max(rescore, top_k))
+        # sorted row order keeps the mmap reads sequential
+        rows = np.sort(candidates)
+        exact = np.asarray(self.vectors[rows]) @ normalize_embeddings(query)
+        best = _top_k(exact, top_k)
+        return [(self.ids[rows[i]], float(exact[i])) for i in best]
+
+
+def benchmark_recall(
+    path: str,
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    top_k: int = 10,
+    configurations: Sequence[dict[str, Any]] = (
+        {"method": "int8"},
+        {"method": "pq", "subspaces": 16},
+        {"method": "pq", "subspaces": 32},
+    ),
+    rescore: Sequence[int] = (0, 50, 200),
+) -> list[dict[str, Any]]:
+    """Recall@k against exact search, resident memory and latency per configuration."""
+    normalized = normalize_embeddings(vectors)
+    exact = [set(_top_k(normalized @ query, top_k)) for query in normalize_embeddings(queries)]
+    ids = [str(i) for i in range(len(vectors))]
+    float32_bytes = normalized.nbytes
+    results = []
+    for number, configuration in enumerate(configurations):
+        store = QuantizedEmbeddingStore.build(os.path.join(path, str(number)), ids, vectors, **configuration)
+        for candidates in rescore:
+            started = time.perf_counter()
+            hits = [store.search(query, top_k=top_k, rescore=candidates) for query in queries]
+            elapsed = time.perf_counter() - started
+            recall = np.mean([
+                len({int(doc_id) for doc_id, _ in found} & truth) / len(truth)
+                for found, truth in zip(hits, exact)
+            ])
+            results.append({
+                **configuration,
+                "rescore": candidates,
+                f"recall@{top_k}": float(recall),
+                "memory_bytes": store.memory_bytes,
+                "compression": float32_bytes / store.memory_bytes,
+                "ms_per_query": 1000 * elapsed / len(queries),
+            })
+            logger.info(f"{configuration} rescore={candidates}: recall {recall:.3f}, "
+                        f"{float32_bytes / store.memory_bytes:.1f}x smaller")
+    return results
@@ -0,0 +1,62 @@
+"""The 10 retraction reasons used across the pipeline and their numeric codes."""
+
+import re
+
+RETRACTION_REASONS = {
+    1: "Factual/methodological/other critical errors in manuscript",
+    2: "Incomplete exposition or more work in progress",
+    3: "Typos in manuscript",
+    4: 'Self-identified as "not novel"',
+    5: "Administrative or legal issues",
+    6: "ArXiv policy violation",
+    7: "Subsumed by another publication",
+    8: "Plagiarism",
+    9: "Personal reasons",
+    10: "Reason not specified",
+}
+
+UNKNOWN_REASON = 0
+
+# free-text reasons as stored by publishers and older ingests
+_KEYWORDS = [
+    ("plagiar", 8),
+    ("typo", 3),
+    ("not novel", 4),
+    ("novelty", 4),
+    ("subsumed", 7),
+    ("duplicate publication", 7),
+    ("arxiv", 6),
+    ("policy", 6),
+    ("administrative", 5),
+    ("legal", 5),
+    ("copyright", 5),
+    ("personal", 9),
+    ("incomplete", 2),
+    ("work in progress", 2),
+    ("not specified", 10),
+    ("unspecified", 10),
+    ("error", 1),
+    ("methodolog", 1),
+]
+
+_LABELS = {re.sub(r"\W+", " ", label.lower()).strip(): code for code, label in RETRACTION_REASONS.items()}
+
+
+def reason_code(reason) -> int:
+    """Map a stored reason (code, numeric string, label or free text) to 1-10, or UNKNOWN_REASON."""
+    if reason is None or isinstance(reason, bool):
+        return UNKNOWN_REASON
+    if isinstance(reason, (int, float)):
+        if isinstance(reason, float) and not reason.is_integer():
+            return UNKNOWN_REASON
+        code = int(reason)
+        return code if code in RETRACTION_REASONS else UNKNOWN_REASON
+    text = re.sub(r"\W+", " ", str(reason).lower()).strip()
+    if text.isdigit():
+        return reason_code(int(text))
+    if text in _LABELS:
+        return _LABELS[text]
+    for keyword, code in _KEYWORDS:
+        if keyword in text:
+            return code
+    return UNKNOWN_REASON
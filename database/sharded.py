@@ -0,0 +1,338 @@
+"""Sharded scatter-gather similarity search over local worker processes.
+
+The embedding set is split into shard files (normalised float32 `.npy` plus
+an id list) described by a versioned manifest. New vectors go to small delta
+segments listed next to the shards and are folded in by `rebalance()`. Each worker process
+memory-maps the shards assigned to it, so the page cache is shared and
+nothing is copied between processes. A query is sent to every worker, each
+returns its local top-k and the partial lists are merged with a heap.
+"""
+
+import heapq
+import itertools
+import json
+import logging
+import math
+import multiprocessing
+import os
+import pickle
+import queue
+import threading
+import time
+from collections.abc import Sequence
+from typing import Any
+
+import numpy as np
+
+from embedding_codec import normalize_embeddings
+
+logger = logging.getLogger(__name__)
+
+_MANIFEST = "manifest.json"
+
+
+class ShardedEmbeddingIndex:
+    """On-disk shard layout: `<path>/manifest.json` and one `.npy`/`.json` pair per shard or delta segment."""
+
+    def __init__(self, path: str, max_shard_size: int = 1_000_000, max_delta_size: int = 10_000):
+        self.path = path
+        self.max_shard_size = max_shard_size
+        self.max_delta_size = max_delta_size
+        with open(os.path.join(path, _MANIFEST)) as f:
+            self.manifest = json.load(f)
+
+    @property
+    def version(self) -> int:
+        return self.manifest["version"]
+
+    @property
+    def shards(self) -> list[dict[str, Any]]:
+        return self.manifest["shards"]
+
+    @property
+    def delta(self) -> list[dict[str, Any]]:
+        return self.manifest.get("delta", [])
+
+    @property
+    def segments(self) -> list[dict[str, Any]]:
+        """Shards followed by delta segments; everything a search has to cover."""
+        return self.shards + self.delta
+
+    def __len__(self) -> int:
+        return sum(segment["count"] for segment in self.segments)
+
+    @classmethod
+    def build(cls, path: str, ids: Sequence[str], vectors: np.ndarray, num_shards: int = 4,
+              max_shard_size: int = 1_000_000, max_delta_size: int = 10_000) -> "ShardedEmbeddingIndex":
+        os.makedirs(path, exist_ok=True)
+        cls._write(path, 1, list(ids), normalize_embeddings(vectors), num_shards)
+        return cls(path, max_shard_size=max_shard_size, max_delta_size=max_delta_size)
+
+    @staticmethod
+    def _write(path: str, version: int, ids: list[str], vectors: np.ndarray, num_shards: int) -> None:
+        shards = []
+        bounds = np.linspace(0, len(ids), num_shards + 1).astype(int)
+        for number, (start, end) in enumerate(zip(bounds[:-1], bounds[1:])):
+            # versioned names: workers still mapping the previous layout keep valid files
+            name = f"v{version}-{number:04d}"
+            np.save(os.path.join(path, f"{name}.npy"), vectors[start:end])
+            with open(os.path.join(path, f"{name}.json"), "w") as f:
+                json.dump(ids[start:end], f)
+            shards.append({"name": name, "count": int(end - start)})
+        manifest = {"version": version, "dim": int(vectors.shape[1]) if vectors.ndim == 2 else 0, "shards": shards}
+        temporary = os.path.join(path, f"{_MANIFEST}.tmp")
+        with open(temporary, "w") as f:
+            json.dump(manifest, f)
+        os.replace(temporary, os.path.join(path, _MANIFEST))
+
+    def load_shard(self, shard: dict[str, Any], mmap: bool = True) -> tuple[list[str], np.ndarray]:
+        with open(os.path.join(self.path, f"{shard['name']}.json")) as f:
+            ids = json.load(f)
+        return ids, np.load(os.path.join(self.path, f"{shard['name']}.npy"), mmap_mode="r" if mmap else None)
+
+    def add(self, ids: Sequence[str], vectors: np.ndarray) -> bool:
+        """Write vectors to a new delta segment; returns True if the shards were rebalanced.
+
+        Only the new vectors are written, so an insert costs O(len(ids)). Once
+        the delta segments hold more than `max_delta_size` vectors they are
+        folded into the shards.
+        """
+        vectors = normalize_embeddings(vectors)
+        ids = list(ids)
+        if sum(segment["count"] for segment in self.delta) + len(ids) > self.max_delta_size:
+            self.rebalance(extra=(ids, vectors))
+            return True
+        name = f"v{self.version + 1}-delta"
+        np.save(os.path.join(self.path, f"{name}.npy"), vectors)
+        with open(os.path.join(self.path, f"{name}.json"), "w") as f:
+            json.dump(ids, f)
+        delta = self.delta + [{"name": name, "count": len(ids)}]
+        self._commit({**self.manifest, "version": self.version + 1, "delta": delta})
+        return False
+
+    def rebalance(self, num_shards: int | None = None, extra: tuple[list[str], np.ndarray] | None = None) -> None:
+        """Fold the delta segments in and rewrite equal shards, growing the count if any would exceed max_shard_size."""
+        ids, blocks = [], []
+        for segment in self.segments:
+            shard_ids, shard_vectors = self.load_shard(segment)
+            ids += shard_ids
+            blocks.append(np.asarray(shard_vectors))
+        if extra is not None:
+            ids += extra[0]
+            blocks.append(extra[1])
+        vectors = np.concatenate(blocks) if blocks else np.zeros((0, self.manifest["dim"]), dtype=np.float32)
+        num_shards = max(num_shards or len(self.shards), math.ceil(len(ids) / self.max_shard_size), 1)
+        self._write(self.path, self.version + 1, ids, vectors, num_shards)
+        self._reload()
+        logger.info(f"Rebalanced {len(ids)} vectors into {num_shards} shards (version {self.version})")
+
+    def _commit(self, manifest: dict[str, Any]) -> None:
+        temporary = os.path.join(self.path, f"{_MANIFEST}.tmp")
+        with open(temporary, "w") as f:
+            json.dump(manifest, f)
+        os.replace(temporary, os.path.join(self.path, _MANIFEST))
+        self.manifest = manifest
+
+    def _reload(self) -> None:
+        with open(os.path.join(self.path, _MANIFEST)) as f:
+            self.manifest = json.load(f)
+
+    def remove_stale_shards(self) -> int:
+        """Delete shard files not referenced by the current manifest."""
+        live = {segment["name"] for segment in self.segments}
+        removed = 0
+        for filename in os.listdir(self.path):
+            stem, extension = os.path.splitext(filename)
+            if extension in (".npy", ".json") and filename != _MANIFEST and stem not in live:
+                os.remove(os.path.join(self.path, filename))
+                removed += 1
+        return removed
+
+
+def _sendable(error: Exception) -> Exception:
+    """The exception itself if it survives pickling, otherwise a RuntimeError describing it."""
+    try:
+        pickle.dumps(error)
+    except Exception:
+        return RuntimeError(f"{type(error).__name__}: {error}")
+    return error
+
+
+def _search_worker(path: str, worker: int, workers: int, inbox, outbox) -> None:
+    """Worker process: answer top-k requests over the shards assigned to this worker.
+
+    A failing request is answered with its exception, so the caller re-raises
+    it instead of waiting for a reply from a dead process.
+    """
+
+    def load():
+        index = ShardedEmbeddingIndex(path)
+        return [index.load_shard(segment) for number, segment in enumerate(index.segments)
+                if number % workers == worker]
+
+    def search(queries, top_k):
+        results = [[] for _ in range(len(queries))]
+        for ids, vectors in shards:
+            if not ids:
+                continue
+            scores = np.asarray(vectors) @ queries.T
+            k = min(top_k, len(ids))
+            top = np.argpartition(-scores, k - 1, axis=0)[:k]
+            for column, rows in enumerate(top.T):
+                results[column].extend((float(scores[row, column]), ids[row]) for row in rows)
+        return [heapq.nlargest(top_k, partial) for partial in results]
+
+    try:
+        shards = load()
+    except Exception as e:
+        outbox.put(("ready", worker, _sendable(e)))
+        return
+    outbox.put(("ready", worker, None))
+    while True:
+        message = inbox.get()
+        if message is None:
+            break
+        kind, request_id, payload = message
+        try:
+            if kind == "reload":
+                shards = load()
+                result = None
+            else:
+                result = search(*payload)
+        except Exception as e:
+            result = _sendable(e)
+        outbox.put((request_id, worker, result))
+
+
+class ShardedSearchService:
+    """Scatter queries to worker processes and merge their top-k lists.
+
+    Safe to call from several threads at once; replies are routed back to the
+    waiting caller by request id.
+    """
+
+    def __init__(self, path: str, workers: int = 2, timeout: float = 60.0):
+        self.path = path
+        self.workers = workers
+        self.timeout = timeout
+        self._context = multiprocessing.get_context("spawn")
+        self._inboxes = []
+        self._processes = []
+        self._outbox = None
+        self._dispatcher = None
+        self._closing = threading.Event()
+        self._pending: dict[int, tuple[threading.Event, list]] = {}
+        self._pending_lock = threading.Lock()
+        self._request_ids = itertools.count()
+
+    def start(self) -> "ShardedSearchService":
+        self._closing.clear()
+        self._outbox = self._context.Queue()
+        for worker in range(self.workers):
+            inbox = self._context.Queue()
+            process = self._context.Process(
+                target=_search_worker,
+                args=(self.path, worker, self.workers, inbox, self._outbox),
+                name=f"shard-worker-{worker}",
+                daemon=True,
+            )
+            process.start()
+            self._inboxes.append(inbox)
+            self._processes.append(process)
+        for _ in range(self.workers):
+            try:
+                _, worker, error = self._outbox.get(timeout=self.timeout)
+            except queue.Empty:
+                self.close()
+                raise TimeoutError(f"Shard workers did not start within {self.timeout}s") from None
+            if error is not None:
+                self.close()
+                raise RuntimeError(f"Shard worker {worker} failed to load {self.path}") from error
+        self._dispatcher = threading.Thread(target=self._dispatch, name="shard-dispatcher", daemon=True)
+        self._dispatcher.start()
+        logger.info(f"Started {self.workers} shard workers over {self.path}")
+        return self
+
+    def _dispatch(self) -> None:
+        # stopped by an event rather than a sentinel: a worker killed while
+        # writing holds the outbox lock, so nothing more can be put on it
+        while not self._closing.is_set():
+            try:
+                message = self._outbox.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            request_id, _, result = message
+            with self._pending_lock:
+                if request_id not in self._pending:
+                    # the caller already timed out
+                    continue
+                event, replies = self._pending[request_id]
+                replies.append(result)
+                if len(replies) == self.workers:
+                    event.set()
+
+    def _check_workers(self) -> None:
+        for number, process in enumerate(self._processes):
+            if not process.is_alive():
+                raise RuntimeError(f"Shard worker {number} is not running (exit code {process.exitcode})")
+
+    def _scatter(self, kind: str, payload: Any) -> list:
+        self._check_workers()
+        request_id = next(self._request_ids)
+        event = threading.Event()
+        with self._pending_lock:
+            self._pending[request_id] = (event, [])
+        try:
+            for inbox in self._inboxes:
+                inbox.put((kind, request_id, payload))
+            deadline = time.monotonic() + self.timeout
+            # wait in slices so a worker that died mid-request fails fast
+            while not event.wait(min(0.5, max(deadline - time.monotonic(), 0))):
+                self._check_workers()
+                if time.monotonic() >= deadline:
+                    raise TimeoutError(f"Shard workers did not answer request {request_id} within {self.timeout}s")
+        finally:
+            with self._pending_lock:
+                _, replies = self._pending.pop(request_id)
+        for reply in replies:
+            if isinstance(reply, BaseException):
+                raise reply
+        return replies
+
+    def search_many(self, queries: np.ndarray, top_k: int = 10) -> list[list[tuple[str, float]]]:
+        """Top-k (id, cosine similarity) pairs for each query row."""
+        queries = normalize_embeddings(np.atleast_2d(queries))
+        replies = self._scatter("search", (queries, top_k))
+        merged = []
+        for column in range(len(queries)):
+            # every worker's list is already sorted best first
+            best = heapq.merge(*(reply[column] for reply in replies), key=lambda hit: -hit[0])
+            merged.append([(doc_id, score) for score, doc_id in itertools.islice(best, top_k)])
+        return merged
+
+    def search(self, query: np.ndarray, top_k: int = 10) -> list[tuple[str, float]]:
+        return self.search_many(query, top_k)[0]
+
+    def reload(self) -> None:
+        """Make every worker re-read the manifest, e.g. after add() or rebalance()."""
+        self._scatter("reload", None)
+
+    def close(self) -> None:
+        for inbox in self._inboxes:
+            inbox.put(None)
+        for process in self._processes:
+            process.join(timeout=self.timeout)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        self._closing.set()
+        if self._dispatcher is not None:
+            self._dispatcher.join()
+        self._inboxes, self._processes = [], []
+
+    def __enter__(self) -> "ShardedSearchService":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
@@ -0,0 +1,208 @@
+"""Lightweight nested-span tracing for the analysis pipeline.
+
+    from database.tracing import configure, span, InMemoryExporter
+
+    configure(JsonLinesExporter("traces.jsonl"))
+    with span("cot.identify_entities", input_chars=len(text)) as s:
+        ...
+        s.set(tokens=usage["total_tokens"], cache_hit=False)
+
+Each span records wall time, thread CPU time and free-form attributes (bytes,
+tokens, cache hits) and is handed to every exporter when it ends. Tracing is
+off until `configure` is called; a disabled `span()` returns a shared no-op
+object, so instrumented code pays one attribute check per call.
+"""
+
+import functools
+import itertools
+import json
+import threading
+import time
+import uuid
+from collections.abc import Callable
+from dataclasses import asdict, dataclass, field
+from typing import Any
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: int
+    parent_id: int | None
+    start_time: float
+    """Unix timestamp of the span start."""
+
+    wall_seconds: float = 0.0
+    cpu_seconds: float = 0.0
+    """CPU time of the thread that ran the span."""
+
+    attributes: dict[str, Any] = field(default_factory=dict)
+    error: str | None = None
+
+    def set(self, **attributes: Any) -> "Span":
+        self.attributes.update(attributes)
+        return self
+
+    def add(self, key: str, amount: float = 1) -> "Span":
+        """Accumulate a counter attribute such as bytes or tokens."""
+        self.attributes[key] = self.attributes.get(key, 0) + amount
+        return self
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+
+class _NoopSpan:
+    """Returned by span() while tracing is disabled."""
+
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        return False
+
+    def set(self, **attributes: Any) -> "_NoopSpan":
+        return self
+
+    def add(self, key: str, amount: float = 1) -> "_NoopSpan":
+        return self
+
+
+_NOOP = _NoopSpan()
+
+
+class _ActiveSpan:
+    __slots__ = ("tracer", "span", "_wall", "_cpu")
+
+    def __init__(self, tracer: "Tracer", name: str, attributes: dict[str, Any]):
+        self.tracer = tracer
+        parent = tracer.current_span()
+        self.span = Span(
+            name=name,
+            trace_id=parent.trace_id if parent else uuid.uuid4().hex[:16],
+            span_id=next(tracer._span_ids),
+            parent_id=parent.span_id if parent else None,
+            start_time=time.time(),
+            attributes=attributes,
+        )
+
+    def __enter__(self) -> Span:
+        self.tracer._stack().append(self.span)
+        self._wall = time.perf_counter()
+        self._cpu = time.thread_time()
+        return self.span
+
+    def __exit__(self, exc_type, exc, traceback) -> bool:
+        self.span.wall_seconds = time.perf_counter() - self._wall
+        self.span.cpu_seconds = time.thread_time() - self._cpu
+        if exc is not None:
+            self.span.error = f"{exc_type.__name__}: {exc}"
+        stack = self.tracer._stack()
+        if stack and stack[-1] is self.span:
+            stack.pop()
+        self.tracer._export(self.span)
+        return False
+
+
+class Tracer:
+    def __init__(self):
+        self.enabled = False
+        self.exporters: list[Any] = []
+        self._local = threading.local()
+        self._span_ids = itertools.count(1)
+
+    def _stack(self) -> list[Span]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def current_span(self) -> Span | None:
+        stack = getattr(self._local, "stack", None)
+        return stack[-1] if stack else None
+
+    def span(self, name: str, **attributes: Any) -> _ActiveSpan | _NoopSpan:
+        if not self.enabled:
+            return _NOOP
+        return _ActiveSpan(self, name, attributes)
+
+    def _export(self, span: Span) -> None:
+        for exporter in self.exporters:
+            exporter.export(span)
+
+
+class InMemoryExporter:
+    """Keep finished spans in a list, for tests and notebooks."""
+
+    def __init__(self):
+        self.spans: list[Span] = []
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def by_name(self, name: str) -> list[Span]:
+        return [span for span in self.spans if span.name == name]
+
+    def clear(self) -> None:
+        with self._lock:
+            self.spans = []
+
+
+class JsonLinesExporter:
+    """Append one JSON object per finished span to a file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a", buffering=1)
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+tracer = Tracer()
+
+
+def configure(*exporters: Any, enabled: bool = True) -> Tracer:
+    """Replace the exporters and switch tracing on (or off with enabled=False)."""
+    tracer.exporters = list(exporters)
+    tracer.enabled = enabled and bool(exporters)
+    return tracer
+
+
+def span(name: str, **attributes: Any) -> _ActiveSpan | _NoopSpan:
+    return tracer.span(name, **attributes)
+
+
+def current_span() -> Span | _NoopSpan:
+    """The innermost open span of this thread, or a no-op span."""
+    return (tracer.current_span() if tracer.enabled else None) or _NOOP
+
+
+def traced(name: str | None = None) -> Callable:
+    """Decorator form of span(); the span name defaults to the function's qualified name."""
+
+    def decorator(fn: Callable) -> Callable:
+        span_name = name or fn.__qualname__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return fn(*args, **kwargs)
+            with _ActiveSpan(tracer, span_name, {}):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
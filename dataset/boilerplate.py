@@ -0,0 +1,215 @@
+"""Corpus-level boilerplate detection for PDF chunks.
+
+Publisher headers, license footers and retraction-notice templates repeat in
+almost every PDF. Lines (case, whitespace and digits normalised) and whole
+chunks (case and whitespace only, since numbers in tables and results are
+evidence) are hashed; segments that occur in a large share of documents are
+learned as boilerplate and stripped before chunks reach REBEL, the embedder
+or the LLM.
+"""
+
+import hashlib
+import json
+import math
+import re
+from collections import Counter, OrderedDict
+from collections.abc import Iterable, Iterator
+from dataclasses import asdict, dataclass
+from typing import Any
+
+_DIGITS_RE = re.compile(r"\d+")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def _text(segment: Any) -> str:
+    return segment if isinstance(segment, str) else segment.page_content
+
+
+def _normalize(text: str) -> str:
+    # page numbers, years and volume numbers vary between otherwise identical lines
+    return _SPACE_RE.sub(" ", _DIGITS_RE.sub("0", text.lower())).strip()
+
+
+def _normalize_chunk(text: str) -> str:
+    return _SPACE_RE.sub(" ", text.lower()).strip()
+
+
+def _segment_hash(normalized: str) -> int:
+    return int.from_bytes(hashlib.blake2b(normalized.encode(), digest_size=8).digest(), "little")
+
+
+@dataclass
+class BoilerplateStats:
+    documents: int = 0
+    chunks_seen: int = 0
+    chunks_dropped: int = 0
+    """Chunks that were boilerplate, empty after stripping or repeated within a document."""
+
+    lines_stripped: int = 0
+    chars_seen: int = 0
+    chars_removed: int = 0
+
+
+class BoilerplateFilter:
+    """Learn frequent lines and chunks across documents and strip them."""
+
+    def __init__(
+        self,
+        min_document_frequency: float = 0.2,
+        min_documents: int = 3,
+        min_line_chars: int = 12,
+        chars_per_token: float = 4.0,
+        recent_documents: int = 64,
+        model_batch_size: int = 16,
+    ):
+        self.min_document_frequency = min_document_frequency
+        self.min_documents = min_documents
+        self.min_line_chars = min_line_chars
+        self.chars_per_token = chars_per_token
+        self.recent_documents = recent_documents
+        self.model_batch_size = model_batch_size
+        """Chunks per REBEL/embedding call downstream, to count the calls avoided."""
+        self.documents_seen = 0
+        self.line_counts: Counter[int] = Counter()
+        self.chunk_counts: Counter[int] = Counter()
+        self._boilerplate_lines: set[int] = set()
+        self._boilerplate_chunks: set[int] = set()
+        # per-document hashes of emitted chunks, for repeated headers/footers within one PDF
+        self._emitted: OrderedDict[str, set[int]] = OrderedDict()
+        self.stats = BoilerplateStats()
+
+    def _line_hash(self, line: str) -> int | None:
+        normalized = _normalize(line)
+        if len(normalized) < self.min_line_chars:
+            return None
+        return _segment_hash(normalized)
+
+    def observe(self, segments: Iterable[Any]) -> None:
+        """Count the distinct lines and chunks of one document (pages, chunks or strings)."""
+        lines, chunks = set(), set()
+        for segment in segments:
+            text = _text(segment)
+            chunks.add(_segment_hash(_normalize_chunk(text)))
+            for line in text.splitlines():
+                key = self._line_hash(line)
+                if key is not None:
+                    lines.add(key)
+        self.line_counts.update(lines)
+        self.chunk_counts.update(chunks)
+        self.documents_seen += 1
+
+    def fit(self, documents: Iterable[Iterable[Any]]) -> "BoilerplateFilter":
+        """Learn boilerplate from a sample of documents, each an iterable of segments."""
+        for segments in documents:
+            self.observe(segments)
+        self.refresh()
+        return self
+
+    @property
+    def threshold(self) -> int:
+        return max(self.min_documents, math.ceil(self.min_document_frequency * self.documents_seen))
+
+    def refresh(self) -> None:
+        """Recompute the boilerplate sets from the current counts."""
+        threshold = self.threshold
+        self._boilerplate_lines = {key for key, count in self.line_counts.items() if count >= threshold}
+        self._boilerplate_chunks = {key for key, count in self.chunk_counts.items() if count >= threshold}
+
+    def is_boilerplate(self, line: str) -> bool:
+        return self._line_hash(line) in self._boilerplate_lines
+
+    def clean(self, text: str) -> str:
+        """Remove boilerplate lines from a text."""
+        kept = []
+        for line in text.splitlines():
+            if self._line_hash(line) in self._boilerplate_lines:
+                self.stats.lines_stripped += 1
+            else:
+                kept.append(line)
+        return "\n".join(kept).strip()
+
+    def filter_chunk(self, chunk: Any, source: str | None = None) -> Any | None:
+        """Return the chunk with boilerplate stripped, or None if nothing worth processing is left."""
+        text = _text(chunk)
+        self.stats.chunks_seen += 1
+        self.stats.chars_seen += len(text)
+        if source is None and not isinstance(chunk, str):
+            source = chunk.metadata.get("source")
+        emitted = self._document_hashes(source)
+        cleaned = "" if _segment_hash(_normalize_chunk(text)) in self._boilerplate_chunks else self.clean(text)
+        if cleaned:
+            # exact text: chunks that differ only in their numbers are different evidence
+            key = _segment_hash(cleaned)
+            if key in emitted:
+                cleaned = ""
+            else:
+                emitted.add(key)
+
+        self.stats.chars_removed += len(text) - len(cleaned)
+        if not cleaned:
+            self.stats.chunks_dropped += 1
+            return None
+        if isinstance(chunk, str):
+            return cleaned
+        if cleaned != text:
+            chunk = type(chunk)(page_content=cleaned, metadata=dict(chunk.metadata))
+        return chunk
+
+    def filter_chunks(self, chunks: Iterable[Any], source: str | None = None) -> Iterator[Any]:
+        for chunk in chunks:
+            cleaned = self.filter_chunk(chunk, source)
+            if cleaned is not None:
+                yield cleaned
+
+    def _document_hashes(self, source: str | None) -> set[int]:
+        if source not in self._emitted:
+            self.stats.documents += 1
+            self._emitted[source] = set()
+            if len(self._emitted) > self.recent_documents:
+                self._emitted.popitem(last=False)
+        else:
+            self._emitted.move_to_end(source)
+        return self._emitted[source]
+
+    def report(self) -> dict[str, Any]:
+        """How much downstream model input was avoided."""
+        stats = self.stats
+        kept = stats.chunks_seen - stats.chunks_dropped
+        batch = self.model_batch_size
+        return {
+            **asdict(stats),
+            "boilerplate_lines": len(self._boilerplate_lines),
+            "boilerplate_chunks": len(self._boilerplate_chunks),
+            # the models run on batches, so only whole batches are saved
+            "model_calls_avoided": math.ceil(stats.chunks_seen / batch) - math.ceil(kept / batch),
+            "tokens_avoided": int(stats.chars_removed / self.chars_per_token),
+            "fraction_removed": stats.chars_removed / stats.chars_seen if stats.chars_seen else 0.0,
+        }
+
+    def save(self, path: str) -> None:
+        with open(path, "w") as f:
+            json.dump({
+                "min_document_frequency": self.min_document_frequency,
+                "min_documents": self.min_documents,
+                "min_line_chars": self.min_line_chars,
+                "model_batch_size": self.model_batch_size,
+                "documents_seen": self.documents_seen,
+                "line_counts": {str(key): count for key, count in self.line_counts.items() if count > 1},
+                "chunk_counts": {str(key): count for key, count in self.chunk_counts.items() if count > 1},
+            }, f)
+
+    @classmethod
+    def load(cls, path: str) -> "BoilerplateFilter":
+        with open(path) as f:
+            state = json.load(f)
+        boilerplate = cls(
+            min_document_frequency=state["min_document_frequency"],
+            min_documents=state["min_documents"],
+            min_line_chars=state["min_line_chars"],
+            model_batch_size=state.get("model_batch_size", 16),
+        )
+        boilerplate.documents_seen = state["documents_seen"]
+        boilerplate.line_counts = Counter({int(key): count for key, count in state["line_counts"].items()})
+        boilerplate.chunk_counts = Counter({int(key): count for key, count in state["chunk_counts"].items()})
+        boilerplate.refresh()
+        return boilerplate
@@ -0,0 +1,246 @@
+"""Compressed sparse row snapshot of the Neo4j `Entity` graph.
+
+Multi-hop exploration for reasoning chains runs locally on NumPy arrays
+instead of Neo4j round-trips or networkx dicts. A snapshot is a directory of
+`.npy` files that can be opened memory-mapped, so several workers can share
+one copy of the graph through the page cache.
+"""
+
+import json
+import logging
+import os
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from neo4j import Driver
+
+logger = logging.getLogger(__name__)
+
+_ARRAYS = ("indptr", "indices", "relations", "name_offsets", "name_bytes", "name_order")
+
+
+@dataclass
+class CSRGraph:
+    """Entity graph as CSR adjacency with an interned node and relation table."""
+
+    indptr: np.ndarray
+    """Row pointers, `indptr[i]:indptr[i + 1]` slices the edges of node i."""
+
+    indices: np.ndarray
+    """Target node id of every edge."""
+
+    relations: np.ndarray
+    """Relation type id of every edge, indexing `relation_types`."""
+
+    name_offsets: np.ndarray
+    """Offsets into `name_bytes`; node i is `name_bytes[offsets[i]:offsets[i + 1]]`."""
+
+    name_bytes: np.ndarray
+    """UTF-8 encoded node names, concatenated."""
+
+    name_order: np.ndarray
+    """Node ids sorted by encoded name, binary searched by `node_id`."""
+
+    relation_types: list[str]
+
+    undirected: bool = True
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.indptr) - 1
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.indices)
+
+    @classmethod
+    def from_edges(cls, edges: Iterable[tuple[str, str, str]], undirected: bool = True) -> "CSRGraph":
+        """Build a snapshot from (head, relation, tail) triples."""
+        name_ids: dict[str, int] = {}
+        relation_ids: dict[str, int] = {}
+        heads, tails, rels = [], [], []
+        for head, relation, tail in edges:
+            heads.append(name_ids.setdefault(head, len(name_ids)))
+            tails.append(name_ids.setdefault(tail, len(name_ids)))
+            rels.append(relation_ids.setdefault(relation or "", len(relation_ids)))
+
+        src = np.asarray(heads, dtype=np.int32)
+        dst = np.asarray(tails, dtype=np.int32)
+        rel = np.asarray(rels, dtype=np.int32)
+        if undirected:
+            src, dst = np.concatenate([src, dst]), np.concatenate([dst, src])
+            rel = np.concatenate([rel, rel])
+
+        order = np.lexsort((dst, src))
+        src, dst, rel = src[order], dst[order], rel[order]
+        indptr = np.zeros(len(name_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=len(name_ids)), out=indptr[1:])
+
+        encoded = [name.encode("utf-8") for name in name_ids]
+        name_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(name) for name in encoded], out=name_offsets[1:])
+        name_bytes = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        name_order = np.array(sorted(range(len(encoded)), key=encoded.__getitem__), dtype=np.int64)
+
+        return cls(
+            indptr=indptr,
+            indices=dst,
+            relations=rel,
+            name_offsets=name_offsets,
+            name_bytes=name_bytes,
+            name_order=name_order,
+            relation_types=list(relation_ids),
+            undirected=undirected,
+        )
+
+    @classmethod
+    def from_neo4j(cls, driver: "Driver", database: str | None = None, undirected: bool = True, fetch_size: int = 10_000) -> "CSRGraph":
+        """Snapshot every relationship between `Entity` nodes, whatever its type."""
+        graph = cls.from_edges(_stream_neo4j_edges(driver, database, fetch_size), undirected=undirected)
+        logger.info(f"Snapshotted {graph.num_nodes} entities and {graph.num_edges} edges")
+        return graph
+
+    def save(self, path: str) -> None:
+        """Write the snapshot as a directory of `.npy` files."""
+        os.makedirs(path, exist_ok=True)
+        for name in _ARRAYS:
+            np.save(os.path.join(path, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump({"relation_types": self.relation_types, "undirected": self.undirected}, f)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "CSRGraph":
+        """Open a snapshot, memory-mapped by default."""
+        mode = "r" if mmap else None
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mode) for name in _ARRAYS}
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        return cls(**arrays, relation_types=meta["relation_types"], undirected=meta["undirected"])
+
+    def name(self, node: int) -> str:
+        return self._name_bytes(node).decode("utf-8")
+
+    def _name_bytes(self, node: int) -> bytes:
+        return self.name_bytes[self.name_offsets[node]:self.name_offsets[node + 1]].tobytes()
+
+    def node_id(self, name: str) -> int | None:
+        """Binary search the persisted name order, so a mapped snapshot needs no per-process dict."""
+        target = name.encode("utf-8")
+        low, high = 0, len(self.name_order)
+        while low < high:
+            mid = (low + high) // 2
+            if self._name_bytes(int(self.name_order[mid])) < target:
+                low = mid + 1
+            else:
+                high = mid
+        if low < len(self.name_order):
+            node = int(self.name_order[low])
+            if self._name_bytes(node) == target:
+                return node
+        return None
+
+    def neighbors(self, node: int) -> np.ndarray:
+        return self.indices[self.indptr[node]:self.indptr[node + 1]]
+
+    def k_hop(self, node: int, k: int, max_nodes: int | None = None) -> dict[int, int]:
+        """Return {node: hop distance} for every node within k hops."""
+        distance = {node: 0}
+        visited = np.zeros(self.num_nodes, dtype=bool)
+        visited[node] = True
+        frontier = np.array([node], dtype=np.int64)
+        for hop in range(1, k + 1):
+            candidates = np.unique(self._gather(frontier))
+            frontier = candidates[~visited[candidates]]
+            if len(frontier) == 0:
+                break
+            if max_nodes is not None and len(distance) + len(frontier) > max_nodes:
+                frontier = frontier[: max_nodes - len(distance)]
+            visited[frontier] = True
+            distance.update(dict.fromkeys(frontier.tolist(), hop))
+            if max_nodes is not None and len(distance) >= max_nodes:
+                break
+        return distance
+
+    def shortest_path(self, source: int, target: int, max_depth: int = 6) -> list[int] | None:
+        """Unweighted shortest path by level-synchronous BFS."""
+        if source == target:
+            return [source]
+        parent = np.full(self.num_nodes, -1, dtype=np.int64)
+        parent[source] = source
+        frontier = np.array([source], dtype=np.int64)
+        for _ in range(max_depth):
+            lengths = self.indptr[frontier + 1] - self.indptr[frontier]
+            targets = self._gather(frontier)
+            origins = np.repeat(frontier, lengths)
+            fresh = parent[targets] == -1
+            targets, origins = targets[fresh], origins[fresh]
+            if len(targets) == 0:
+                return None
+            targets, first = np.unique(targets, return_index=True)
+            parent[targets] = origins[first]
+            if parent[target] != -1:
+                path = [target]
+                while path[-1] != source:
+                    path.append(int(parent[path[-1]]))
+                return path[::-1]
+            frontier = targets
+        return None
+
+    def random_walks(self, starts: Iterable[int], length: int, walks_per_node: int = 1, seed: int | None = None) -> np.ndarray:
+        """Uniform random walks; rows are padded with -1 after a dead end."""
+        rng = np.random.default_rng(seed)
+        current = np.repeat(np.fromiter(starts, dtype=np.int64), walks_per_node)
+        walks = np.full((len(current), length + 1), -1, dtype=np.int64)
+        walks[:, 0] = current
+        alive = np.ones(len(current), dtype=bool)
+        for step in range(1, length + 1):
+            degree = self.indptr[current + 1] - self.indptr[current]
+            alive &= degree > 0
+            if not alive.any():
+                break
+            offset = (rng.random(alive.sum()) * degree[alive]).astype(np.int64)
+            current[alive] = self.indices[self.indptr[current[alive]] + offset]
+            walks[alive, step] = current[alive]
+        return walks
+
+    def candidate_entity_ids(self, seeds: Iterable[str], hops: int = 2, max_candidates: int = 50) -> list[str]:
+        """Entity names near the seeds, closest first, as `Chain.entity_ids` candidates."""
+        best: dict[int, int] = {}
+        for seed in seeds:
+            node = self.node_id(seed)
+            if node is None:
+                continue
+            for other, hop in self.k_hop(node, hops).items():
+                if hop < best.get(other, hops + 1):
+                    best[other] = hop
+        ranked = sorted(best.items(), key=lambda item: (item[1], -self._degree(item[0])))
+        return [self.name(node) for node, _ in ranked[:max_candidates]]
+
+    def _degree(self, node: int) -> int:
+        return int(self.indptr[node + 1] - self.indptr[node])
+
+    def _gather(self, frontier: np.ndarray) -> np.ndarray:
+        """Concatenate the adjacency slices of every node in the frontier."""
+        starts = self.indptr[frontier]
+        lengths = self.indptr[frontier + 1] - starts
+        total = int(lengths.sum())
+        if total == 0:
+            return np.empty(0, dtype=self.indices.dtype)
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        return self.indices[offsets + np.arange(total)]
+
+
+def _stream_neo4j_edges(driver: "Driver", database: str | None, fetch_size: int) -> Iterator[tuple[str, str, str]]:
+    with driver.session(database=database, fetch_size=fetch_size) as session:
+        # the APOC write path stores the relation as a dynamic type, the
+        # fallback as RELATED_TO with a relation_type property
+        result = session.run(
+            "MATCH (h:Entity)-[r]->(t:Entity) "
+            "RETURN h.name AS head, coalesce(r.relation_type, type(r)) AS relation, t.name AS tail"
+        )
+        for record in result:
+            yield record["head"], record["relation"], record["tail"]
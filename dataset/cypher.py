@@ -1,33 +1,150 @@
 from langchain_community.graphs import Neo4jGraph
 from langchain.chains import create_history_aware_retriever
 from langchain_core.prompts import PromptTemplate,MessagesPlaceholder,ChatPromptTemplate
-from model.llm import 
-import json 
+import json
+
+ENTITY_LABEL = "__Entity__"
+DOCUMENT_LABEL = "Document"
+PAPER_LABEL = "Paper"
+
 
 class Graph:
+    """Per-paper scoping of the LangChain entity graph.
+
+    Nodes belonging to a paper are tied to a `Paper {doi}` node (entities via
+    `IN_PAPER`, documents via `PART_OF` plus an indexed `doi` property) instead
+    of being relabelled, so scoping an ingest only touches that ingest's nodes.
+    """
+
     DOI: str
-    source: str 
+    source: str
     abstract: str
     subjects: str
-    
-    def set_entity(self , DOI):
+
+    def __init__(self, graph: Neo4jGraph, batch_size: int = 1000):
+        self.graph = graph
+        self.batch_size = batch_size
+        self._indexes_ready = False
+
+    def ensure_doi_indexes(self):
+        """Create the indexes used for per-paper lookups (idempotent)."""
+        if self._indexes_ready:
+            return
         self.graph.query(
-            f"""
-                MATCH(n:`__Entity__`)
-                REMOVE n:`__Entity__`
-                SET n: `__Entity__{DOI}`
-            """
+            f"CREATE CONSTRAINT paper_doi IF NOT EXISTS "
+            f"FOR (p:`{PAPER_LABEL}`) REQUIRE p.doi IS UNIQUE"
+        )
+        self.graph.query(
+            f"CREATE INDEX document_doi IF NOT EXISTS FOR (d:`{DOCUMENT_LABEL}`) ON (d.doi)"
         )
-
-    def set_document(self,DOI):
         self.graph.query(
+            f"CREATE INDEX entity_id IF NOT EXISTS FOR (n:`{ENTITY_LABEL}`) ON (n.id)"
+        )
+        self.graph.query(
+            f"CREATE INDEX document_id IF NOT EXISTS FOR (d:`{DOCUMENT_LABEL}`) ON (d.id)"
+        )
+        self._indexes_ready = True
+
+    def set_entity(self, DOI, entity_ids: list[str]):
+        """Attach the given entity nodes to the paper identified by DOI."""
+        self.ensure_doi_indexes()
+        for i in range(0, len(entity_ids), self.batch_size):
+            self.graph.query(
+                f"""
+                    MERGE (p:`{PAPER_LABEL}` {{doi: $doi}})
+                    WITH p
+                    UNWIND $ids AS entity_id
+                    MATCH (n:`{ENTITY_LABEL}` {{id: entity_id}})
+                    MERGE (n)-[:IN_PAPER]->(p)
+                """,
+                {"doi": DOI, "ids": entity_ids[i:i + self.batch_size]},
+            )
+
+    def set_document(self, DOI, document_ids: list[str]):
+        """Tag the given document nodes with the paper DOI."""
+        self.ensure_doi_indexes()
+        for i in range(0, len(document_ids), self.batch_size):
+            self.graph.query(
+                f"""
+                    MERGE (p:`{PAPER_LABEL}` {{doi: $doi}})
+                    WITH p
+                    UNWIND $ids AS document_id
+                    MATCH (d:`{DOCUMENT_LABEL}` {{id: document_id}})
+                    SET d.doi = $doi
+                    MERGE (d)-[:PART_OF]->(p)
+                """,
+                {"doi": DOI, "ids": document_ids[i:i + self.batch_size]},
+            )
+
+    def ingest(self, DOI, graph_documents: list) -> dict[str, int]:
+        """Write graph documents for one paper and scope only the nodes they created."""
+        self.graph.add_graph_documents(
+            graph_documents, baseEntityLabel=True, include_source=True
+        )
+        # add_graph_documents fills in source.metadata["id"] for sources without one
+        entity_ids = list({node.id for doc in graph_documents for node in doc.nodes})
+        document_ids = list({doc.source.metadata["id"] for doc in graph_documents})
+        self.set_entity(DOI, entity_ids)
+        self.set_document(DOI, document_ids)
+        return {"entities": len(entity_ids), "documents": len(document_ids)}
+
+    def get_paper_entities(self, DOI) -> list[dict]:
+        """Return the entity nodes of one paper."""
+        return self.graph.query(
             f"""
-                MATCH (n:`Document`)
-                REMOVE n:`Document`
-                SET n:`Document{DOI}`
-            """
+                MATCH (:`{PAPER_LABEL}` {{doi: $doi}})<-[:IN_PAPER]-(n:`{ENTITY_LABEL}`)
+                RETURN n.id AS id, labels(n) AS labels
+            """,
+            {"doi": DOI},
         )
-        
 
-    def 
-    
\ No newline at end of file
+    def migrate_doi_labels(self) -> dict[str, int]:
+        """Convert legacy `__Entity__{DOI}` / `Document{DOI}` labels to DOI scoping.
+
+        The legacy scheme re-created an entity for every paper that mentioned
+        it, so each legacy node is merged (with its relationships) into the
+        single base-labelled node with the same id. Works label by label in
+        batches so it can run against a live graph; needs APOC, like
+        `Neo4jGraph.add_graph_documents`.
+        """
+        self.ensure_doi_indexes()
+        migrated = {"entities": 0, "documents": 0}
+        labels = [row["label"] for row in self.graph.query("CALL db.labels() YIELD label RETURN label")]
+        for label in labels:
+            if label.startswith(ENTITY_LABEL) and label != ENTITY_LABEL:
+                doi = label[len(ENTITY_LABEL):]
+                migrated["entities"] += self._migrate_label(
+                    label, doi, ENTITY_LABEL, "MERGE (n)-[:IN_PAPER]->(p)"
+                )
+            elif label.startswith(DOCUMENT_LABEL) and label != DOCUMENT_LABEL:
+                doi = label[len(DOCUMENT_LABEL):]
+                migrated["documents"] += self._migrate_label(
+                    label, doi, DOCUMENT_LABEL, "SET n.doi = $doi MERGE (n)-[:PART_OF]->(p)"
+                )
+        return migrated
+
+    def _migrate_label(self, label: str, doi: str, base_label: str, link_clause: str) -> int:
+        escaped = label.replace("`", "``")
+        total = 0
+        while True:
+            rows = self.graph.query(
+                f"""
+                    MERGE (p:`{PAPER_LABEL}` {{doi: $doi}})
+                    WITH p
+                    MATCH (n:`{escaped}`)
+                    WITH p, n LIMIT $limit
+                    MERGE (m:`{base_label}` {{id: n.id}})
+                    WITH p, m, n
+                    CALL apoc.refactor.mergeNodes([m, n], {{properties: "discard", mergeRels: true}})
+                    YIELD node
+                    REMOVE node:`{escaped}`
+                    WITH p, node AS n
+                    {link_clause}
+                    RETURN count(n) AS migrated
+                """,
+                {"doi": doi, "limit": self.batch_size},
+            )
+            count = rows[0]["migrated"] if rows else 0
+            total += count
+            if count < self.batch_size:
+                return total
@@ -1,27 +1,26 @@
+from __future__ import annotations
+
 import os
 import glob
-from typing import List, Dict, Any, Tuple
+import sys
+import time
+from collections import deque
+from typing import TYPE_CHECKING, List, Dict, Any, Tuple, Iterator
 from pathlib import Path
-from langchain_community.graphs import Neo4jGraph
-from langchain.chains import create_history_aware_retriever
-from langchain_core.prompts import PromptTemplate,MessagesPlaceholder,ChatPromptTemplate
-from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
-import pandas as pd
-from neo4j import GraphDatabase
-from langchain_community.document_loaders import PyPDFLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter, CharacterTextSplitter
-from langchain.schema import Document
 import logging
+from functools import lru_cache
+from dataset.schema import ensure_schema
+from database import metrics
+from database.tracing import current_span, span, traced
+
+# langchain, transformers and the Neo4j driver are imported on first use so that
+# importing this module (e.g. for a worker or CLI) does not pay for them
+if TYPE_CHECKING:
+    from langchain.schema import Document
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-graph = Neo4jGraph(
-    url=os.getenv("NEO4J_URI"),
-    username=os.getenv("NEO4J_USER"),
-    password=os.getenv("NEO4J_PASSWORD"),
-)
-
 gen_kwargs = {
     "max_length": 256,
     "length_penalty": 0,
@@ -31,13 +30,25 @@ gen_kwargs = {
 
 triples = []
 
-driver = GraphDatabase.driver(URI, auth=AUTH)
+
+@lru_cache(maxsize=1)
+def get_driver():
+    """Neo4j driver, created on first call"""
+    from neo4j import GraphDatabase
+    return GraphDatabase.driver(
+        os.getenv("NEO4J_URI"),
+        auth=(os.getenv("NEO4J_USER"), os.getenv("NEO4J_PASSWORD")),
+    )
+
 
 class PDFProcessor:
     def __init__(self, 
                  chunk_size: int = 1000, 
                  chunk_overlap: int = 200,
-                 splitter_type: str = "recursive"):
+                 splitter_type: str = "recursive",
+                 max_pages: int = None,
+                 max_bytes: int = None,
+                 stats_history: int = 1000):
         """
         Initialize PDF processor with text splitting parameters
         
@@ -45,10 +56,18 @@ class PDFProcessor:
             chunk_size: Size of each text chunk
             chunk_overlap: Overlap between chunks
             splitter_type: Type of splitter ('recursive' or 'character')
+            max_pages: Stop streaming a document after this many pages
+            max_bytes: Stop streaming a document after this much extracted text
+            stats_history: Number of recent documents kept in document_stats
         """
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        self.max_pages = max_pages
+        self.max_bytes = max_bytes
+        # most recent last; bounded so a long-running pipeline does not grow it forever
+        self.document_stats: deque[Dict[str, Any]] = deque(maxlen=stats_history)
         
+        from langchain.text_splitter import RecursiveCharacterTextSplitter, CharacterTextSplitter
         if splitter_type == "recursive":
             self.text_splitter = RecursiveCharacterTextSplitter(
                 chunk_size=chunk_size,
@@ -63,7 +82,94 @@ class PDFProcessor:
                 separator="\n"
             )
     
-    
+    def _start_stats(self, pdf_path: str) -> Dict[str, Any]:
+        stats = {
+            "source": pdf_path, "pages": 0, "bytes": 0, "chunks": 0, "truncated": False,
+            "rss_high_water": _current_rss_bytes(),
+        }
+        self.document_stats.append(stats)
+        return stats
+
+    def iter_pages(self, pdf_path: str, stats: Dict[str, Any] = None) -> Iterator[Document]:
+        """
+        Lazily yield the pages of a PDF, honouring the max_pages / max_bytes guards
+        """
+        from langchain_community.document_loaders import PyPDFLoader
+        if stats is None:
+            stats = self._start_stats(pdf_path)
+        for page in PyPDFLoader(pdf_path).lazy_load():
+            size = len(page.page_content.encode("utf-8"))
+            if (self.max_pages is not None and stats["pages"] >= self.max_pages) or \
+                    (self.max_bytes is not None and stats["bytes"] + size > self.max_bytes):
+                stats["truncated"] = True
+                logger.warning(f"Truncated {pdf_path} after {stats['pages']} pages ({stats['bytes']} bytes)")
+                break
+            stats["pages"] += 1
+            stats["bytes"] += size
+            stats["rss_high_water"] = max(stats["rss_high_water"], _current_rss_bytes())
+            yield page
+
+    def iter_chunks(self, pdf_path: str) -> Iterator[Document]:
+        """
+        Stream chunks of a PDF page by page, carrying the unfinished tail of each
+        page (which already contains the chunk overlap) into the next one
+        
+        Args:
+            pdf_path: Path to the PDF
+            
+        Yields:
+            Document chunks with source and starting page metadata
+        """
+        from langchain.schema import Document
+        stats = self._start_stats(pdf_path)
+        carry = ""
+        # (offset, page number) of each page that starts inside `carry`
+        page_starts: List[Tuple[int, int]] = []
+
+        def page_at(offset: int) -> int:
+            return next(page for start, page in reversed(page_starts) if start <= offset)
+
+        for page in self.iter_pages(pdf_path, stats):
+            separator = "\n" if carry else ""
+            page_starts.append((len(carry) + len(separator), page.metadata.get("page", len(page_starts))))
+            text = carry + separator + page.page_content
+            chunks = self.text_splitter.split_text(text)
+            if not chunks:
+                continue
+
+            cursor = 0
+            for chunk in chunks[:-1]:
+                start = text.find(chunk, cursor)
+                start = cursor if start < 0 else start
+                cursor = start + 1
+                stats["chunks"] += 1
+                yield Document(page_content=chunk, metadata={"source": pdf_path, "page": page_at(start)})
+
+            # the last chunk may continue on the next page; keep it (and its pages) as the carry
+            carry_start = max(text.rfind(chunks[-1]), 0)
+            carry_page = page_at(carry_start)
+            carry = chunks[-1]
+            page_starts = [(0, carry_page)] + [
+                (start - carry_start, page) for start, page in page_starts if start > carry_start
+            ]
+
+        if carry:
+            stats["chunks"] += 1
+            yield Document(page_content=carry, metadata={"source": pdf_path, "page": page_starts[0][1]})
+
+        logger.info(f"{os.path.basename(pdf_path)}: {stats['pages']} pages, {stats['chunks']} chunks, "
+                    f"RSS high-water {stats['rss_high_water'] / 2**20:.1f} MiB")
+
+    def load_single_pdf(self, pdf_path: str) -> List[Document]:
+        """
+        Load and split one PDF through the page stream
+        """
+        try:
+            return list(self.iter_chunks(pdf_path))
+        except Exception as e:
+            logger.error(f"Failed to load {pdf_path}: {e}")
+            return []
+
     def load_all_pdfs(self, directory_path: str) -> Dict[str, List[Document]]:
         """
         Load and split all PDFs from a directory
@@ -100,6 +206,18 @@ class PDFProcessor:
         return results
     
 
+def _current_rss_bytes() -> int:
+    """Resident set size of this process, used for per-document memory high-water marks"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+        # ru_maxrss is the process-wide peak (KiB on Linux, bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
 def extract_triplets(text):
     triplets = []
     relation, subject, relation, object_ = '', '', '', ''
@@ -132,22 +250,34 @@ def extract_triplets(text):
     return triplets
 
 
-def generate_triples(texts):
-    tokenizer = AutoTokenizer.from_pretrained("Babelscape/rebel-large")
-    model = AutoModelForSeq2SeqLM.from_pretrained("Babelscape/rebel-large")
+@lru_cache(maxsize=1)
+def load_rebel(model_name: str = "Babelscape/rebel-large"):
+    """Load the REBEL tokenizer and model once per process"""
+    from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
+    return tokenizer, model
 
 
-    model_inputs = tokenizer(texts, max_length=512, padding=True, truncation=True, return_tensors='pt')
-    generated_tokens = model.generate(
-        model_inputs["input_ids"].to(model.device),
-        attention_mask=model_inputs["attention_mask"].to(model.device),
-        **gen_kwargs
-    )
-    decoded_preds = tokenizer.batch_decode(generated_tokens, skip_special_tokens=False)
-    for idx, sentence in enumerate(decoded_preds):
-        et = extract_triplets(sentence)
-        for t in et:
-            triples.append((t['head'], t['type'], t['tail']))
+def generate_triples(texts) -> List[Tuple[str, str, str]]:
+    tokenizer, model = load_rebel()
+
+    with span("rebel.generate_triples", texts=len(texts), input_chars=sum(len(text) for text in texts)) as s:
+        model_inputs = tokenizer(texts, max_length=512, padding=True, truncation=True, return_tensors='pt')
+        generated_tokens = model.generate(
+            model_inputs["input_ids"].to(model.device),
+            attention_mask=model_inputs["attention_mask"].to(model.device),
+            **gen_kwargs
+        )
+        decoded_preds = tokenizer.batch_decode(generated_tokens, skip_special_tokens=False)
+        batch_triples = []
+        for idx, sentence in enumerate(decoded_preds):
+            et = extract_triplets(sentence)
+            for t in et:
+                batch_triples.append((t['head'], t['type'], t['tail']))
+        s.set(input_tokens=int(model_inputs["attention_mask"].sum()), output_tokens=int(generated_tokens.numel()),
+              triples=len(batch_triples))
+    return batch_triples
 
 def clean_node_name(self, name: str) -> str:
     """Clean node names for Neo4j storage"""
@@ -167,6 +297,17 @@ def clean_relation_name(self, relation: str) -> str:
     return cleaned[:50]  # Limit length
 
 
+def _driver(owner):
+    """The caller's own driver if it has one, otherwise the shared one"""
+    return getattr(owner, "driver", None) or get_driver()
+
+
+def create_neo4j_indexes(self) -> bool:
+    """Bootstrap constraints and indexes for the entity graph (once per process)"""
+    return ensure_schema(_driver(self))
+
+
+@traced("neo4j.load_triplets_to_neo4j")
 def load_triplets_to_neo4j(self, 
                         triples: List[Tuple[str, str, str]], 
                         source_info: Dict[str, Any] = None,
@@ -193,91 +334,104 @@ def load_triplets_to_neo4j(self,
         batch = triples[i:i + batch_size]
         logger.info(f"Loading batch {i//batch_size + 1}/{(len(triples)-1)//batch_size + 1}")
         
-        try:
-            with self.driver.session() as session:
-                batch_data = []
-                for head, relation, tail in batch:
-                    cleaned_head = self.clean_node_name(head)
-                    cleaned_tail = self.clean_node_name(tail)
-                    cleaned_relation = self.clean_relation_name(relation)
+        started = time.perf_counter()
+        status = "ok"
+        with span("neo4j.write_batch", triples=len(batch)) as batch_span:
+            try:
+                with _driver(self).session() as session:
+                    batch_data = []
+                    for head, relation, tail in batch:
+                        cleaned_head = self.clean_node_name(head)
+                        cleaned_tail = self.clean_node_name(tail)
+                        cleaned_relation = self.clean_relation_name(relation)
                     
-                    if cleaned_head and cleaned_tail and cleaned_relation:
-                        batch_data.append({
-                            'head': cleaned_head,
-                            'tail': cleaned_tail,
-                            'relation': cleaned_relation,
-                            'source': source_info.get('source', 'unknown') if source_info else 'unknown',
-                            'source_file': source_info.get('file', 'unknown') if source_info else 'unknown'
-                        })
+                        if cleaned_head and cleaned_tail and cleaned_relation:
+                            batch_data.append({
+                                'head': cleaned_head,
+                                'tail': cleaned_tail,
+                                'relation': cleaned_relation,
+                                'source': source_info.get('source', 'unknown') if source_info else 'unknown',
+                                'source_file': source_info.get('file', 'unknown') if source_info else 'unknown'
+                            })
                 
-                if not batch_data:
-                    continue
+                    if not batch_data:
+                        status = "empty"
+                        continue
                 
-                cypher_query = """
-                UNWIND $batch AS row
+                    cypher_query = """
+                    UNWIND $batch AS row
                 
-                // Create or merge head entity
-                MERGE (head:Entity {name: row.head})
-                ON CREATE SET head.created_at = datetime(),
-                            head.source = row.source
-                ON MATCH SET head.last_seen = datetime()
+                    // Create or merge head entity
+                    MERGE (head:Entity {name: row.head})
+                    ON CREATE SET head.created_at = datetime(),
+                                head.source = row.source
+                    ON MATCH SET head.last_seen = datetime()
                 
-                // Create or merge tail entity  
-                MERGE (tail:Entity {name: row.tail})
-                ON CREATE SET tail.created_at = datetime(),
-                            tail.source = row.source
-                ON MATCH SET tail.last_seen = datetime()
+                    // Create or merge tail entity  
+                    MERGE (tail:Entity {name: row.tail})
+                    ON CREATE SET tail.created_at = datetime(),
+                                tail.source = row.source
+                    ON MATCH SET tail.last_seen = datetime()
                 
-                // Create relationship with dynamic type
-                WITH head, tail, row
-                CALL apoc.create.relationship(head, row.relation, {
-                    created_at: datetime(),
-                    source: row.source,
-                    source_file: row.source_file
-                }, tail) YIELD rel
+                    // Create relationship with dynamic type
+                    WITH head, tail, row
+                    CALL apoc.create.relationship(head, row.relation, {
+                        created_at: datetime(),
+                        source: row.source,
+                        source_file: row.source_file
+                    }, tail) YIELD rel
                 
-                RETURN count(rel) as relationships_created
-                """
+                    RETURN count(rel) as relationships_created
+                    """
                 
-                simple_query = """
-                UNWIND $batch AS row
+                    simple_query = """
+                    UNWIND $batch AS row
                 
-                // Create or merge entities and relationship
-                MERGE (head:Entity {name: row.head})
-                ON CREATE SET head.created_at = datetime(),
-                            head.source = row.source
+                    // Create or merge entities and relationship
+                    MERGE (head:Entity {name: row.head})
+                    ON CREATE SET head.created_at = datetime(),
+                                head.source = row.source
                 
-                MERGE (tail:Entity {name: row.tail})
-                ON CREATE SET tail.created_at = datetime(),
-                            tail.source = row.source
+                    MERGE (tail:Entity {name: row.tail})
+                    ON CREATE SET tail.created_at = datetime(),
+                                tail.source = row.source
                 
-                MERGE (head)-[r:RELATED_TO]->(tail)
-                ON CREATE SET r.relation_type = row.relation,
-                            r.created_at = datetime(),
-                            r.source = row.source,
-                            r.source_file = row.source_file
+                    MERGE (head)-[r:RELATED_TO]->(tail)
+                    ON CREATE SET r.relation_type = row.relation,
+                                r.created_at = datetime(),
+                                r.source = row.source,
+                                r.source_file = row.source_file
                 
-                RETURN count(r) as relationships_created
-                """
+                    RETURN count(r) as relationships_created
+                    """
                 
-                # Try APOC query first, fall back to simple query
-                try:
-                    result = session.run(cypher_query, batch=batch_data)
-                    summary = result.consume()
-                except:
-                    logger.info("APOC not available, using simple relationships")
-                    result = session.run(simple_query, batch=batch_data)
-                    summary = result.consume()
+                    # Try APOC query first, fall back to simple query
+                    try:
+                        result = session.run(cypher_query, batch=batch_data)
+                        summary = result.consume()
+                    except:
+                        logger.info("APOC not available, using simple relationships")
+                        result = session.run(simple_query, batch=batch_data)
+                        summary = result.consume()
                 
-                # Update statistics
-                stats["nodes"] += summary.counters.nodes_created
-                stats["relationships"] += summary.counters.relationships_created
+                    # Update statistics
+                    stats["nodes"] += summary.counters.nodes_created
+                    stats["relationships"] += summary.counters.relationships_created
+                    batch_span.set(rows=len(batch_data), nodes=summary.counters.nodes_created,
+                                   relationships=summary.counters.relationships_created)
                 
-        except Exception as e:
-            logger.error(f"Error loading batch: {e}")
-            stats["errors"] += len(batch)
+            except Exception as e:
+                logger.error(f"Error loading batch: {e}")
+                stats["errors"] += len(batch)
+                batch_span.set(errors=len(batch))
+                metrics.NEO4J_ERRORS.inc(len(batch))
+                status = "error"
+            finally:
+                # also reached through the `continue` for batches with nothing to write
+                metrics.NEO4J_BATCH_LATENCY.observe(time.perf_counter() - started, status=status)
     
     logger.info(f"Loading complete. Stats: {stats}")
+    current_span().set(**stats)
     return stats
     
     
@@ -0,0 +1,204 @@
+"""MinHash-LSH index for near-duplicate passages across the corpus.
+
+Chunks produced by `PDFProcessor` are shingled into word n-grams, reduced to
+MinHash signatures and bucketed with LSH banding, so overlapping passages
+(plagiarism, "subsumed by another publication") are found across the whole
+corpus without comparing a paper to every other paper.
+"""
+
+import json
+import os
+import re
+import zlib
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+_TOKEN_RE = re.compile(r"\w+")
+
+
+@dataclass
+class OverlapMatch:
+    chunk_index: int
+    """Index of the chunk in the queried paper."""
+
+    other_doc_id: str
+    other_chunk_index: int
+    similarity: float
+    """Estimated Jaccard similarity of the two chunks' shingle sets."""
+
+    other_text: str = ""
+
+
+def shingles(text: str, size: int = 5) -> set[int]:
+    """Hash word n-grams of normalised text to stable 32-bit integers."""
+    tokens = _TOKEN_RE.findall(text.lower())
+    if len(tokens) < size:
+        return {zlib.crc32(" ".join(tokens).encode())} if tokens else set()
+    return {
+        zlib.crc32(" ".join(tokens[i:i + size]).encode())
+        for i in range(len(tokens) - size + 1)
+    }
+
+
+class MinHashLSHIndex:
+    """Persistent MinHash-LSH index over document chunks."""
+
+    def __init__(
+        self,
+        num_perm: int = 128,
+        bands: int = 32,
+        shingle_size: int = 5,
+        threshold: float = 0.5,
+        seed: int = 1,
+        store_text: bool = True,
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.threshold = threshold
+        self.seed = seed
+        self.store_text = store_text
+
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 1 << 32, size=num_perm, dtype=np.uint64)
+
+        self._signatures: list[np.ndarray] = []
+        self._chunks: list[tuple[str, int]] = []
+        self._texts: list[str] = []
+        self._doc_chunks: dict[str, list[int]] = {}
+        self._buckets: list[dict[bytes, list[int]]] = [{} for _ in range(bands)]
+
+    def __len__(self) -> int:
+        return len(self._chunks)
+
+    def signature(self, text: str) -> np.ndarray | None:
+        """MinHash signature, or None for text without word shingles (rules, dashes, symbols)."""
+        hashes = np.fromiter(shingles(text, self.shingle_size), dtype=np.uint64)
+        if len(hashes) == 0:
+            # an all-max signature would match every other empty chunk at 1.0
+            return None
+        permuted = (np.outer(hashes, self._a) + self._b) % _MERSENNE_PRIME & _MAX_HASH
+        return permuted.min(axis=0).astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray) -> list[bytes]:
+        return [band.tobytes() for band in signature.reshape(self.bands, self.rows)]
+
+    def add_document(self, doc_id: str, chunks: Sequence[Any]) -> int:
+        """Index the chunks of one paper, skipping chunks without words. Returns chunks added.
+
+        Already indexed papers are skipped.
+        """
+        if doc_id in self._doc_chunks:
+            return 0
+        positions = []
+        for chunk_index, chunk in enumerate(chunks):
+            text = _chunk_text(chunk)
+            signature = self.signature(text)
+            if signature is None:
+                continue
+            position = len(self._chunks)
+            self._signatures.append(signature)
+            self._chunks.append((doc_id, chunk_index))
+            self._texts.append(text if self.store_text else "")
+            for band, key in enumerate(self._band_keys(signature)):
+                self._buckets[band].setdefault(key, []).append(position)
+            positions.append(position)
+        self._doc_chunks[doc_id] = positions
+        return len(positions)
+
+    def query(self, chunks: Sequence[Any], exclude_doc_id: str | None = None, threshold: float | None = None) -> list[OverlapMatch]:
+        """Find indexed chunks overlapping any of the given chunks."""
+        threshold = self.threshold if threshold is None else threshold
+        matches = []
+        for chunk_index, chunk in enumerate(chunks):
+            signature = self.signature(_chunk_text(chunk))
+            if signature is None:
+                continue
+            candidates = set()
+            for band, key in enumerate(self._band_keys(signature)):
+                candidates.update(self._buckets[band].get(key, ()))
+            for position in candidates:
+                doc_id, other_index = self._chunks[position]
+                if doc_id == exclude_doc_id:
+                    continue
+                similarity = float(np.mean(self._signatures[position] == signature))
+                if similarity >= threshold:
+                    matches.append(OverlapMatch(
+                        chunk_index, doc_id, other_index, similarity, self._texts[position]
+                    ))
+        matches.sort(key=lambda match: match.similarity, reverse=True)
+        return matches
+
+    def query_document(self, doc_id: str, threshold: float | None = None) -> list[OverlapMatch]:
+        """Overlaps between an already indexed paper and the rest of the corpus."""
+        if not self.store_text:
+            raise ValueError("query_document needs store_text=True; use query() with the chunks")
+        texts = [self._texts[position] for position in self._doc_chunks.get(doc_id, [])]
+        return self.query(texts, exclude_doc_id=doc_id, threshold=threshold)
+
+    def save(self, path: str) -> None:
+        """Persist signatures and chunk metadata; buckets are rebuilt on load."""
+        os.makedirs(path, exist_ok=True)
+        signatures = (
+            np.stack(self._signatures) if self._signatures
+            else np.empty((0, self.num_perm), dtype=np.uint32)
+        )
+        np.save(os.path.join(path, "signatures.npy"), signatures)
+        with open(os.path.join(path, "chunks.json"), "w") as f:
+            json.dump({
+                "num_perm": self.num_perm,
+                "bands": self.bands,
+                "shingle_size": self.shingle_size,
+                "threshold": self.threshold,
+                "seed": self.seed,
+                "store_text": self.store_text,
+                "chunks": self._chunks,
+                "texts": self._texts,
+            }, f)
+
+    @classmethod
+    def load(cls, path: str) -> "MinHashLSHIndex":
+        with open(os.path.join(path, "chunks.json")) as f:
+            meta = json.load(f)
+        index = cls(
+            num_perm=meta["num_perm"],
+            bands=meta["bands"],
+            shingle_size=meta["shingle_size"],
+            threshold=meta["threshold"],
+            seed=meta["seed"],
+            store_text=meta["store_text"],
+        )
+        signatures = np.load(os.path.join(path, "signatures.npy"))
+        index._signatures = list(signatures)
+        index._chunks = [(doc_id, chunk_index) for doc_id, chunk_index in meta["chunks"]]
+        index._texts = meta["texts"]
+        for position, (doc_id, _) in enumerate(index._chunks):
+            index._doc_chunks.setdefault(doc_id, []).append(position)
+            for band, key in enumerate(index._band_keys(signatures[position])):
+                index._buckets[band].setdefault(key, []).append(position)
+        return index
+
+
+def overlap_evidence(matches: Iterable[OverlapMatch], limit: int = 10, max_chars: int = 300) -> str:
+    """Format overlap matches as evidence text for `CoTPaper.identify_entities`."""
+    lines = []
+    for match in list(matches)[:limit]:
+        lines.append(
+            f"- chunk {match.chunk_index} overlaps {match.other_doc_id} chunk "
+            f"{match.other_chunk_index} (estimated similarity {match.similarity:.2f}): "
+            f"{match.other_text[:max_chars]}"
+        )
+    return "\n".join(lines)
+
+
+def _chunk_text(chunk: Any) -> str:
+    return chunk if isinstance(chunk, str) else chunk.page_content
@@ -0,0 +1,257 @@
+"""Streaming ingestion pipeline: PDF page/chunk stream -> boilerplate -> embed -> REBEL -> normalize -> graph write.
+
+Stages are connected by bounded queues and each runs its own worker threads,
+so the CPU, model and database stages overlap and a slow stage applies
+backpressure upstream instead of letting the corpus pile up in memory.
+"""
+
+import glob
+import logging
+import os
+import queue
+import threading
+import time
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass, field
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+@dataclass
+class Stage:
+    name: str
+
+    fn: Callable[[Any], Any]
+    """Called with one item, or a list of items when batch_size > 1."""
+
+    workers: int = 1
+
+    queue_size: int = 16
+    """Capacity of this stage's input queue; a full queue blocks the producer."""
+
+    batch_size: int = 1
+
+    batch_timeout: float = 0.5
+    """Seconds to wait before flushing a partial batch."""
+
+    fan_out: bool = False
+    """If True, fn returns an iterable whose elements are emitted separately."""
+
+
+@dataclass
+class StageStats:
+    processed: int = 0
+    emitted: int = 0
+    errors: int = 0
+    busy_seconds: float = 0.0
+    max_queue_depth: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+
+class StreamingPipeline:
+    """Run stages concurrently over a source iterable."""
+
+    def __init__(self, stages: list[Stage], on_result: Callable[[Any], None] | None = None):
+        if not stages:
+            raise ValueError("A pipeline needs at least one stage")
+        self.stages = stages
+        self.on_result = on_result
+        self.stats = {stage.name: StageStats() for stage in stages}
+
+    def run(self, source: Iterable[Any]) -> dict[str, StageStats]:
+        """Feed the source through every stage and block until the pipeline drains."""
+        self.stats = {stage.name: StageStats() for stage in self.stages}
+        queues = [queue.Queue(maxsize=stage.queue_size) for stage in self.stages]
+        remaining = [stage.workers for stage in self.stages]
+        remaining_lock = threading.Lock()
+        threads = []
+        for index, stage in enumerate(self.stages):
+            for worker in range(stage.workers):
+                thread = threading.Thread(
+                    target=self._worker,
+                    args=(index, queues, remaining, remaining_lock),
+                    name=f"{stage.name}-{worker}",
+                    daemon=True,
+                )
+                thread.start()
+                threads.append(thread)
+
+        started = time.perf_counter()
+        try:
+            for item in source:
+                self._put(queues[0], item, self.stats[self.stages[0].name])
+        finally:
+            queues[0].put(_DONE)
+            for thread in threads:
+                thread.join()
+        elapsed = time.perf_counter() - started
+        for stage in self.stages:
+            stats = self.stats[stage.name]
+            utilisation = stats.busy_seconds / (elapsed * stage.workers) if elapsed else 0.0
+            logger.info(
+                f"Stage {stage.name}: {stats.processed} in, {stats.emitted} out, {stats.errors} errors, "
+                f"{utilisation:.0%} busy, max queue depth {stats.max_queue_depth}"
+            )
+        return self.stats
+
+    @staticmethod
+    def _put(target: queue.Queue, item: Any, stats: StageStats) -> None:
+        target.put(item)
+        depth = target.qsize()
+        if depth > stats.max_queue_depth:
+            stats.max_queue_depth = depth
+
+    def _worker(self, index: int, queues: list[queue.Queue], remaining: list[int], remaining_lock: threading.Lock) -> None:
+        stage = self.stages[index]
+        stats = self.stats[stage.name]
+        inbox = queues[index]
+        outbox = queues[index + 1] if index + 1 < len(self.stages) else None
+        next_stats = self.stats[self.stages[index + 1].name] if outbox is not None else None
+        batch: list[Any] = []
+
+        def emit(output: Any) -> None:
+            if output is None:
+                return
+            with stats._lock:
+                stats.emitted += 1
+            if outbox is not None:
+                self._put(outbox, output, next_stats)
+            elif self.on_result is not None:
+                self.on_result(output)
+
+        def process(payload: Any, count: int) -> None:
+            started = time.perf_counter()
+            try:
+                result = stage.fn(payload)
+                # a fan-out result is usually a lazy generator (e.g. the chunks
+                # of one PDF), so it can fail halfway; iterate it in the guard
+                # but without materialising it
+                for output in (result if stage.fan_out else [result]):
+                    emit(output)
+            except Exception as e:
+                logger.error(f"Stage {stage.name} failed on {count} item(s): {e}")
+                with stats._lock:
+                    stats.errors += count
+            finally:
+                with stats._lock:
+                    stats.processed += count
+                    stats.busy_seconds += time.perf_counter() - started
+
+        try:
+            while True:
+                try:
+                    item = inbox.get(timeout=stage.batch_timeout if batch else None)
+                except queue.Empty:
+                    process(batch, len(batch))
+                    batch = []
+                    continue
+                if item is _DONE:
+                    # let sibling workers see the sentinel too
+                    inbox.put(_DONE)
+                    break
+                if stage.batch_size > 1:
+                    batch.append(item)
+                    if len(batch) >= stage.batch_size:
+                        process(batch, len(batch))
+                        batch = []
+                else:
+                    process(item, 1)
+
+            if batch:
+                process(batch, len(batch))
+        finally:
+            # always hand the sentinel on, or run() would wait on this stage forever
+            with remaining_lock:
+                remaining[index] -= 1
+                last = remaining[index] == 0
+            if last and outbox is not None:
+                outbox.put(_DONE)
+
+
+def find_pdfs(directory_path: str) -> Iterable[str]:
+    """Lazily yield PDF paths under a directory."""
+    yield from sorted(glob.iglob(os.path.join(directory_path, "**", "*.pdf"), recursive=True))
+
+
+def build_ingestion_pipeline(
+    processor,
+    write_triples: Callable[[list[tuple[str, str, str]], dict[str, Any]], Any],
+    embed: Callable[[list[str]], Any] | None = None,
+    write_embeddings: Callable[[list[tuple[str, Any, Any]]], Any] | None = None,
+    boilerplate=None,
+    load_workers: int = 2,
+    embed_workers: int = 1,
+    rebel_workers: int = 1,
+    write_workers: int = 1,
+    model_batch_size: int = 16,
+    queue_size: int = 32,
+) -> StreamingPipeline:
+    """Wire the ingestion stages around a `PDFProcessor`.
+
+    `write_triples(triples, source_info)` persists one batch, e.g. a bound
+    `load_triplets_to_neo4j`. `embed(texts)` returns one vector per text and
+    is optional; it needs `write_embeddings(records)`, which persists a batch
+    of (path, chunk, vector) records. A fitted `BoilerplateFilter` strips
+    repeated publisher and license text before any model stage. Documents are
+    read page by page through `processor.iter_chunks`, so no stage ever holds
+    a whole PDF.
+    """
+    from dataset.graph import clean_node_name, clean_relation_name, generate_triples
+
+    if embed is not None and write_embeddings is None:
+        raise ValueError("embed needs write_embeddings to persist the vectors")
+
+    def load(path: str):
+        return ((path, chunk) for chunk in processor.iter_chunks(path))
+
+    def strip_boilerplate(item):
+        path, chunk = item
+        chunk = boilerplate.filter_chunk(chunk, source=path)
+        return (path, chunk) if chunk is not None else None
+
+    def embed_batch(items):
+        vectors = embed([chunk.page_content for _, chunk in items])
+        write_embeddings([(path, chunk, vector) for (path, chunk), vector in zip(items, vectors)])
+        # hand chunks on one by one; the rebel stage forms its own batches
+        return items
+
+    def rebel_batch(items):
+        by_source: dict[str, list] = {}
+        for path, chunk in items:
+            by_source.setdefault(path, []).append(chunk.page_content)
+        return [(path, generate_triples(texts)) for path, texts in by_source.items()]
+
+    def normalize(item):
+        path, raw_triples = item
+        cleaned = []
+        for head, relation, tail in raw_triples:
+            head, tail = clean_node_name(None, head), clean_node_name(None, tail)
+            relation = clean_relation_name(None, relation)
+            if head and tail and relation:
+                cleaned.append((head, relation, tail))
+        return (path, cleaned) if cleaned else None
+
+    def write(item):
+        path, cleaned = item
+        return write_triples(cleaned, {"source": "pdf", "file": os.path.basename(path)})
+
+    stages = [
+        Stage("load", load, workers=load_workers, queue_size=queue_size, fan_out=True),
+    ]
+    if boilerplate is not None:
+        boilerplate.model_batch_size = model_batch_size
+        # single worker: the filter's per-document state and counters are not locked
+        stages.append(Stage("boilerplate", strip_boilerplate, workers=1, queue_size=queue_size))
+    if embed is not None:
+        stages.append(Stage("embed", embed_batch, workers=embed_workers, queue_size=queue_size,
+                            batch_size=model_batch_size, fan_out=True))
+    stages += [
+        Stage("rebel", rebel_batch, workers=rebel_workers, queue_size=queue_size,
+              batch_size=model_batch_size, fan_out=True),
+        Stage("normalize", normalize, workers=1, queue_size=queue_size),
+        Stage("write", write, workers=write_workers, queue_size=queue_size),
+    ]
+    return StreamingPipeline(stages)
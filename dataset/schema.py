@@ -0,0 +1,108 @@
+"""Schema bootstrap for the Neo4j entity graph written by `load_triplets_to_neo4j`."""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from neo4j import Driver
+
+logger = logging.getLogger(__name__)
+
+ENTITY_FULLTEXT_INDEX = "entity_name_fulltext"
+
+SCHEMA_STATEMENTS = [
+    # MERGE (:Entity {name}) needs a backing index or it degrades to a label scan
+    "CREATE CONSTRAINT entity_name_unique IF NOT EXISTS "
+    "FOR (e:Entity) REQUIRE e.name IS UNIQUE",
+    "CREATE INDEX entity_source IF NOT EXISTS FOR (e:Entity) ON (e.source)",
+    "CREATE INDEX related_to_relation_type IF NOT EXISTS "
+    "FOR ()-[r:RELATED_TO]-() ON (r.relation_type)",
+    "CREATE INDEX related_to_source IF NOT EXISTS "
+    "FOR ()-[r:RELATED_TO]-() ON (r.source)",
+    "CREATE INDEX related_to_source_file IF NOT EXISTS "
+    "FOR ()-[r:RELATED_TO]-() ON (r.source_file)",
+    f"CREATE FULLTEXT INDEX {ENTITY_FULLTEXT_INDEX} IF NOT EXISTS "
+    "FOR (e:Entity) ON EACH [e.name]",
+]
+
+_lock = threading.Lock()
+_bootstrapped: set[tuple[int, str | None]] = set()
+
+
+def ensure_schema(driver: Driver, database: str | None = None, wait: bool = True, timeout: float = 300.0) -> bool:
+    """Create constraints and indexes once per process and driver.
+
+    Every statement is `IF NOT EXISTS`, so running it against an existing
+    database is a no-op. Returns True if the schema was bootstrapped by this
+    call and False if it had already been done in this process.
+    """
+    key = (id(driver), database)
+    with _lock:
+        if key in _bootstrapped:
+            return False
+        with driver.session(database=database) as session:
+            for statement in SCHEMA_STATEMENTS:
+                try:
+                    session.run(statement).consume()
+                except Exception as e:
+                    # e.g. existing duplicate names block the uniqueness constraint
+                    logger.error(f"Failed to apply schema statement '{statement}': {e}")
+        _bootstrapped.add(key)
+    if wait:
+        wait_for_indexes(driver, database=database, timeout=timeout)
+    return True
+
+
+def index_states(driver: Driver, database: str | None = None) -> list[dict[str, Any]]:
+    """Return name, state and population progress of every index."""
+    with driver.session(database=database) as session:
+        result = session.run(
+            "SHOW INDEXES YIELD name, type, state, populationPercent "
+            "RETURN name, type, state, populationPercent"
+        )
+        return [record.data() for record in result]
+
+
+def wait_for_indexes(driver: Driver, database: str | None = None, timeout: float = 300.0, poll_interval: float = 2.0) -> bool:
+    """Block until all indexes are ONLINE, logging population progress.
+
+    Returns False if the timeout elapsed or an index FAILED.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        states = index_states(driver, database=database)
+        pending = [index for index in states if index["state"] != "ONLINE"]
+        failed = [index["name"] for index in pending if index["state"] == "FAILED"]
+        if failed:
+            logger.error(f"Index population failed: {failed}")
+            return False
+        if not pending:
+            logger.info(f"All {len(states)} indexes online")
+            return True
+        for index in pending:
+            logger.info(
+                f"Index {index['name']} {index['state']}: "
+                f"{index.get('populationPercent') or 0:.1f}% populated"
+            )
+        if time.monotonic() >= deadline:
+            logger.warning(f"Timed out waiting for {len(pending)} indexes to come online")
+            return False
+        time.sleep(poll_interval)
+
+
+def search_entities(driver: Driver, text: str, limit: int = 10, database: str | None = None) -> list[dict[str, Any]]:
+    """Full-text lookup of entities by name."""
+    with driver.session(database=database) as session:
+        result = session.run(
+            "CALL db.index.fulltext.queryNodes($index, $text) YIELD node, score "
+            "RETURN node.name AS name, node.source AS source, score "
+            "ORDER BY score DESC LIMIT $limit",
+            index=ENTITY_FULLTEXT_INDEX,
+            text=text,
+            limit=limit,
+        )
+        return [record.data() for record in result]
@@ -0,0 +1,161 @@
+"""Screen a manuscript for citations of retracted papers.
+
+Retracted DOIs and title fingerprints (lower-cased word sequences) are
+compiled into one Aho-Corasick automaton over word tokens. The manuscript is
+tokenized with a single regex pass and streamed through the automaton once,
+carrying state across pages, so every cited retracted paper is reported with
+its character position regardless of how many patterns are loaded.
+"""
+
+import re
+from collections import deque
+from collections.abc import Iterable
+from dataclasses import dataclass
+from typing import Any
+
+from database.doi_lookup import normalize_doi
+from database.reasons import reason_code
+
+_TOKEN_RE = re.compile(r"10\.\d{4,9}/[^\s\"<>,;]*[^\s\"<>,;.)\]]|\w+")
+
+
+@dataclass
+class ScreeningMatch:
+    kind: str
+    """"doi" or "title"."""
+
+    doi: str
+    reason: int
+    """Reason code 1-10, 0 if unknown."""
+
+    start: int
+    """Character offset of the match in the concatenated manuscript text."""
+
+    end: int
+    segment: int
+    """Index of the page/chunk the match ends in."""
+
+
+def _normalize_token(token: str) -> str:
+    if token.startswith("10."):
+        return normalize_doi(token) or token
+    return token
+
+
+class ReferenceScreener:
+    """Word-level Aho-Corasick automaton over retracted DOIs and titles."""
+
+    def __init__(self, min_title_words: int = 4):
+        self.min_title_words = min_title_words
+        self._vocabulary: dict[str, int] = {}
+        self._goto: list[dict[int, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._base_out: list[list[int]] = [[]]
+        """Patterns ending exactly at each state; `_out` adds those reached via failure links."""
+        self._out: list[list[int]] = [[]]
+        self._patterns: list[tuple[str, str, int, int]] = []
+        self.max_pattern_length = 1
+        self._built = False
+
+    @classmethod
+    def from_records(cls, records: Iterable[tuple[str, str | None, int | None]], min_title_words: int = 4) -> "ReferenceScreener":
+        """Build from (doi, title, reason) triples."""
+        screener = cls(min_title_words=min_title_words)
+        for doi, title, reason in records:
+            screener.add(doi, title, reason)
+        screener.build()
+        return screener
+
+    @classmethod
+    def from_mongo(cls, db, min_title_words: int = 4) -> "ReferenceScreener":
+        papers = db.papers.find({}, {"_id": 0, "DOI": 1, "title": 1, "retraction_reason": 1})
+        return cls.from_records(
+            ((paper.get("DOI"), paper.get("title"), paper.get("retraction_reason")) for paper in papers),
+            min_title_words=min_title_words,
+        )
+
+    def add(self, doi: str | None, title: str | None, reason: int | str | None = None) -> None:
+        doi = normalize_doi(doi)
+        reason = reason_code(reason)
+        if doi:
+            self._add_pattern([doi], "doi", doi, reason)
+        if title:
+            words = [token.lower() for token in re.findall(r"\w+", title)]
+            if len(words) >= self.min_title_words:
+                self._add_pattern(words, "title", doi or "", reason)
+
+    def _add_pattern(self, tokens: list[str], kind: str, doi: str, reason: int) -> None:
+        state = 0
+        for token in tokens:
+            token_id = self._vocabulary.setdefault(token, len(self._vocabulary))
+            next_state = self._goto[state].get(token_id)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][token_id] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._base_out.append([])
+            state = next_state
+        self._base_out[state].append(len(self._patterns))
+        self._patterns.append((kind, doi, reason, len(tokens)))
+        self.max_pattern_length = max(self.max_pattern_length, len(tokens))
+        self._built = False
+
+    def build(self) -> None:
+        """Compute failure links and outputs breadth-first, from scratch so rebuilding after add() is safe."""
+        self._fail = [0] * len(self._goto)
+        self._out = [list(outputs) for outputs in self._base_out]
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for token_id, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and token_id not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                candidate = self._goto[fallback].get(token_id, 0)
+                self._fail[next_state] = candidate if candidate != next_state else 0
+                self._out[next_state].extend(self._out[self._fail[next_state]])
+        self._built = True
+
+    def screen(self, segments: Iterable[Any]) -> list[ScreeningMatch]:
+        """Stream pages, non-overlapping chunks or plain strings through the automaton.
+
+        Overlapping `PDFProcessor` chunks would report matches in the overlap
+        twice, so feed pages (or chunks built with chunk_overlap=0).
+        """
+        if not self._built:
+            self.build()
+        goto, fail, out, vocabulary = self._goto, self._fail, self._out, self._vocabulary
+        recent_starts: deque[int] = deque(maxlen=self.max_pattern_length)
+        matches = []
+        state = 0
+        offset = 0
+        for segment_index, segment in enumerate(segments):
+            text = segment if isinstance(segment, str) else segment.page_content
+            lowered = text.lower()
+            if len(lowered) != len(text):
+                # a few characters change length when lower-cased; keep offsets exact
+                lowered = "".join(ch.lower()[0] for ch in text)
+            for token_match in _TOKEN_RE.finditer(lowered):
+                recent_starts.append(offset + token_match.start())
+                token_id = vocabulary.get(_normalize_token(token_match.group()))
+                if token_id is None:
+                    state = 0
+                    continue
+                while state and token_id not in goto[state]:
+                    state = fail[state]
+                state = goto[state].get(token_id, 0)
+                for pattern in out[state]:
+                    kind, doi, reason, length = self._patterns[pattern]
+                    matches.append(ScreeningMatch(
+                        kind=kind,
+                        doi=doi,
+                        reason=reason,
+                        start=recent_starts[-length],
+                        end=offset + token_match.end(),
+                        segment=segment_index,
+                    ))
+            # segments are joined by an implicit separator
+            offset += len(text) + 1
+        return matches
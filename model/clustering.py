@@ -0,0 +1,523 @@
+"""Algorithmic clustering of reasoning chains across the whole corpus.
+
+Chains are grouped either by Louvain communities of the entity graph or by
+k-means over chain embeddings, and the resulting `Cluster` records carry
+corpus-wide average confidence and severity. The LLM is only used afterwards,
+to summarise each cluster into a `ChainReport`.
+"""
+
+import json
+import logging
+import threading
+from collections import Counter
+from collections.abc import Callable, Sequence
+from functools import partial
+
+import numpy as np
+
+from utils import query_chat_openai
+from database.chain_report import ChainReport
+from database.cluster import Cluster
+from database.community import Chain
+from database.embedding_codec import normalize_embeddings
+from dataset.csr import CSRGraph
+
+logger = logging.getLogger(__name__)
+
+CLUSTER_SUMMARY_SYSTEM_MESSAGE = """You are an expert in explaining why groups of academic papers were retracted.
+
+You are given a cluster of reasoning chains that an algorithm grouped together because they share entities or
+have similar explanations. Summarise what the chains have in common, which of the 10 retraction reasons they point
+to, and anything notable about the authors, subjects or severity of the cluster.
+"""
+
+
+def louvain_communities(
+    graph: CSRGraph,
+    resolution: float = 1.0,
+    seed: int | None = None,
+    max_levels: int = 10,
+) -> np.ndarray:
+    """Louvain modularity communities of the entity graph.
+
+    Returns the community label of every node in `graph`, numbered from 0.
+    Parallel edges count as edge weight.
+    """
+    rng = np.random.default_rng(seed)
+    indptr = np.asarray(graph.indptr, dtype=np.int64)
+    indices = np.asarray(graph.indices, dtype=np.int64)
+    weights = np.ones(len(indices), dtype=np.float64)
+    membership = np.arange(graph.num_nodes)
+    for _ in range(max_levels):
+        labels, moved = _local_moving(indptr, indices, weights, resolution, rng)
+        labels = _relabel(labels)
+        membership = labels[membership]
+        if not moved:
+            break
+        indptr, indices, weights = _aggregate(indptr, indices, weights, labels)
+    return _relabel(membership)
+
+
+def _local_moving(
+    indptr: np.ndarray,
+    indices: np.ndarray,
+    weights: np.ndarray,
+    resolution: float,
+    rng: np.random.Generator,
+    max_passes: int = 20,
+    min_gain: float = 1e-6,
+) -> tuple[np.ndarray, bool]:
+    n = len(indptr) - 1
+    degree = np.bincount(np.repeat(np.arange(n), np.diff(indptr)), weights=weights, minlength=n)
+    m2 = float(weights.sum())
+    if m2 == 0:
+        return np.arange(n), False
+    # neighbourhoods are small, so plain Python beats per-node NumPy calls here
+    ptr, adj, w, k = indptr.tolist(), indices.tolist(), weights.tolist(), degree.tolist()
+    labels = list(range(n))
+    total = list(k)
+    order = rng.permutation(n).tolist()
+    scale = resolution / m2
+    moved_any = False
+    for _ in range(max_passes):
+        moved = 0
+        gained = 0.0
+        for node in order:
+            current = labels[node]
+            k_node = k[node]
+            links: dict[int, float] = {}
+            for i in range(ptr[node], ptr[node + 1]):
+                other = adj[i]
+                if other != node:
+                    community = labels[other]
+                    links[community] = links.get(community, 0.0) + w[i]
+            if not links:
+                continue
+            total[current] -= k_node
+            best, best_gain = current, links.get(current, 0.0) - scale * total[current] * k_node
+            stay_gain = best_gain
+            for community, link in links.items():
+                gain = link - scale * total[community] * k_node
+                if gain > best_gain:
+                    best, best_gain = community, gain
+            total[best] += k_node
+            if best != current:
+                labels[node] = best
+                moved += 1
+                gained += best_gain - stay_gain
+        if moved == 0:
+            break
+        moved_any = True
+        if gained / m2 < min_gain:
+            break
+    return np.asarray(labels), moved_any
+
+
+def _aggregate(
+    indptr: np.ndarray, indices: np.ndarray, weights: np.ndarray, labels: np.ndarray
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Collapse each community into one node, summing edge weights."""
+    count = int(labels.max()) + 1
+    sources = labels[np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))]
+    targets = labels[indices]
+    keys, inverse = np.unique(sources * count + targets, return_inverse=True)
+    new_weights = np.bincount(inverse, weights=weights)
+    rows, cols = keys // count, keys % count
+    new_indptr = np.zeros(count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=count), out=new_indptr[1:])
+    return new_indptr, cols, new_weights
+
+
+def _relabel(labels: np.ndarray) -> np.ndarray:
+    return np.unique(labels, return_inverse=True)[1].reshape(labels.shape)
+
+
+def spherical_kmeans(
+    embeddings: np.ndarray,
+    n_clusters: int,
+    seed: int | None = None,
+    max_iter: int = 100,
+) -> tuple[np.ndarray, np.ndarray]:
+    """K-means on L2-normalised vectors (cosine similarity), k-means++ seeded.
+
+    Returns (labels, unit-norm centroids).
+    """
+    rng = np.random.default_rng(seed)
+    X = normalize_embeddings(embeddings)
+    n_clusters = max(1, min(n_clusters, len(X)))
+    centroids = np.empty((n_clusters, X.shape[1]), dtype=np.float32)
+    centroids[0] = X[rng.integers(len(X))]
+    closest = 1.0 - X @ centroids[0]
+    for i in range(1, n_clusters):
+        probabilities = np.clip(closest, 0, None)
+        if probabilities.sum() == 0:
+            centroids[i] = X[rng.integers(len(X))]
+        else:
+            centroids[i] = X[rng.choice(len(X), p=probabilities / probabilities.sum())]
+        closest = np.minimum(closest, 1.0 - X @ centroids[i])
+
+    labels = np.full(len(X), -1)
+    for _ in range(max_iter):
+        new_labels = np.argmax(X @ centroids.T, axis=1)
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        for c in range(n_clusters):
+            members = X[labels == c]
+            if len(members):
+                centroids[c] = members.mean(axis=0)
+        centroids = normalize_embeddings(centroids)
+    return labels, centroids
+
+
+def chain_text(chain: Chain) -> str:
+    """Text used to embed a chain."""
+    steps = chain.reasoning_steps.values() if isinstance(chain.reasoning_steps, dict) else chain.reasoning_steps
+    explanation = chain.overall_explanation
+    if isinstance(explanation, dict):
+        explanation = " ".join(str(value) for value in explanation.values())
+    return " ".join([str(explanation or ""), *(str(step) for step in steps or [])])
+
+
+class ChainClusterer:
+    """Cluster chains over the whole corpus and build `Cluster` records."""
+
+    def __init__(self, min_cluster_size: int = 2, seed: int | None = None):
+        self.min_cluster_size = min_cluster_size
+        self.seed = seed
+
+    def cluster_by_graph(
+        self, chains: Sequence[Chain], graph: CSRGraph, resolution: float = 1.0
+    ) -> list[Cluster]:
+        """Assign each chain to the Louvain community most of its entities fall in."""
+        communities = louvain_communities(graph, resolution=resolution, seed=self.seed)
+        groups: dict[int, list[Chain]] = {}
+        for chain in chains:
+            votes = Counter(
+                int(communities[node])
+                for node in (graph.node_id(entity_id) for entity_id in chain.entity_ids or [])
+                if node is not None
+            )
+            if votes:
+                groups.setdefault(votes.most_common(1)[0][0], []).append(chain)
+        return [
+            self._make_cluster(f"graph-{label}", members, {"graph_community": label})
+            for label, members in sorted(groups.items())
+            if len(members) >= self.min_cluster_size
+        ]
+
+    def cluster_by_embedding(
+        self,
+        chains: Sequence[Chain],
+        embeddings: np.ndarray,
+        n_clusters: int | None = None,
+    ) -> list[Cluster]:
+        """Group chains with spherical k-means over their embeddings."""
+        if len(chains) == 0:
+            return []
+        if n_clusters is None:
+            n_clusters = max(1, int(np.sqrt(len(chains) / 2)))
+        labels, centroids = spherical_kmeans(embeddings, n_clusters, seed=self.seed)
+        clusters = []
+        for label in range(len(centroids)):
+            members = [chains[i] for i in np.flatnonzero(labels == label)]
+            if len(members) >= self.min_cluster_size:
+                clusters.append(self._make_cluster(
+                    f"embedding-{label}", members, {"centroid": centroids[label].tolist()}
+                ))
+        return clusters
+
+    def _make_cluster(self, cluster_id: str, members: list[Chain], attributes: dict) -> Cluster:
+        representative = max(members, key=lambda chain: chain.confidence_score)
+        entity_ids = sorted({entity_id for chain in members for entity_id in chain.entity_ids or []})
+        return Cluster(
+            cluster_id=cluster_id,
+            cluster_size=len(members),
+            cluster_cot=representative,
+            cluster_entity=representative.entities[0] if representative.entities else None,
+            avg_confidence_score=float(np.mean([chain.confidence_score for chain in members])),
+            avg_severity_level=float(np.mean([chain.severity_level for chain in members])),
+            attributes={
+                **attributes,
+                "chain_ids": [chain.chain_id for chain in members],
+                "entity_ids": entity_ids,
+            },
+        )
+
+
+class IncrementalClusterAssigner:
+    """Place newly ingested chains into existing clusters without reclustering.
+
+    Chains go to the nearest centroid (clusters from `cluster_by_embedding`)
+    or, without an embedding, to the cluster sharing the most entities; with a
+    `graph`, an entity whose graph neighbour is in the cluster counts
+    `neighbor_weight` of a shared entity. Cluster size, averages and centroid are updated
+    in place. A full recluster is scheduled on a background thread once drift
+    crosses a threshold: too many chains that fit no cluster, mean assignment
+    similarity falling below its baseline, or the corpus growing too much
+    since the last full run. Chains that arrive while it runs are replayed
+    against the new clusters. With a `collection` (e.g. `db.clusters`) every
+    change is written back to Mongo.
+    """
+
+    def __init__(
+        self,
+        clusters: list[Cluster],
+        recluster: Callable[[], list[Cluster]] | None = None,
+        min_similarity: float = 0.5,
+        max_outlier_rate: float = 0.2,
+        max_similarity_drop: float = 0.1,
+        max_growth: float = 0.25,
+        min_observations: int = 20,
+        graph: CSRGraph | None = None,
+        neighbor_weight: float = 0.5,
+        collection=None,
+    ):
+        self.recluster = recluster
+        self.min_similarity = min_similarity
+        self.max_outlier_rate = max_outlier_rate
+        self.max_similarity_drop = max_similarity_drop
+        self.max_growth = max_growth
+        self.min_observations = min_observations
+        self.graph = graph
+        self.neighbor_weight = neighbor_weight
+        self.collection = collection
+        self.unassigned: list[Chain] = []
+        self._unassigned_embeddings: list[np.ndarray | None] = []
+        self._arrivals: list[tuple[Chain, np.ndarray | None]] | None = None
+        """Chains assigned while a recluster runs, None otherwise."""
+        self._lock = threading.Lock()
+        self._recluster_thread: threading.Thread | None = None
+        self._reset(clusters)
+
+    def _reset(self, clusters: list[Cluster]) -> None:
+        self.clusters = clusters
+        self._centroids = {
+            cluster.cluster_id: np.asarray(cluster.attributes["centroid"], dtype=np.float32)
+            for cluster in clusters
+            if "centroid" in (cluster.attributes or {})
+        }
+        self._entity_sets = {
+            cluster.cluster_id: set(cluster.attributes.get("entity_ids", []))
+            for cluster in clusters
+        }
+        self.baseline_size = sum(cluster.cluster_size for cluster in clusters)
+        self.assigned = 0
+        self.outliers = 0
+        self.similarity_sum = 0.0
+        self.baseline_similarity: float | None = None
+
+    def assign(self, chain: Chain, embedding: np.ndarray | None = None) -> Cluster | None:
+        """Assign one chain, returning its cluster or None if it fits none."""
+        with self._lock:
+            if self._arrivals is not None:
+                self._arrivals.append((chain, embedding))
+            cluster = self._assign_locked(chain, embedding)
+        if cluster is not None:
+            self._persist([cluster])
+        if self.should_recluster():
+            self.schedule_recluster()
+        return cluster
+
+    def _assign_locked(self, chain: Chain, embedding: np.ndarray | None) -> Cluster | None:
+        if embedding is not None and self._centroids:
+            cluster, similarity = self._nearest_centroid(embedding)
+        else:
+            cluster, similarity = self._best_entity_affinity(chain)
+
+        if cluster is None or similarity < self.min_similarity:
+            self.outliers += 1
+            self.unassigned.append(chain)
+            self._unassigned_embeddings.append(embedding)
+            return None
+        self._add_to_cluster(cluster, chain, embedding)
+        self.assigned += 1
+        self.similarity_sum += similarity
+        if self.baseline_similarity is None and self.assigned >= self.min_observations:
+            self.baseline_similarity = self.similarity_sum / self.assigned
+        return cluster
+
+    def _nearest_centroid(self, embedding: np.ndarray) -> tuple[Cluster | None, float]:
+        ids = list(self._centroids)
+        matrix = np.stack([self._centroids[cluster_id] for cluster_id in ids])
+        query = normalize_embeddings(embedding)
+        scores = matrix @ query
+        best = int(np.argmax(scores))
+        return self._cluster(ids[best]), float(scores[best])
+
+    def _best_entity_affinity(self, chain: Chain) -> tuple[Cluster | None, float]:
+        """Share of the chain's entities in a cluster, neighbours in it counting `neighbor_weight`."""
+        entities = set(chain.entity_ids or [])
+        if not entities:
+            return None, 0.0
+        neighbors = {}
+        if self.graph is not None:
+            for entity_id in entities:
+                node = self.graph.node_id(entity_id)
+                if node is not None:
+                    neighbors[entity_id] = {self.graph.name(other) for other in self.graph.neighbors(node)}
+        best, best_score = None, 0.0
+        for cluster_id, members in self._entity_sets.items():
+            shared = entities & members
+            near = sum(1 for entity_id in entities - shared if neighbors.get(entity_id, set()) & members)
+            score = (len(shared) + self.neighbor_weight * near) / len(entities)
+            if score > best_score:
+                best, best_score = cluster_id, score
+        return (self._cluster(best) if best is not None else None), best_score
+
+    def _cluster(self, cluster_id: str) -> Cluster:
+        return next(cluster for cluster in self.clusters if cluster.cluster_id == cluster_id)
+
+    def _add_to_cluster(self, cluster: Cluster, chain: Chain, embedding: np.ndarray | None) -> None:
+        size = cluster.cluster_size + 1
+        cluster.avg_confidence_score += (chain.confidence_score - cluster.avg_confidence_score) / size
+        cluster.avg_severity_level += (chain.severity_level - cluster.avg_severity_level) / size
+        cluster.cluster_size = size
+        cluster.attributes.setdefault("chain_ids", []).append(chain.chain_id)
+        new_entities = set(chain.entity_ids or []) - self._entity_sets.setdefault(cluster.cluster_id, set())
+        self._entity_sets[cluster.cluster_id].update(new_entities)
+        cluster.attributes.setdefault("entity_ids", []).extend(sorted(new_entities))
+        if embedding is not None and cluster.cluster_id in self._centroids:
+            vector = normalize_embeddings(embedding)
+            centroid = self._centroids[cluster.cluster_id] * (size - 1) + vector
+            centroid = normalize_embeddings(centroid)
+            self._centroids[cluster.cluster_id] = centroid
+            cluster.attributes["centroid"] = centroid.tolist()
+
+    def drift(self) -> dict[str, float]:
+        """Current drift metrics since the last full clustering."""
+        observed = self.assigned + self.outliers
+        mean_similarity = self.similarity_sum / self.assigned if self.assigned else 0.0
+        return {
+            "outlier_rate": self.outliers / observed if observed else 0.0,
+            "similarity_drop": (
+                self.baseline_similarity - mean_similarity if self.baseline_similarity is not None else 0.0
+            ),
+            "growth": observed / self.baseline_size if self.baseline_size else float(observed > 0),
+        }
+
+    def should_recluster(self) -> bool:
+        if self.assigned + self.outliers < self.min_observations:
+            return False
+        drift = self.drift()
+        return (
+            drift["outlier_rate"] > self.max_outlier_rate
+            or drift["similarity_drop"] > self.max_similarity_drop
+            or drift["growth"] > self.max_growth
+        )
+
+    def schedule_recluster(self) -> bool:
+        """Start a background full recluster unless one is already running."""
+        if self.recluster is None:
+            return False
+        with self._lock:
+            if self._recluster_thread is not None and self._recluster_thread.is_alive():
+                return False
+            logger.info(f"Scheduling full recluster, drift: {self.drift()}")
+            self._recluster_thread = threading.Thread(target=self._run_recluster, daemon=True)
+            self._recluster_thread.start()
+            return True
+
+    def _run_recluster(self) -> None:
+        with self._lock:
+            # the recluster may or may not pick these up; whatever it leaves
+            # out is replayed afterwards, together with chains arriving meanwhile
+            pending = list(zip(self.unassigned, self._unassigned_embeddings))
+            self.unassigned, self._unassigned_embeddings = [], []
+            self._arrivals = []
+        try:
+            clusters = self.recluster()
+        except Exception as e:
+            logger.error(f"Background recluster failed: {e}")
+            with self._lock:
+                self._arrivals = None
+                for chain, embedding in reversed(pending):
+                    self.unassigned.insert(0, chain)
+                    self._unassigned_embeddings.insert(0, embedding)
+            return
+        with self._lock:
+            arrivals, self._arrivals = self._arrivals, None
+            self._reset(clusters)
+            # outliers from the run are in arrivals and get replayed below
+            self.unassigned, self._unassigned_embeddings = [], []
+            clustered = {
+                chain_id for cluster in clusters for chain_id in (cluster.attributes or {}).get("chain_ids", [])
+            }
+            replay = [(chain, embedding) for chain, embedding in pending + arrivals if chain.chain_id not in clustered]
+            for chain, embedding in replay:
+                self._assign_locked(chain, embedding)
+            # replayed chains belong to this clustering, not to the drift after it
+            self.assigned, self.outliers, self.similarity_sum = 0, 0, 0.0
+        self._persist(clusters, replace=True)
+        logger.info(f"Recluster done: {len(clusters)} clusters, {len(replay)} chains replayed, "
+                    f"{len(self.unassigned)} unassigned")
+
+    def _persist(self, clusters: list[Cluster], replace: bool = False) -> None:
+        """Upsert cluster stats to the collection; `replace` also drops clusters not in the list."""
+        if self.collection is None:
+            return
+        from pymongo import DeleteMany, UpdateOne
+
+        with self._lock:
+            operations = [
+                UpdateOne(
+                    {"cluster_id": cluster.cluster_id},
+                    {"$set": {
+                        "cluster_size": cluster.cluster_size,
+                        "avg_confidence_score": cluster.avg_confidence_score,
+                        "avg_severity_level": cluster.avg_severity_level,
+                        "attributes": cluster.attributes,
+                    }},
+                    upsert=True,
+                )
+                for cluster in clusters
+            ]
+        if replace:
+            operations.append(DeleteMany({"cluster_id": {"$nin": [cluster.cluster_id for cluster in clusters]}}))
+        if operations:
+            try:
+                self.collection.bulk_write(operations, ordered=False)
+            except Exception as e:
+                logger.error(f"Could not persist {len(clusters)} cluster(s): {e}")
+
+
+def summarize_cluster(
+    cluster: Cluster,
+    members: Sequence[Chain],
+    max_chains: int = 20,
+    query: Callable[[str, str], str] = partial(query_chat_openai, stage="cluster_summary"),
+) -> ChainReport:
+    """Summarise one cluster with a single LLM call."""
+    chains_text = "\n".join(
+        f"- chain {chain.chain_id} (confidence {chain.confidence_score}, severity {chain.severity_level}): "
+        f"{chain_text(chain)[:500]}"
+        for chain in members[:max_chains]
+    )
+    prompt = f"""Cluster {cluster.cluster_id} with {cluster.cluster_size} chains,
+    average confidence {cluster.avg_confidence_score:.2f}, average severity {cluster.avg_severity_level:.2f}:
+
+    {chains_text}
+
+    <End of chains>
+
+    Return results in JSON format:
+    {{"summary": "one paragraph summary", "full_content": "detailed explanation"}}
+    """
+    response = query(CLUSTER_SUMMARY_SYSTEM_MESSAGE, prompt)
+    try:
+        parsed = json.loads(response)
+    except json.JSONDecodeError:
+        parsed = None
+    if isinstance(parsed, dict):
+        summary, full_content = parsed.get("summary", ""), parsed.get("full_content", "")
+    else:
+        # not JSON, or JSON that is not an object: keep the raw text
+        summary, full_content = response[:500], response
+    return ChainReport(
+        chain_id=cluster.cluster_id,
+        summary=summary,
+        full_content=full_content,
+        rank=cluster.avg_severity_level,
+        attributes={"avg_confidence_score": cluster.avg_confidence_score},
+        size=cluster.cluster_size,
+    )
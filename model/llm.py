@@ -1,17 +1,26 @@
 import json 
+from functools import lru_cache
 from utils import query_chat_openai
-import redis
-from redis.commands.search.field import TagField
-from redis.commands.search.index_definition import IndexType , IndexDefinition
-from redis.commands.search import Search 
-from redis.commands.search.aggregation import AggregateRequest
+from clustering import ChainClusterer, summarize_cluster
+from triage import LLM_CALLS_PER_PAPER, TRIAGE_TEXT_CHARS, RetractionTriage, TriageResult
+from database.tracing import traced
 from typing import List, Dict, Optional, Any
-import pymongo
-from pymongo import MongoClient
 
 
-client = MongoClient("mongodb://localhost:27017/")
-db = client["retraction-paper-db"]
+@lru_cache(maxsize=1)
+def get_db():
+    """Connect to Mongo on first use rather than at import"""
+    from pymongo import MongoClient
+    client = MongoClient("mongodb://localhost:27017/")
+    return client["retraction-paper-db"]
+
+
+class _LazyDatabase:
+    def __getattr__(self, name):
+        return getattr(get_db(), name)
+
+
+db = _LazyDatabase()
 
             
 
@@ -92,14 +101,36 @@ Give a reason as to why you had to cluster these chains and also you are allowed
 
 
 class CoTPaper:
-    def __init__(self , problem , str):
+    def __init__(self , problem , str, triage: RetractionTriage = None):
 
         self.problem = problem 
         self.small_problem = list()
         self.solutions = list()
         self.index = None
         self.all_snippets = list()
+        self.triage = triage
+
+    @traced("cot.analyze_paper")
+    def analyze_paper(self, paper_content: str, notice: str = None, cluster: bool = False) -> TriageResult | Any:
+        """Run the LLM chain for one paper, unless the local triage is confident about the reason.
 
+        Returns the `TriageResult` when the chain was skipped, otherwise the chains
+        of thought (or the clusters with cluster=True).
+        """
+        def chain():
+            self.extract_metadata(paper_content)
+            self.break_down_problem()
+            if cluster:
+                # cluster_papers identifies entities and builds the chains itself
+                return self.cluster_papers(paper_content, None)
+            return self.build_chains_of_thought(self.identify_entities(paper_content))
+
+        if self.triage is None or self.triage.model is None:
+            return chain()
+        text = notice or paper_content[:TRIAGE_TEXT_CHARS]
+        return self.triage.run(text, chain, llm_calls=LLM_CALLS_PER_PAPER + (1 if cluster else 0))
+
+    @traced("cot.extract_metadata")
     def extract_metadata(self, paper_content: str) -> dict[str, Any]:
         system_message = """You are an expert at extracting metadata from academic papers. 
         Extract the following information and return it in JSON format:
@@ -128,7 +159,7 @@ class CoTPaper:
         }}
         """
         
-        response = query_chat_openai(system_message, prompt)
+        response = query_chat_openai(system_message, prompt, stage="extract_metadata")
         
         try:
             metadata = json.loads(response)
@@ -145,6 +176,7 @@ class CoTPaper:
             return self._get_default_metadata()
 
     
+    @traced("cot.break_down_problem")
     def break_down_problem(self) -> list[str]:
         system_message = COT_BREAKDOWN_PROBLEM_SYSTEM_MESSAGE
         
@@ -158,7 +190,7 @@ class CoTPaper:
                     {{\"results\": [\"problem_1\", \"problem_2\", ...]}}
                     """
         
-        response = query_chat_openai(system_message , prompt)
+        response = query_chat_openai(system_message , prompt, stage="break_down_problem")
 
         try:
             response = json.loads(response)
@@ -173,14 +205,24 @@ class CoTPaper:
         return self.small_problems
     
 
-    def identify_entities(self , paper_content: str) -> list[dict]:
+    @traced("cot.identify_entities")
+    def identify_entities(self , paper_content: str , evidence: str = None) -> list[dict]:
         system_message = ENTITY_IDENTIFICATION_SYSTEM_MESSAGE
+
+        evidence_section = f"""
+                    Passages of this paper that overlap other papers in the corpus (possible plagiarism or subsumed work):
+
+                    {evidence}
+
+                    <End of overlap evidence>
+                    """ if evidence else ""
         
         prompt = f"""Paper content to analyse for entities:
 
                     {paper_content}
 
                     <End of paper content>
+                    {evidence_section}
 
                     Please identify the key entities that could indicate the retraction reasons . Return results in JSON format:
 
@@ -198,7 +240,7 @@ class CoTPaper:
                     }}
                 """
         
-        response = query_chat_openai(system_message , prompt)
+        response = query_chat_openai(system_message , prompt, stage="identify_entities")
         
         try: 
             response = json.load(response)
@@ -216,6 +258,7 @@ class CoTPaper:
              
         return self.entities 
         
+    @traced("cot.build_chains_of_thought")
     def build_chains_of_thought(self, entities: list[dict] = None) -> list[dict]:
         """Build logical chains of reasoning from the identified entities"""
         if entities is None:
@@ -261,7 +304,7 @@ class CoTPaper:
         }}
         """
 
-        response = query_chat_openai(system_message, prompt)
+        response = query_chat_openai(system_message, prompt, stage="build_chains_of_thought")
 
         try:
             response = json.loads(response)
@@ -279,6 +322,7 @@ class CoTPaper:
         
         return self.chains_of_thought
     
+    @traced("cot.cluster_papers")
     def cluster_papers(self  , paper_content: str , entities : List[dict] , cluster_threshold: int = 10 ) -> json : 
         system_message = CLUSTER_PAPER_SYSTEM_MESSAGE
         entities = self.identify_entities(paper_content) 
@@ -315,7 +359,7 @@ class CoTPaper:
             }}
         """
 
-        response = query_chat_openai(system_message, prompt)
+        response = query_chat_openai(system_message, prompt, stage="cluster_papers")
 
         try : 
             response = json.loads(response)
@@ -333,6 +377,37 @@ class CoTPaper:
         
         return self.clusters
 
+    @traced("cot.cluster_corpus")
+    def cluster_corpus(self, chains: list, graph=None, embeddings=None, min_cluster_size: int = 2) -> list[dict]:
+        """Cluster chains from the whole corpus algorithmically; the LLM only summarises each cluster."""
+        clusterer = ChainClusterer(min_cluster_size=min_cluster_size)
+        if graph is not None:
+            clusters = clusterer.cluster_by_graph(chains, graph)
+        elif embeddings is not None:
+            clusters = clusterer.cluster_by_embedding(chains, embeddings)
+        else:
+            raise ValueError("Either an entity graph or chain embeddings are required for clustering")
+
+        chains_by_id = {chain.chain_id: chain for chain in chains}
+        records = []
+        for cluster in clusters:
+            members = [chains_by_id[chain_id] for chain_id in cluster.attributes["chain_ids"]]
+            report = summarize_cluster(cluster, members)
+            records.append({
+                "cluster_id": cluster.cluster_id,
+                "cluster_size": cluster.cluster_size,
+                "avg_confidence_score": cluster.avg_confidence_score,
+                "avg_severity_level": cluster.avg_severity_level,
+                "attributes": cluster.attributes,
+                "summary": report.summary,
+                "full_content": report.full_content,
+            })
+
+        if records:
+            db.clusters.insert_many(records)
+        self.clusters = records
+        return records
+
 
         
     
@@ -0,0 +1,150 @@
+"""Cheap local first pass over retraction notices before the `CoTPaper` LLM chain.
+
+A linear model on TF-IDF features is trained from papers whose retraction
+reason is already recorded in `db.papers`. `CoTPaper.analyze_paper` asks it
+first; when it is confident, the expensive stages are skipped and the
+predicted reason is used directly.
+"""
+
+import logging
+import pickle
+from collections import Counter
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+
+from database.reasons import RETRACTION_REASONS, UNKNOWN_REASON, reason_code
+
+if TYPE_CHECKING:
+    from sklearn.calibration import CalibratedClassifierCV
+    from sklearn.pipeline import Pipeline
+
+logger = logging.getLogger(__name__)
+
+# extract_metadata, break_down_problem, identify_entities, build_chains_of_thought
+LLM_CALLS_PER_PAPER = 4
+
+# characters of a paper used as its triage text when there is no notice;
+# the title and abstract, as for the training examples
+TRIAGE_TEXT_CHARS = 3000
+
+
+@dataclass
+class TriageResult:
+    reason: int
+    confidence: float
+    skip_llm: bool
+
+    @property
+    def reason_label(self) -> str:
+        return RETRACTION_REASONS.get(self.reason, "")
+
+
+class RetractionTriage:
+    """Calibrated TF-IDF + logistic regression classifier over the 10 reasons."""
+
+    def __init__(self, confidence_threshold: float = 0.9, llm_calls_per_paper: int = LLM_CALLS_PER_PAPER):
+        self.confidence_threshold = confidence_threshold
+        self.llm_calls_per_paper = llm_calls_per_paper
+        self.model: Pipeline | CalibratedClassifierCV | None = None
+        self.papers_seen = 0
+        self.papers_skipped = 0
+        self.llm_calls_saved = 0
+
+    def fit(self, texts: list[str], labels: list[int]) -> "RetractionTriage":
+        from sklearn.calibration import CalibratedClassifierCV
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.linear_model import LogisticRegression
+        from sklearn.pipeline import Pipeline
+
+        counts = Counter(labels)
+        if not counts:
+            raise ValueError("No labelled examples to train the triage model on")
+        if len(counts) < 2:
+            raise ValueError(f"Need at least two retraction reasons to train, only found {list(counts)}")
+        base = Pipeline([
+            ("tfidf", TfidfVectorizer(ngram_range=(1, 2), sublinear_tf=True, min_df=1, max_features=50_000)),
+            ("clf", LogisticRegression(max_iter=1000, C=4.0)),
+        ])
+        smallest_class = min(counts.values())
+        if smallest_class >= 3:
+            # probabilities from an uncalibrated linear model are overconfident
+            self.model = CalibratedClassifierCV(base, method="sigmoid", cv=min(5, smallest_class))
+        else:
+            logger.warning("Too few examples per reason to calibrate, using raw probabilities")
+            self.model = base
+        self.model.fit(texts, labels)
+        return self
+
+    def predict(self, texts: list[str]) -> list[tuple[int, float]]:
+        """Return (reason, probability) for each text."""
+        if self.model is None:
+            raise ValueError("Triage model is not trained. Call fit() or load() first.")
+        probabilities = self.model.predict_proba(texts)
+        best = np.argmax(probabilities, axis=1)
+        classes = self.model.classes_
+        return [(int(classes[i]), float(probabilities[row, i])) for row, i in enumerate(best)]
+
+    def triage(self, text: str) -> TriageResult:
+        reason, confidence = self.predict([text])[0]
+        return TriageResult(reason, confidence, confidence >= self.confidence_threshold)
+
+    def run(self, text: str, pipeline: Callable[[], Any], llm_calls: int | None = None) -> TriageResult | Any:
+        """Return the triage result when confident, otherwise run the LLM pipeline.
+
+        `llm_calls` is how many LLM calls the pipeline makes, for the savings report.
+        """
+        self.papers_seen += 1
+        result = self.triage(text)
+        if result.skip_llm:
+            self.papers_skipped += 1
+            self.llm_calls_saved += self.llm_calls_per_paper if llm_calls is None else llm_calls
+            return result
+        return pipeline()
+
+    def report(self) -> dict[str, Any]:
+        return {
+            "papers_seen": self.papers_seen,
+            "papers_skipped": self.papers_skipped,
+            "skip_rate": self.papers_skipped / self.papers_seen if self.papers_seen else 0.0,
+            "llm_calls_saved": self.llm_calls_saved,
+        }
+
+    def save(self, path: str) -> None:
+        with open(path, "wb") as f:
+            pickle.dump({"model": self.model, "confidence_threshold": self.confidence_threshold}, f)
+
+    @classmethod
+    def load(cls, path: str) -> "RetractionTriage":
+        with open(path, "rb") as f:
+            state = pickle.load(f)
+        triage = cls(confidence_threshold=state["confidence_threshold"])
+        triage.model = state["model"]
+        return triage
+
+
+def load_training_data(
+    db, notice_field: str = "retraction_notice", text_fields: Iterable[str] = ("title", "abstract")
+) -> tuple[list[str], list[int]]:
+    """Collect (text, reason) pairs from papers with a known retraction reason.
+
+    The text is the retraction notice when there is one, otherwise the title
+    and abstract, which is also what `CoTPaper.analyze_paper` classifies.
+    """
+    text_fields = list(text_fields)
+    texts, labels = [], []
+    papers = db.papers.find(
+        {"retraction_reason": {"$exists": True}},
+        {"_id": 0, "retraction_reason": 1, notice_field: 1, **{field: 1 for field in text_fields}},
+    )
+    for paper in papers:
+        reason = reason_code(paper.get("retraction_reason"))
+        if reason == UNKNOWN_REASON:
+            continue
+        text = paper.get(notice_field) or " ".join(str(paper.get(field) or "") for field in text_fields).strip()
+        if text:
+            texts.append(str(text))
+            labels.append(reason)
+    return texts, labels
@@ -1,8 +1,12 @@
-from langchain.chat_models.openai import ChatOpenAI
-from langchain.schema import HumanMessage, SystemMessage
-import streamlit as st
 import os
 
+import time
+
+from database import metrics
+from database.tracing import span
+
+# langchain and streamlit are imported inside the functions that use them
+
 MODEL_TO_USE = "gpt-4"
 
 
@@ -10,6 +14,7 @@ def load_openai_api_key():
     """
     Load OpenAI API key into the environment
     """
+    import streamlit as st
 
     # Get openAI API Key from the form, and falls back to secrets. If secrets doesn't have a key, then an exception is raised
     openai_api_key_from_secrets = st.secrets.get('openai_credentials', {}).get('OPENAI_API_KEY')
@@ -21,10 +26,13 @@ def load_openai_api_key():
     os.environ['OPENAI_API_KEY'] = openai_api_key
 
 
-def query_chat_openai(system_message, user_message, model_to_use: str = MODEL_TO_USE, max_tokens: int = 1000):
+def query_chat_openai(system_message, user_message, model_to_use: str = MODEL_TO_USE, max_tokens: int = 1000,
+                      stage: str = "unknown"):
     """
     Query OpenAI Chat API
     """
+    from langchain.chat_models.openai import ChatOpenAI
+    from langchain.schema import HumanMessage, SystemMessage
 
     chat = ChatOpenAI(temperature=0, model_name=model_to_use, max_tokens=max_tokens)
 
@@ -37,7 +45,22 @@ def query_chat_openai(system_message, user_message, model_to_use: str = MODEL_TO
         ),
     ]
 
-    response = chat(message)
+    with span("llm.query_chat_openai", model=model_to_use, stage=stage,
+              input_chars=len(system_message) + len(user_message)) as s:
+        started = time.perf_counter()
+        try:
+            response = chat(message)
+        except Exception:
+            metrics.LLM_ERRORS.inc(stage=stage)
+            raise
+        finally:
+            metrics.LLM_LATENCY.observe(time.perf_counter() - started, stage=stage, model=model_to_use)
+        usage = (getattr(response, "response_metadata", None) or {}).get("token_usage") or {}
+        for kind in ("prompt_tokens", "completion_tokens"):
+            if usage.get(kind):
+                metrics.LLM_TOKENS.inc(usage[kind], stage=stage, kind=kind.split("_")[0])
+        s.set(prompt_tokens=usage.get("prompt_tokens"), completion_tokens=usage.get("completion_tokens"),
+              output_chars=len(response.content))
 
     return response.content
 
@@ -9,11 +9,11 @@ import uuid
 import re 
 import pandas as pd 
 import collections.abc 
-from collections.abc import Iterable
+from collections import OrderedDict, defaultdict
+from collections.abc import Hashable, Iterable
 import datetime 
 import numpy as np 
 import networkx as nx 
-from retrieval.entity import * 
 
 from .entity import ( 
     find_seminal_papers,
@@ -23,18 +23,22 @@ from .entity import (
 
 
 
-def get_chain_by_id(chains: dict[str , Chain] , value: str) -> Chain | None : 
+def get_chain_by_id(chains: "dict[str , Chain] | ChainIndex" , value: str) -> Chain | None : 
     """Get chain by id"""
+    if isinstance(chains, ChainIndex):
+        return chains.get(value)
 
     chain =  chains.get(value)
-    if community is None and is_valid_uuid(value):
-        community = chains.get(value.replace("-" , ""))
-    return community
+    if chain is None and is_valid_uuid(value):
+        chain = chains.get(value.replace("-" , ""))
+    return chain
 
 def get_chains_by_key(
     chains: Iterable[Chain], key: str, value: str | int
 ) -> Chain | None:
     """Get chains by key."""
+    if isinstance(chains, ChainIndex):
+        return chains.get_by_key(key, value)
     if isinstance(value, str) and is_valid_uuid(value):
         value_no_dashes = value.replace("-", "")
         for community in chains:
@@ -53,6 +57,8 @@ def get_chains_by_attribute(
     chains: Iterable[Chain], attribute_name: str, attribute_value: Any
 ) -> list[Chain]:
     """Get chains by attribute."""
+    if isinstance(chains, ChainIndex):
+        return chains.get_by_attribute(attribute_name, attribute_value)
     return [
         community
         for community in chains
@@ -61,25 +67,168 @@ def get_chains_by_attribute(
     ]
 
 
+def get_chains_by_entity(chains: Iterable[Chain], entity_id: str) -> list[Chain]:
+    """Get chains that reference the given entity."""
+    if isinstance(chains, ChainIndex):
+        return chains.get_by_entity(entity_id)
+    entity_id = _normalize_id(entity_id)
+    return [
+        chain
+        for chain in chains
+        if any(_normalize_id(chain_entity) == entity_id for chain_entity in chain.entity_ids or [])
+    ]
+
+
 def get_reasoning_steps(chains: Iterable[Chain] , key: str | Any , value: str) -> list[str]:
-    """get reasoning steps for particular chain"""
+    """get reasoning steps for particular chain, in the order they were recorded"""
+    chain = get_chains_by_key(chains, key, value)
+    if chain is None:
+        return None
+    if isinstance(chains, ChainIndex):
+        return chains.get_reasoning_steps(chain.chain_id)
+    return _materialize_reasoning_steps(chain.reasoning_steps)
     
-    if isinstance(value , str ) and is_valid_uuid(value): 
-        value_no_dashes = value.replace("-" , "")
-        
+
+class ChainIndex:
+    """Indexed registry of chains for repeated context-building lookups.
+
+    The module level helpers scan every chain on each call unless they are
+    given an index instead of a chain list. The index is built once and
+    answers lookups by chain id, by entity id (reverse index over
+    `Chain.entity_ids`) and by attribute in O(1), and keeps an LRU of
+    materialized reasoning steps.
+    """
+
+    def __init__(self, chains: Iterable[Chain] = (), reasoning_cache_size: int = 1024):
+        self._by_id: dict[str, Chain] = {}
+        self._by_entity: dict[str, list[Chain]] = defaultdict(list)
+        self._by_attribute: dict[tuple[str, Hashable], list[Chain]] = defaultdict(list)
+        self._by_key: dict[str, dict[Hashable, Chain]] = {}
+        self._reasoning_cache: OrderedDict[str, list[str]] = OrderedDict()
+        self.reasoning_cache_size = reasoning_cache_size
         for chain in chains:
-            chain_reasoning_value = getattr(chain , key)
+            self.add(chain)
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def __iter__(self):
+        return iter(self._by_id.values())
+
+    def add(self, chain: Chain) -> None:
+        """Add a chain to the index, replacing any chain with the same id."""
+        chain_id = _normalize_id(chain.chain_id)
+        if chain_id in self._by_id:
+            self.remove(chain.chain_id)
+        self._by_id[chain_id] = chain
+        for entity_id in chain.entity_ids or []:
+            self._by_entity[_normalize_id(entity_id)].append(chain)
+        for name, value in (chain.attributes or {}).items():
+            if _is_hashable(value):
+                self._by_attribute[(name, value)].append(chain)
+        # secondary key indexes are rebuilt lazily on next use
+        self._by_key.clear()
+
+    def remove(self, chain_id: str) -> Chain | None:
+        """Remove a chain from the index."""
+        key = _normalize_id(chain_id)
+        chain = self._by_id.pop(key, None)
+        if chain is None:
+            return None
+        for entity_id in chain.entity_ids or []:
+            bucket = self._by_entity.get(_normalize_id(entity_id))
+            if bucket is not None:
+                bucket[:] = [c for c in bucket if c is not chain]
+        for name, value in (chain.attributes or {}).items():
+            if _is_hashable(value):
+                bucket = self._by_attribute.get((name, value))
+                if bucket is not None:
+                    bucket[:] = [c for c in bucket if c is not chain]
+        self._by_key.clear()
+        self._reasoning_cache.pop(key, None)
+        return chain
+
+    def get(self, chain_id: str) -> Chain | None:
+        """Get chain by id."""
+        return self._by_id.get(_normalize_id(chain_id))
+
+    def get_by_key(self, key: str, value: str | int) -> Chain | None:
+        """Get the first chain whose `key` attribute matches `value`."""
+        if key == "chain_id":
+            return self.get(value)
+        key_index = self._by_key.get(key)
+        if key_index is None:
+            key_index = {}
+            for chain in self._by_id.values():
+                chain_value = getattr(chain, key)
+                if _is_hashable(chain_value):
+                    key_index.setdefault(_normalize_id(chain_value), chain)
+            self._by_key[key] = key_index
+        return key_index.get(_normalize_id(value))
+
+    def get_by_entity(self, entity_id: str) -> list[Chain]:
+        """Get chains that reference the given entity."""
+        return list(self._by_entity.get(_normalize_id(entity_id), []))
+
+    def get_by_entities(self, entity_ids: Iterable[str]) -> list[Chain]:
+        """Get chains that reference any of the given entities, without duplicates."""
+        seen: dict[int, Chain] = {}
+        for entity_id in entity_ids:
+            for chain in self._by_entity.get(_normalize_id(entity_id), []):
+                seen.setdefault(id(chain), chain)
+        return list(seen.values())
+
+    def get_by_attribute(self, attribute_name: str, attribute_value: Any) -> list[Chain]:
+        """Get chains by attribute."""
+        if not _is_hashable(attribute_value):
+            return get_chains_by_attribute(self._by_id.values(), attribute_name, attribute_value)
+        return list(self._by_attribute.get((attribute_name, attribute_value), []))
+
+    def get_reasoning_steps(self, chain_id: str) -> list[str] | None:
+        """Get the materialized reasoning steps for a chain, served from an LRU."""
+        key = _normalize_id(chain_id)
+        steps = self._reasoning_cache.get(key)
+        if steps is not None:
+            self._reasoning_cache.move_to_end(key)
+            return list(steps)
+        chain = self._by_id.get(key)
+        if chain is None:
+            return None
+        steps = _materialize_reasoning_steps(chain.reasoning_steps)
+        self._reasoning_cache[key] = steps
+        if len(self._reasoning_cache) > self.reasoning_cache_size:
+            self._reasoning_cache.popitem(last=False)
+        # callers get a copy so mutating it cannot corrupt the cache
+        return list(steps)
+
+
+def _is_hashable(value: Any) -> bool:
+    """isinstance(value, Hashable) is also true for tuples holding lists."""
+    try:
+        hash(value)
+    except TypeError:
+        return False
+    return True
+
+
+def _normalize_id(value: Any) -> Any:
+    """Strip dashes from UUID-shaped ids so both spellings hit the same slot."""
+    if isinstance(value, str) and is_valid_uuid(value):
+        return value.replace("-", "")
+    return value
+
+
+def _materialize_reasoning_steps(steps: dict[Any, str] | list[str] | None) -> list[str]:
+    """Flatten reasoning steps into a list of strings, keeping the recorded order.
+
+    Keys are not sorted: string keys such as "step_10" would sort before "step_2".
+    """
+    if not steps:
+        return []
+    if isinstance(steps, dict):
+        steps = steps.values()
+    return [str(step) for step in steps]
 
-            if chain_reasoning_value in (value , value_no_dashes):
-                return chain.reasoning_steps
-        
-        else:
-            for chain in chains: 
-                if getattr(chain, key) == value: 
-                    return chain.reasoning_steps
-                
-        return None 
-    
 
 def confidence_score_calculation(
     chains: Iterable[Chain], 
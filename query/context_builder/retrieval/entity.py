@@ -3,7 +3,7 @@ from typing import List , Dict , Any , cast
 import uuid 
 import re 
 import pandas as pd 
-from collections.abc import Iterable 
+from collections.abc import Iterable, Iterator 
 import datetime 
 import numpy as np 
 
@@ -132,38 +132,169 @@ def to_entity_dataframe(
     entities: list[Paper],
     include_entity_rank: bool = True,
     rank_description: str = "number of relationships",
+    categorical_ratio: float = 0.5,
 ) -> pd.DataFrame:
-    """Convert a list of entities to a pandas dataframe."""
+    """Convert a list of entities to a pandas dataframe.
+
+    Columns are built directly with their final dtype: rank and numeric
+    attributes (e.g. citation_count) stay native ints/floats, and text
+    attributes whose distinct values are at most `categorical_ratio` of the
+    rows are stored as categoricals.
+    """
     if len(entities) == 0:
         return pd.DataFrame()
+    header = _entity_dataframe_header(entities[0], include_entity_rank, rank_description)
+    return _build_entity_dataframe(
+        entities, header, include_entity_rank, rank_description, categorical_ratio
+    )
+
+
+def iter_entity_dataframes(
+    entities: Iterable[Paper],
+    chunk_size: int = 10_000,
+    include_entity_rank: bool = True,
+    rank_description: str = "number of relationships",
+    dtypes: dict[str, Any] | None = None,
+) -> Iterator[pd.DataFrame]:
+    """Yield entity dataframes of at most `chunk_size` rows.
+
+    Every chunk has the same columns and dtypes, so chunks can be concatenated
+    or appended to one parquet file. The columns come from the first entity;
+    each column's dtype comes from `dtypes` or else from the first chunk in
+    which it has a value. Chunks are held back until every column has a
+    dtype, so pass `dtypes` for sparse attributes to keep that buffer small.
+    Columns that never get a value are strings. Text attributes stay plain
+    strings here, since categories would differ from chunk to chunk.
+    """
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be positive")
+    header = None
+    schema = dict(dtypes or {})
+    pending: list[list[Paper]] = []
+    for chunk in _batched(entities, chunk_size):
+        if header is None:
+            header = _entity_dataframe_header(chunk[0], include_entity_rank, rank_description)
+        for column in header[3:]:
+            if column in schema:
+                continue
+            values = _column_values(chunk, column, include_entity_rank, rank_description)
+            numeric = include_entity_rank and column == rank_description
+            if numeric or any(value is not None and value != "" for value in values):
+                schema[column] = _typed_column(values, categorical_ratio=0.0, numeric=numeric).dtype
+        pending.append(chunk)
+        if all(column in schema for column in header[3:]):
+            for ready in pending:
+                yield _build_entity_dataframe(
+                    ready, header, include_entity_rank, rank_description, categorical_ratio=0.0, schema=schema
+                )
+            pending = []
+    if pending:
+        for column in header[3:]:
+            schema.setdefault(column, pd.StringDtype())
+        for ready in pending:
+            yield _build_entity_dataframe(
+                ready, header, include_entity_rank, rank_description, categorical_ratio=0.0, schema=schema
+            )
+
+
+def _entity_dataframe_header(
+    first: Paper, include_entity_rank: bool, rank_description: str
+) -> list[str]:
     header = ["id", "entity", "description"]
     if include_entity_rank:
         header.append(rank_description)
-    attribute_cols = (
-        list(entities[0].attributes.keys()) if entities[0].attributes else []
-    )
-    attribute_cols = [col for col in attribute_cols if col not in header]
-    header.extend(attribute_cols)
+    attribute_cols = list(first.attributes.keys()) if first.attributes else []
+    header.extend(col for col in attribute_cols if col not in header)
+    return header
 
-    records = []
-    for entity in entities:
-        new_record = [
-            entity.short_id if entity.short_id else "",
-            entity.title,
-            entity.description if entity.description else "",
-        ]
-        if include_entity_rank:
-            new_record.append(str(entity.rank))
-
-        for field in attribute_cols:
-            field_value = (
-                str(entity.attributes.get(field))
-                if entity.attributes and entity.attributes.get(field)
-                else ""
-            )
-            new_record.append(field_value)
-        records.append(new_record)
-    return pd.DataFrame(records, columns=cast("Any", header))
+
+def _build_entity_dataframe(
+    entities: list[Paper],
+    header: list[str],
+    include_entity_rank: bool,
+    rank_description: str,
+    categorical_ratio: float,
+    schema: dict[str, Any] | None = None,
+) -> pd.DataFrame:
+    base_cols = 4 if include_entity_rank else 3
+    attribute_cols = header[base_cols:]
+    columns: dict[str, Any] = {
+        "id": pd.array(
+            [getattr(entity, "short_id", None) or "" for entity in entities], dtype="string"
+        ),
+        "entity": pd.array([entity.title for entity in entities], dtype="string"),
+        "description": pd.array(
+            [getattr(entity, "description", None) or "" for entity in entities], dtype="string"
+        ),
+    }
+    if include_entity_rank:
+        values = _column_values(entities, rank_description, include_entity_rank, rank_description)
+        columns[rank_description] = (
+            _typed_column(values, categorical_ratio, numeric=True)
+            if schema is None
+            else _fixed_column(values, rank_description, schema[rank_description])
+        )
+    for field in attribute_cols:
+        values = _column_values(entities, field, include_entity_rank, rank_description)
+        columns[field] = (
+            _typed_column(values, categorical_ratio)
+            if schema is None
+            else _fixed_column(values, field, schema[field])
+        )
+    return pd.DataFrame(columns, columns=cast("Any", header))
+
+
+def _column_values(
+    entities: list[Paper], column: str, include_entity_rank: bool, rank_description: str
+) -> list[Any]:
+    if include_entity_rank and column == rank_description:
+        return [getattr(entity, "rank", None) for entity in entities]
+    return [entity.attributes.get(column) if entity.attributes else None for entity in entities]
+
+
+def _typed_column(values: list[Any], categorical_ratio: float, numeric: bool = False) -> Any:
+    """Build a column with a native dtype instead of stringified objects."""
+    present = [value for value in values if value is not None and value != ""]
+    if numeric and not present:
+        return np.full(len(values), np.nan)
+    if present and all(
+        isinstance(value, (int, np.integer)) and not isinstance(value, bool) for value in present
+    ):
+        return pd.array([None if value == "" else value for value in values], dtype="Int64")
+    if present and all(
+        isinstance(value, (int, float, np.number)) and not isinstance(value, bool)
+        for value in present
+    ):
+        return np.array(
+            [np.nan if value is None or value == "" else value for value in values],
+            dtype=np.float64,
+        )
+    strings = ["" if value is None else str(value) for value in values]
+    if strings and len(set(strings)) <= categorical_ratio * len(strings):
+        return pd.Categorical(strings)
+    return pd.array(strings, dtype="string")
+
+
+def _fixed_column(values: list[Any], name: str, dtype: Any) -> pd.Series:
+    """Build a column with a dtype decided earlier, e.g. by an earlier chunk."""
+    if pd.api.types.is_string_dtype(dtype):
+        return pd.Series(["" if value is None else str(value) for value in values], dtype=dtype)
+    cleaned = [None if value == "" else value for value in values]
+    try:
+        return pd.Series(cleaned, dtype=object).astype(dtype)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Column {name!r} does not fit dtype {dtype}; pass another one in dtypes") from e
+
+
+def _batched(items: Iterable[Any], size: int) -> Iterator[list[Any]]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
 
 
 def is_valid_uuid(value: str) -> bool:
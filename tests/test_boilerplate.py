@@ -0,0 +1,36 @@
+from dataset.boilerplate import BoilerplateFilter
+
+FOOTER = "This article is distributed under a Creative Commons license, page 4"
+
+
+def fitted_filter(**kwargs):
+    documents = [
+        [f"Results for study {number}\n{FOOTER.replace('4', str(number))}"]
+        for number in range(5)
+    ]
+    return BoilerplateFilter(min_documents=3, **kwargs).fit(documents)
+
+
+def test_footer_lines_are_stripped_whatever_their_page_number():
+    boilerplate = fitted_filter()
+    cleaned = boilerplate.filter_chunk("Table 2 shows the effect\n" + FOOTER.replace("4", "17"), source="a.pdf")
+    assert cleaned == "Table 2 shows the effect"
+
+
+def test_chunks_differing_only_in_numbers_are_both_kept():
+    boilerplate = fitted_filter()
+    first = boilerplate.filter_chunk("mean 12.4, sd 3.1, n = 40", source="a.pdf")
+    second = boilerplate.filter_chunk("mean 19.8, sd 2.2, n = 41", source="a.pdf")
+    repeat = boilerplate.filter_chunk("mean 12.4, sd 3.1, n = 40", source="a.pdf")
+    assert first and second
+    assert repeat is None
+
+
+def test_model_calls_avoided_counts_batches():
+    boilerplate = fitted_filter(model_batch_size=4)
+    for number in range(8):
+        boilerplate.filter_chunk(f"finding {number} replicated", source="a.pdf")
+    for _ in range(3):
+        boilerplate.filter_chunk(FOOTER, source="a.pdf")
+    # 11 chunks need 3 batches, the 8 kept need 2
+    assert boilerplate.report()["model_calls_avoided"] == 1
@@ -0,0 +1,59 @@
+import uuid
+
+from database.community import Chain
+from query.context_builder.retrieval.chain import (
+    ChainIndex,
+    get_chain_by_id,
+    get_chains_by_attribute,
+    get_chains_by_entity,
+    get_chains_by_key,
+    get_reasoning_steps,
+)
+
+CHAIN_ID = str(uuid.UUID(int=1))
+
+
+def make_chain(chain_id, entity_ids, reason, steps):
+    return Chain(
+        type="retraction", chain_id=chain_id, entity_ids=entity_ids, entities=[], relationship_id=[],
+        attributes={"reason": reason, "tags": ["list", "values"]}, reasoning_steps=steps,
+        confidence_score=0.9, frequency=1.0, severity_level=3, overall_explanation={},
+    )
+
+
+def chains():
+    steps = {f"step_{number}": f"step {number}" for number in range(1, 12)}
+    return [
+        make_chain(CHAIN_ID, ["paper-a", "paper-b"], 8, steps),
+        make_chain("c2", ["paper-b"], 3, {"first": "typo found", "second": "corrected"}),
+    ]
+
+
+def test_reasoning_steps_keep_recorded_order():
+    index = ChainIndex(chains())
+    expected = [f"step {number}" for number in range(1, 12)]
+
+    assert index.get_reasoning_steps(CHAIN_ID) == expected
+    assert get_reasoning_steps(chains(), "chain_id", CHAIN_ID) == expected
+    assert get_reasoning_steps(index, "chain_id", CHAIN_ID.replace("-", "")) == expected
+    assert get_reasoning_steps(index, "chain_id", "c2") == ["typo found", "corrected"]
+
+
+def test_helpers_use_the_index_and_agree_with_a_scan():
+    index = ChainIndex(chains())
+    for source in (chains(), index):
+        assert get_chains_by_key(source, "chain_id", "c2").chain_id == "c2"
+        assert [chain.chain_id for chain in get_chains_by_attribute(source, "reason", 8)] == [CHAIN_ID]
+        assert [chain.chain_id for chain in get_chains_by_entity(source, "paper-b")] == [CHAIN_ID, "c2"]
+    assert get_chain_by_id(index, CHAIN_ID.replace("-", "")).chain_id == CHAIN_ID
+    assert get_chains_by_attribute(index, "tags", ["list", "values"])
+
+
+def test_removed_chain_leaves_every_lookup():
+    index = ChainIndex(chains())
+    index.remove("c2")
+
+    assert index.get("c2") is None
+    assert [chain.chain_id for chain in index.get_by_entity("paper-b")] == [CHAIN_ID]
+    assert index.get_by_attribute("reason", 3) == []
+    assert index.get_reasoning_steps("c2") is None
@@ -0,0 +1,45 @@
+from clustering import IncrementalClusterAssigner
+from database.cluster import Cluster
+from database.community import Chain
+from dataset.csr import CSRGraph
+
+
+def make_chain(chain_id, entity_ids):
+    return Chain(
+        type="retraction", chain_id=chain_id, entity_ids=entity_ids, entities=[], relationship_id=[],
+        attributes={}, reasoning_steps={}, confidence_score=0.8, frequency=1.0, severity_level=2,
+        overall_explanation={},
+    )
+
+
+def make_cluster(cluster_id, entity_ids):
+    return Cluster(
+        cluster_id=cluster_id, cluster_size=1, cluster_cot=make_chain(f"{cluster_id}-seed", entity_ids),
+        cluster_entity=None, avg_confidence_score=0.8, avg_severity_level=2.0,
+        attributes={"chain_ids": [f"{cluster_id}-seed"], "entity_ids": entity_ids},
+    )
+
+
+def hub_graph(hubs, leaves_per_hub=20):
+    """Each hub entity linked to many leaves, like a well-connected method or dataset."""
+    return CSRGraph.from_edges(
+        (hub, "related_to", f"{hub}-leaf-{number}") for hub in hubs for number in range(leaves_per_hub)
+    )
+
+
+def test_graph_neighbours_do_not_dilute_direct_overlap():
+    clusters = [make_cluster("methods", ["bert", "gpt", "t5"])]
+    assigner = IncrementalClusterAssigner(clusters, graph=hub_graph(["bert", "gpt", "t5"]), min_similarity=0.5)
+
+    assert assigner.assign(make_chain("c1", ["bert", "gpt", "t5"])) is clusters[0]
+
+
+def test_graph_connected_chain_is_assigned():
+    clusters = [make_cluster("methods", ["bert-leaf-1", "gpt-leaf-2"]), make_cluster("other", ["imagenet"])]
+    chain = make_chain("c1", ["bert", "gpt"])
+    without_graph = IncrementalClusterAssigner(clusters, min_similarity=0.4)
+    with_graph = IncrementalClusterAssigner(clusters, graph=hub_graph(["bert", "gpt"]), min_similarity=0.4)
+
+    assert without_graph.assign(chain) is None
+    assert with_graph.assign(chain) is clusters[0]
+    assert with_graph.drift()["outlier_rate"] == 0.0
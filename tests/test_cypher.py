@@ -0,0 +1,80 @@
+import itertools
+import re
+
+import pytest
+
+pytest.importorskip("langchain_community")
+
+from dataset.cypher import ENTITY_LABEL, PAPER_LABEL, Graph
+
+
+class FakeGraph:
+    """In-memory stand-in for Neo4jGraph that understands the migration queries.
+
+    Base-labelled entities are unique on `id`, like the constraint LangChain
+    creates for `baseEntityLabel`; unknown queries fail loudly.
+    """
+
+    def __init__(self):
+        self.nodes = {}
+        self.relationships = set()
+        self._ids = itertools.count()
+
+    def add_node(self, *labels, **properties):
+        key = next(self._ids)
+        self.nodes[key] = {"labels": set(labels), "properties": properties}
+        return key
+
+    def find(self, label, **properties):
+        return [key for key, node in self.nodes.items() if label in node["labels"]
+                and all(node["properties"].get(name) == value for name, value in properties.items())]
+
+    def query(self, cypher, params=None):
+        params = params or {}
+        if cypher.lstrip().startswith("CREATE"):
+            return []
+        if "db.labels()" in cypher:
+            return [{"label": label} for label in sorted({l for node in self.nodes.values() for l in node["labels"]})]
+        if "apoc.refactor.mergeNodes" in cypher:
+            return self._merge_batch(cypher, params)
+        raise AssertionError(f"unexpected query: {cypher}")
+
+    def _merge_batch(self, cypher, params):
+        legacy = re.search(r"MATCH \(n:`(.+?)`\)", cypher).group(1)
+        base = re.search(r"MERGE \(m:`(.+?)`", cypher).group(1)
+        paper = (self.find(PAPER_LABEL, doi=params["doi"]) or [self.add_node(PAPER_LABEL, doi=params["doi"])])[0]
+        batch = self.find(legacy)[:params["limit"]]
+        for key in batch:
+            node = self.nodes.pop(key)
+            target = (self.find(base, id=node["properties"]["id"])
+                      or [self.add_node(base, id=node["properties"]["id"])])[0]
+            merged = self.nodes[target]
+            merged["labels"] |= node["labels"] - {legacy}
+            merged["properties"] = {**node["properties"], **merged["properties"]}
+            self.relationships = {
+                (target if start == key else start, kind, target if end == key else end)
+                for start, kind, end in self.relationships
+            }
+            if "IN_PAPER" in cypher:
+                self.relationships.add((target, "IN_PAPER", paper))
+        return [{"migrated": len(batch)}]
+
+
+def test_entity_shared_by_two_legacy_papers_becomes_one_node():
+    fake = FakeGraph()
+    first = fake.add_node(f"{ENTITY_LABEL}10.1/a", "Method", id="transformer")
+    second = fake.add_node(f"{ENTITY_LABEL}10.1/b", "Method", id="transformer", year=2017)
+    other = fake.add_node(f"{ENTITY_LABEL}10.1/b", id="attention")
+    fake.relationships |= {(first, "USES", first), (second, "RELATED_TO", other)}
+
+    migrated = Graph(fake, batch_size=1).migrate_doi_labels()
+
+    assert migrated == {"entities": 3, "documents": 0}
+    (entity,) = fake.find(ENTITY_LABEL, id="transformer")
+    assert fake.nodes[entity]["labels"] == {ENTITY_LABEL, "Method"}
+    assert fake.nodes[entity]["properties"]["year"] == 2017
+    papers = {fake.nodes[end]["properties"]["doi"] for start, kind, end in fake.relationships
+              if start == entity and kind == "IN_PAPER"}
+    assert papers == {"10.1/a", "10.1/b"}
+    assert (entity, "RELATED_TO", fake.find(ENTITY_LABEL, id="attention")[0]) in fake.relationships
+    assert not any(label.startswith(f"{ENTITY_LABEL}10.") for node in fake.nodes.values() for label in node["labels"])
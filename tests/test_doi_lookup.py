@@ -0,0 +1,47 @@
+import numpy as np
+
+from doi_lookup import DOILookup, _hash_pairs, normalize_doi
+from reasons import UNKNOWN_REASON, reason_code
+
+RETRACTED = [(f"10.{1000 + number % 50}/journal.{number}", number % 10 + 1) for number in range(5000)]
+
+
+def bloom_hit_rate(lookup, dois):
+    """Share of DOIs the Bloom filter alone lets through to the fingerprint table."""
+    positions = lookup._bit_positions(_hash_pairs(dois), lookup.num_hashes, len(lookup.bloom_bits) * 8)
+    bits = np.unpackbits(lookup.bloom_bits)
+    return float(bits[positions.astype(np.int64)].all(axis=1).mean())
+
+
+def test_every_retracted_doi_is_found_with_its_reason():
+    lookup = DOILookup.build(RETRACTED)
+
+    assert lookup.lookup_many([doi for doi, _ in RETRACTED]) == [reason for _, reason in RETRACTED]
+    assert lookup.lookup("https://doi.org/10.1000/JOURNAL.0") == 1
+    assert lookup.is_retracted("doi: 10.1001/journal.1.")
+
+
+def test_unknown_dois_are_rejected_and_the_filter_keeps_its_rate():
+    lookup = DOILookup.build(RETRACTED, false_positive_rate=0.01)
+    unknown = [f"10.9999/other.{number}" for number in range(10000)]
+
+    assert not any(reason is not None for reason in lookup.lookup_many(unknown))
+    assert bloom_hit_rate(lookup, unknown) < 0.02
+    assert lookup.lookup_many(["not a doi", None]) == [None, None]
+
+
+def test_snapshot_round_trip(tmp_path):
+    lookup = DOILookup.build(RETRACTED[:100])
+    lookup.save(str(tmp_path / "dois"))
+
+    loaded = DOILookup.load(str(tmp_path / "dois.npz"))
+
+    assert len(loaded) == 100
+    assert loaded.lookup_many([doi for doi, _ in RETRACTED[:100]]) == [reason for _, reason in RETRACTED[:100]]
+
+
+def test_reason_codes_from_stored_values():
+    assert normalize_doi("http://dx.doi.org/10.1234%2Fabc") == "10.1234/abc"
+    assert [reason_code(value) for value in (8, "8", 8.0, "Plagiarism", "typos found", None, 11, "?")] == [
+        8, 8, 8, 8, 3, UNKNOWN_REASON, UNKNOWN_REASON, UNKNOWN_REASON
+    ]
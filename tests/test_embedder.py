@@ -0,0 +1,38 @@
+import pytest
+
+import embedder
+from embedder import ONNX_INT8_ARM64_FILE, PORTABLE_ONNX_INT8_FILE, _onnx_model_kwargs, default_onnx_int8_file
+
+
+@pytest.fixture(autouse=True)
+def x86(monkeypatch):
+    monkeypatch.setattr(embedder.platform, "machine", lambda: "x86_64")
+
+
+@pytest.mark.parametrize("flags, expected", [
+    ({"avx512_vnni", "avx512f", "avx512bw", "avx2"}, "onnx/model_qint8_avx512_vnni.onnx"),
+    ({"avx512f", "avx512bw", "avx2"}, "onnx/model_qint8_avx512.onnx"),
+    ({"avx512f", "avx2"}, "onnx/model_quint8_avx2.onnx"),
+    ({"avx2", "sse4_2"}, "onnx/model_quint8_avx2.onnx"),
+    (set(), PORTABLE_ONNX_INT8_FILE),
+])
+def test_int8_file_is_chosen_by_cpu_flags(flags, expected):
+    assert default_onnx_int8_file(flags) == expected
+
+
+def test_flags_are_read_from_the_cpu_when_not_given(monkeypatch):
+    monkeypatch.setattr(embedder, "_cpu_flags", lambda: {"avx512_vnni"})
+    assert default_onnx_int8_file() == "onnx/model_qint8_avx512_vnni.onnx"
+
+
+@pytest.mark.parametrize("machine", ["aarch64", "arm64"])
+def test_arm_uses_the_arm64_file_whatever_the_flags(monkeypatch, machine):
+    monkeypatch.setattr(embedder.platform, "machine", lambda: machine)
+    assert default_onnx_int8_file({"avx512_vnni"}) == ONNX_INT8_ARM64_FILE
+
+
+def test_onnx_kwargs_name_the_file_only_when_given():
+    assert _onnx_model_kwargs(None) == {"provider": "CPUExecutionProvider"}
+    assert _onnx_model_kwargs(None, "onnx/model_qint8_avx512.onnx") == {
+        "provider": "CPUExecutionProvider", "file_name": "onnx/model_qint8_avx512.onnx"
+    }
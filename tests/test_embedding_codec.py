@@ -0,0 +1,60 @@
+import numpy as np
+
+from embedding_codec import (
+    decode_embeddings,
+    encode_embedding,
+    ensure_embedding_indexes,
+    normalize_embeddings,
+    with_embedding,
+)
+
+
+class FakeCollection:
+    def __init__(self, indexes=()):
+        self.indexes = {name: {} for name in indexes}
+
+    def create_index(self, keys, name, **kwargs):
+        self.indexes[name] = {"key": keys, **kwargs}
+
+    def index_information(self):
+        return dict(self.indexes)
+
+    def drop_index(self, name):
+        del self.indexes[name]
+
+
+class FakeDatabase:
+    def __init__(self, **collections):
+        self.__dict__.update(collections)
+
+    def __getitem__(self, name):
+        return getattr(self, name)
+
+
+def test_with_embedding_only_requires_the_embedding():
+    assert with_embedding() == {"embedding": {"$exists": True}}
+
+
+def test_one_index_per_lookup_key_and_old_partial_indexes_dropped():
+    db = FakeDatabase(papers=FakeCollection(["_id_", "paper_id_with_embedding"]),
+                      entities=FakeCollection(["_id_", "EntityID_with_embedding"]))
+
+    ensure_embedding_indexes(db)
+
+    assert sorted(db.papers.indexes) == ["DOI", "_id_", "paper_id"]
+    assert sorted(db.entities.indexes) == ["EntityID", "_id_"]
+    assert not any("partialFilterExpression" in spec for spec in db.papers.indexes.values())
+
+
+def test_decode_skips_other_dimensions_and_keeps_positions():
+    values = [encode_embedding([1, 0, 0]), None, [0.5, 0.5], encode_embedding([0, 1, 0], dtype="float16")]
+    matrix, positions = decode_embeddings(values, dim=3)
+    assert positions == [0, 3]
+    np.testing.assert_array_equal(matrix, np.array([[1, 0, 0], [0, 1, 0]], dtype=np.float32))
+
+
+def test_normalize_keeps_zero_vectors_and_accepts_single_vectors():
+    matrix = normalize_embeddings([[3, 4], [0, 0]])
+    assert matrix.dtype == np.float32
+    np.testing.assert_allclose(matrix, [[0.6, 0.8], [0, 0]])
+    np.testing.assert_allclose(normalize_embeddings(np.array([0, 2.0])), [0, 1])
@@ -0,0 +1,48 @@
+import datetime
+
+import pandas as pd
+
+from query.context_builder.retrieval.entity import iter_entity_dataframes, to_entity_dataframe
+from database.entity import Paper
+
+
+def make_paper(number, **attributes):
+    return Paper(
+        title=f"Paper {number}", author=[], doi=f"10.1000/{number}", date=datetime.date(2020, 1, 1),
+        journal="J", subject=[], attributes=attributes,
+    )
+
+
+def test_dtype_comes_from_first_chunk_with_a_value():
+    papers = [make_paper(number, citation_count=None, venue=None) for number in range(4)]
+    papers += [make_paper(number, citation_count=number, venue="ACL") for number in range(4, 8)]
+
+    frames = list(iter_entity_dataframes(papers, chunk_size=2, include_entity_rank=False))
+
+    assert len(frames) == 4
+    assert all(str(frame["citation_count"].dtype) == "Int64" for frame in frames)
+    combined = pd.concat(frames, ignore_index=True)
+    assert combined["citation_count"].isna().sum() == 4
+    assert combined["citation_count"].iloc[-1] == 7
+    assert list(combined["venue"])[-1] == "ACL"
+
+
+def test_explicit_dtypes_and_columns_without_values():
+    papers = [make_paper(number, citation_count=None, note=None) for number in range(3)]
+
+    frames = list(iter_entity_dataframes(
+        papers, chunk_size=2, include_entity_rank=False, dtypes={"citation_count": "float64"}
+    ))
+
+    assert [len(frame) for frame in frames] == [2, 1]
+    assert all(frame["citation_count"].dtype == "float64" for frame in frames)
+    assert all(pd.api.types.is_string_dtype(frame["note"].dtype) for frame in frames)
+
+
+def test_falsy_text_values_are_kept():
+    papers = [make_paper(0, flag=False, label="x"), make_paper(1, flag=True, label=0)]
+
+    frame = to_entity_dataframe(papers, include_entity_rank=False, categorical_ratio=0.0)
+
+    assert list(frame["flag"]) == ["False", "True"]
+    assert list(frame["label"]) == ["x", "0"]
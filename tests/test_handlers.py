@@ -0,0 +1,79 @@
+import asyncio
+import re
+import threading
+
+import pytest
+
+from handlers import SQLStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SQLStore(str(tmp_path / "store.db"))
+    yield store
+    store.close()
+
+
+def hold_writer(store):
+    """Park the writer thread inside an open transaction until the returned event is set."""
+    entered, release = threading.Event(), threading.Event()
+
+    def blocking_write(conn):
+        conn.execute("INSERT INTO storage (id, value) VALUES ('pending', 'x')")
+        entered.set()
+        release.wait(5)
+
+    future = store._backend.submit_write(blocking_write)
+    assert entered.wait(5)
+    return release, future
+
+
+def test_in_memory_store_shares_one_database():
+    store = SQLStore(":memory:")
+    try:
+        asyncio.run(store.set("a", "1"))
+        asyncio.run(store.child("ns").set_many({"b": "2", "c": b"\x00\x01"}))
+        assert asyncio.run(store.get("a")) == "1"
+        assert asyncio.run(store.child("ns").get_many(["b", "c"], as_bytes=True)) == {"b": b"2", "c": b"\x00\x01"}
+        assert store.keys() == ["a", "ns/b", "ns/c"]
+    finally:
+        store.close()
+
+
+def test_reads_do_not_wait_for_an_open_write(store):
+    asyncio.run(store.set("committed", "yes"))
+    release, future = hold_writer(store)
+    try:
+        assert asyncio.run(asyncio.wait_for(store.get("committed"), timeout=2)) == "yes"
+        assert not asyncio.run(store.has("pending"))
+    finally:
+        release.set()
+    future.result(5)
+    assert asyncio.run(store.has("pending"))
+
+
+def test_pending_writes_commit_as_one_batch_and_failures_roll_back_alone(store):
+    backend = store._backend
+    batch_sizes = []
+    run_write_batch = backend._run_write_batch
+    backend._run_write_batch = lambda jobs: (batch_sizes.append(len(jobs)), run_write_batch(jobs))
+    release, blocked = hold_writer(store)
+
+    def failing(conn):
+        conn.execute("INSERT INTO storage (id, value) VALUES ('broken', 'x')")
+        raise ValueError("bad row")
+
+    def insert(key):
+        return lambda conn: conn.execute("INSERT INTO storage (id, value) VALUES (?, 'x')", (key,))
+
+    futures = [backend.submit_write(insert("first")), backend.submit_write(failing),
+               backend.submit_write(insert("second"))]
+    release.set()
+    blocked.result(5)
+    futures[0].result(5)
+    futures[2].result(5)
+    with pytest.raises(ValueError):
+        futures[1].result(5)
+
+    assert batch_sizes[-1] == 3
+    assert [key for key, _ in store.find(re.compile(".*"))] == ["first", "pending", "second"]
@@ -0,0 +1,73 @@
+import math
+from collections import Counter
+
+import pytest
+
+from lexical import BM25Index, reciprocal_rank_fusion, tokenize
+
+DOCUMENTS = [
+    ("paper:1", "Retraction of a study on protein folding due to image duplication"),
+    ("paper:2", "Protein folding dynamics in yeast"),
+    ("paper:3", "Image manipulation detected in microscopy figures, see 10.1234/abcd.5678."),
+    ("entity:1", "protein"),
+]
+
+
+def reference_bm25(query, documents, k1=1.5, b=0.75):
+    """Textbook BM25 over the whole collection, for comparison."""
+    tokenized = {doc_id: Counter(tokenize(text)) for doc_id, text in documents}
+    lengths = {doc_id: sum(counts.values()) for doc_id, counts in tokenized.items()}
+    average = sum(lengths.values()) / len(lengths)
+    scores = {}
+    for doc_id, counts in tokenized.items():
+        score = 0.0
+        for term in set(tokenize(query)):
+            df = sum(1 for other in tokenized.values() if term in other)
+            if not counts[term]:
+                continue
+            idf = math.log(1 + (len(tokenized) - df + 0.5) / (df + 0.5))
+            tf = counts[term]
+            score += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * lengths[doc_id] / average))
+        if score:
+            scores[doc_id] = score
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+def test_scores_match_reference_bm25_across_incremental_merges():
+    index = BM25Index()
+    index.add_documents(DOCUMENTS[:2])
+    index.search("protein")
+    index.add_documents(DOCUMENTS[2:])
+
+    results = index.search("protein folding image", top_k=10)
+
+    expected = reference_bm25("protein folding image", DOCUMENTS)
+    assert [doc_id for doc_id, _ in results] == [doc_id for doc_id, _ in expected]
+    for (_, score), (_, reference) in zip(results, expected):
+        assert score == pytest.approx(reference, rel=1e-5)
+
+
+def test_doi_is_one_token_and_prefix_filters_results():
+    index = BM25Index()
+    index.add_documents(DOCUMENTS)
+
+    assert [doc_id for doc_id, _ in index.search("10.1234/ABCD.5678")] == ["paper:3"]
+    assert [doc_id for doc_id, _ in index.search("protein", prefix="entity:")] == ["entity:1"]
+    assert "entity:1" not in [doc_id for doc_id, _ in index.search("protein", prefix="paper:")]
+
+
+def test_save_and_load_keep_scores(tmp_path):
+    index = BM25Index()
+    index.add_documents(DOCUMENTS)
+    index.save(str(tmp_path))
+
+    assert BM25Index.load(str(tmp_path)).search("protein folding") == index.search("protein folding")
+
+
+def test_reciprocal_rank_fusion_orders_by_summed_reciprocal_ranks():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "a", "d"]], k=60)
+
+    assert [doc_id for doc_id, _ in fused] == ["a", "c", "b", "d"]
+    assert fused[0][1] == pytest.approx(1 / 61 + 1 / 62)
+    assert fused[1][1] == pytest.approx(1 / 63 + 1 / 61)
+    assert fused[3][1] == pytest.approx(1 / 63)
@@ -0,0 +1,68 @@
+import sys
+from types import ModuleType, SimpleNamespace
+
+from database import metrics
+from dataset.graph import load_triplets_to_neo4j
+from model.utils import query_chat_openai
+
+
+class FakeChatOpenAI:
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+
+    def __call__(self, messages):
+        return SimpleNamespace(content="ok", response_metadata={
+            "token_usage": {"prompt_tokens": 12, "completion_tokens": 3}})
+
+
+def fake_langchain(monkeypatch):
+    """Register the two langchain modules query_chat_openai imports, backed by a fake client."""
+    chat_models = ModuleType("langchain.chat_models.openai")
+    chat_models.ChatOpenAI = FakeChatOpenAI
+    schema = ModuleType("langchain.schema")
+    schema.HumanMessage = schema.SystemMessage = lambda content: content
+    monkeypatch.setitem(sys.modules, "langchain.chat_models.openai", chat_models)
+    monkeypatch.setitem(sys.modules, "langchain.schema", schema)
+
+
+def test_metrics_endpoint_reports_cache_lookups_and_llm_calls(monkeypatch):
+    fake_langchain(monkeypatch)
+    metrics.record_cache_lookup("test_scrape", hit=True)
+    metrics.record_cache_lookup("test_scrape", hit=False)
+    metrics.record_cache_lookup("test_scrape", hit=True)
+    assert query_chat_openai("system", "user", model_to_use="fake-model", stage="test_scrape") == "ok"
+
+    response = metrics.create_app().test_client().get("/metrics")
+
+    assert response.status_code == 200
+    assert response.content_type == metrics.CONTENT_TYPE
+    lines = response.get_data(as_text=True).splitlines()
+    assert 'redis_cache_requests_total{prefix="test_scrape",result="hit"} 2' in lines
+    assert 'redis_cache_requests_total{prefix="test_scrape",result="miss"} 1' in lines
+    assert any(line.startswith('redis_cache_hit_ratio{prefix="test_scrape"} 0.666') for line in lines)
+    assert 'llm_request_seconds_count{stage="test_scrape",model="fake-model"} 1' in lines
+    assert 'llm_tokens_total{stage="test_scrape",kind="prompt"} 12' in lines
+    assert 'llm_tokens_total{stage="test_scrape",kind="completion"} 3' in lines
+
+
+class FakeSession:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+def test_batches_with_nothing_to_write_are_still_timed():
+    loader = SimpleNamespace(
+        driver=SimpleNamespace(session=FakeSession),
+        create_neo4j_indexes=lambda: True,
+        clean_node_name=lambda name: "",
+        clean_relation_name=lambda relation: relation,
+    )
+    before = metrics.NEO4J_BATCH_LATENCY.count(status="empty")
+
+    stats = load_triplets_to_neo4j(loader, [("a", "cites", "b")] * 3, batch_size=2)
+
+    assert stats == {"nodes": 0, "relationships": 0, "errors": 0}
+    assert metrics.NEO4J_BATCH_LATENCY.count(status="empty") == before + 2
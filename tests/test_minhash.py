@@ -0,0 +1,60 @@
+import numpy as np
+
+from dataset.minhash import MinHashLSHIndex
+
+rng = np.random.default_rng(3)
+VOCABULARY = [f"word{number}" for number in range(2000)]
+
+
+def passage(length=120):
+    return " ".join(rng.choice(VOCABULARY, size=length))
+
+
+def edited(text, changes=3):
+    """Copy of `text` with a few words replaced, like a lightly reworded plagiarised passage."""
+    words = text.split()
+    for position in rng.choice(len(words), size=changes, replace=False):
+        words[position] = "changed"
+    return " ".join(words)
+
+
+def test_near_duplicate_pair_is_found_and_unrelated_text_is_not():
+    original, unrelated = passage(), passage()
+    index = MinHashLSHIndex()
+    index.add_document("source-paper", [unrelated, original])
+
+    matches = index.query([passage(), edited(original)], exclude_doc_id="new-paper")
+
+    assert [(match.chunk_index, match.other_doc_id, match.other_chunk_index) for match in matches] == [
+        (1, "source-paper", 1)
+    ]
+    assert matches[0].similarity > 0.6
+
+
+def test_query_document_excludes_the_paper_itself():
+    shared = passage()
+    index = MinHashLSHIndex()
+    index.add_document("a", [shared, passage()])
+    index.add_document("b", [passage(), edited(shared, changes=1)])
+
+    matches = index.query_document("b")
+
+    assert {(match.other_doc_id, match.other_chunk_index) for match in matches} == {("a", 0)}
+
+
+def test_chunks_without_words_never_match():
+    index = MinHashLSHIndex()
+    assert index.add_document("a", ["----", "* * *", passage()]) == 1
+    assert index.query(["----"]) == []
+
+
+def test_save_and_load_keep_matches(tmp_path):
+    shared = passage()
+    index = MinHashLSHIndex(num_perm=64, bands=16)
+    index.add_document("a", [shared])
+    index.save(str(tmp_path))
+
+    loaded = MinHashLSHIndex.load(str(tmp_path))
+
+    assert len(loaded) == 1
+    assert [match.other_doc_id for match in loaded.query([edited(shared)])] == ["a"]
@@ -0,0 +1,94 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import dataset.graph
+from dataset.pipeline import Stage, StreamingPipeline, build_ingestion_pipeline
+
+
+def run_with_timeout(pipeline, source, timeout=5.0):
+    """Run the pipeline on a thread so a hang fails the test instead of blocking it."""
+    outcome = {}
+
+    def target():
+        outcome["stats"] = pipeline.run(source)
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "pipeline did not drain"
+    return outcome["stats"]
+
+
+def test_fan_out_stage_failing_mid_iteration_does_not_hang():
+    def explode(item):
+        yield f"{item}-0"
+        if item == "bad":
+            raise ValueError("broken page")
+        yield f"{item}-1"
+
+    results = []
+    pipeline = StreamingPipeline(
+        [
+            Stage("load", explode, workers=2, fan_out=True),
+            Stage("upper", str.upper, workers=2),
+        ],
+        on_result=results.append,
+    )
+    stats = run_with_timeout(pipeline, ["a", "bad", "b"])
+
+    assert stats["load"].processed == 3
+    assert stats["load"].errors == 1
+    assert sorted(results) == ["A-0", "A-1", "B-0", "B-1", "BAD-0"]
+
+
+def test_failing_result_handler_does_not_hang():
+    def on_result(item):
+        if item == 2:
+            raise RuntimeError("sink down")
+
+    pipeline = StreamingPipeline([Stage("double", lambda x: x * 2, batch_size=1)], on_result=on_result)
+    stats = run_with_timeout(pipeline, range(5))
+
+    assert stats["double"].processed == 5
+    assert stats["double"].errors == 1
+
+
+class FakeProcessor:
+    def __init__(self, pages):
+        self.pages = pages
+
+    def iter_chunks(self, path):
+        for number in range(self.pages):
+            yield SimpleNamespace(page_content=f"{path} chunk {number}", metadata={"page": number})
+
+
+def test_ingestion_pipeline_persists_embeddings_and_batches_rebel(monkeypatch):
+    rebel_batches = []
+
+    def fake_generate_triples(texts):
+        rebel_batches.append(len(texts))
+        return [("alice", "wrote", text) for text in texts]
+
+    monkeypatch.setattr(dataset.graph, "generate_triples", fake_generate_triples)
+    stored, written = [], []
+    pipeline = build_ingestion_pipeline(
+        FakeProcessor(pages=10),
+        write_triples=lambda triples, info: written.extend(triples),
+        embed=lambda texts: [[float(len(text))] for text in texts],
+        write_embeddings=stored.extend,
+        model_batch_size=4,
+    )
+    run_with_timeout(pipeline, ["one.pdf", "two.pdf"])
+
+    assert len(stored) == 20
+    assert all(vector == [float(len(chunk.page_content))] for _, chunk, vector in stored)
+    assert sum(rebel_batches) == 20
+    assert max(rebel_batches) <= 4
+    assert len(written) == 20
+
+
+def test_embed_without_a_writer_is_rejected():
+    with pytest.raises(ValueError):
+        build_ingestion_pipeline(FakeProcessor(pages=1), write_triples=print, embed=lambda texts: texts)
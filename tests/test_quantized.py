@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from quantized import QuantizedEmbeddingStore, benchmark_recall
+
+
+@pytest.fixture
+def corpus():
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(2000, 32)).astype(np.float32)
+    ids = [f"paper-{i}" for i in range(len(vectors))]
+    return ids, vectors
+
+
+def brute_force(ids, vectors, query, top_k):
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    scores = normalized @ (query / np.linalg.norm(query))
+    return [ids[i] for i in np.argsort(-scores)[:top_k]]
+
+
+@pytest.mark.parametrize("configuration", [{"method": "int8"}, {"method": "pq", "subspaces": 8, "centroids": 64}])
+def test_rescored_search_matches_brute_force(tmp_path, corpus, configuration):
+    ids, vectors = corpus
+    store = QuantizedEmbeddingStore.build(str(tmp_path), ids, vectors, **configuration)
+    queries = vectors[:5] + 0.3
+
+    for query in queries:
+        hits = store.search(query, top_k=5, rescore=200)
+        assert [doc_id for doc_id, _ in hits] == brute_force(ids, vectors, query, 5)
+        best = vectors[ids.index(hits[0][0])]
+        assert hits[0][1] == pytest.approx(float(best @ query / np.linalg.norm(best) / np.linalg.norm(query)), rel=1e-5)
+
+
+def test_approximate_scores_track_exact_ones(tmp_path, corpus):
+    ids, vectors = corpus
+    store = QuantizedEmbeddingStore.build(str(tmp_path), ids, vectors, method="int8")
+    query = vectors[0]
+
+    approximate = store.approximate_scores(query)
+    exact = np.asarray(store.vectors) @ (query / np.linalg.norm(query))
+
+    assert np.abs(approximate - exact).max() < 0.05
+
+
+def test_load_round_trip_and_memory_reduction(tmp_path, corpus):
+    ids, vectors = corpus
+    float32_bytes = vectors.nbytes
+    int8 = QuantizedEmbeddingStore.build(str(tmp_path / "int8"), ids, vectors, method="int8")
+    pq = QuantizedEmbeddingStore.build(str(tmp_path / "pq"), ids, vectors, method="pq", subspaces=8, centroids=64)
+
+    loaded = QuantizedEmbeddingStore.load(str(tmp_path / "pq"))
+
+    assert len(loaded) == len(ids)
+    assert loaded.search(vectors[7], top_k=3) == pq.search(vectors[7], top_k=3)
+    assert float32_bytes / int8.memory_bytes > 3.5
+    assert float32_bytes / pq.memory_bytes > 10
+
+
+def test_invalid_configurations_are_rejected(tmp_path, corpus):
+    ids, vectors = corpus
+    with pytest.raises(ValueError):
+        QuantizedEmbeddingStore.build(str(tmp_path), ids, vectors, method="float16")
+    with pytest.raises(ValueError):
+        QuantizedEmbeddingStore.build(str(tmp_path), ids, vectors, method="pq", subspaces=5)
+
+
+def test_benchmark_recall_improves_with_rescoring(tmp_path, corpus):
+    _, vectors = corpus
+    results = benchmark_recall(str(tmp_path), vectors[:500], vectors[:10] + 0.3, top_k=5,
+                               configurations=({"method": "pq", "subspaces": 8, "centroids": 32},),
+                               rescore=(0, 100))
+
+    assert [result["rescore"] for result in results] == [0, 100]
+    assert results[1]["recall@5"] >= results[0]["recall@5"]
+    assert results[1]["recall@5"] > 0.95
@@ -0,0 +1,63 @@
+import random
+
+from dataset.screening import ReferenceScreener
+
+
+def found(matches):
+    return sorted((match.kind, match.doi, match.start, match.end) for match in matches)
+
+
+def test_overlapping_and_nested_titles_are_all_reported():
+    screener = ReferenceScreener.from_records([
+        ("10.1000/a", "deep learning for protein folding", 8),
+        ("10.1000/b", "protein folding in the cell", "Plagiarism"),
+        ("10.1000/c", "learning for protein folding", None),
+    ], min_title_words=4)
+    text = "As shown in Deep learning for protein folding in the cell, ..."
+
+    matches = screener.screen([text])
+
+    start = text.index("Deep")
+    assert found(matches) == sorted([
+        ("title", "10.1000/a", start, text.index(" in the")),
+        ("title", "10.1000/c", text.index("learning"), text.index(" in the")),
+        ("title", "10.1000/b", text.index("protein"), text.index(", ...")),
+    ])
+    assert {match.doi: match.reason for match in matches} == {"10.1000/a": 8, "10.1000/b": 8, "10.1000/c": 0}
+
+
+def test_dois_and_titles_across_page_boundaries():
+    screener = ReferenceScreener.from_records([("10.1234/xyz.9", "A study of retracted results", 3)])
+    pages = ["see https://doi.org/10.1234/XYZ.9). Also A study of", "retracted results here"]
+
+    matches = screener.screen(pages)
+
+    assert [(match.kind, match.segment) for match in matches] == [("doi", 0), ("title", 1)]
+    joined = "\n".join(pages)
+    assert joined[matches[0].start:matches[0].end] == "10.1234/XYZ.9"
+    assert joined[matches[1].start:matches[1].end] == "A study of\nretracted results"
+
+
+def test_matches_agree_with_a_naive_scan_and_survive_rebuilds():
+    rng = random.Random(7)
+    words = ["alpha", "beta", "gamma", "delta"]
+    titles = {" ".join(rng.choice(words) for _ in range(rng.randint(2, 4))) for _ in range(30)}
+    screener = ReferenceScreener(min_title_words=2)
+    titles = sorted(titles)
+    for number, title in enumerate(titles[:15]):
+        screener.add(f"10.1000/{number}", title)
+    screener.build()
+    for number, title in enumerate(titles[15:], start=15):
+        screener.add(f"10.1000/{number}", title)
+    tokens = [rng.choice(words) for _ in range(300)]
+
+    matches = screener.screen([" ".join(tokens)])
+
+    expected = set()
+    for number, title in enumerate(titles):
+        pattern = title.split()
+        for position in range(len(tokens) - len(pattern) + 1):
+            if tokens[position:position + len(pattern)] == pattern:
+                expected.add((f"10.1000/{number}", position))
+    starts = {sum(len(token) + 1 for token in tokens[:position]): position for position in range(len(tokens))}
+    assert {(match.doi, starts[match.start]) for match in matches} == expected
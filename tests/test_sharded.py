@@ -0,0 +1,89 @@
+import multiprocessing
+import time
+
+import numpy as np
+import pytest
+
+from sharded import ShardedEmbeddingIndex, ShardedSearchService
+
+
+@pytest.fixture
+def index_path(tmp_path):
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(200, 16)).astype(np.float32)
+    ids = [f"paper-{i}" for i in range(len(vectors))]
+    ShardedEmbeddingIndex.build(str(tmp_path), ids, vectors, num_shards=4)
+    return str(tmp_path), ids, vectors
+
+
+@pytest.fixture
+def service(index_path):
+    path, _, _ = index_path
+    with ShardedSearchService(path, workers=2, timeout=20.0) as service:
+        yield service
+
+
+def brute_force(ids, vectors, query, top_k):
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    scores = normalized @ (query / np.linalg.norm(query))
+    return [ids[i] for i in np.argsort(-scores)[:top_k]]
+
+
+def test_search_matches_brute_force(index_path, service):
+    _, ids, vectors = index_path
+    queries = vectors[:3] + 0.1
+    results = service.search_many(queries, top_k=5)
+    for query, hits in zip(queries, results):
+        assert [doc_id for doc_id, _ in hits] == brute_force(ids, vectors, query, 5)
+
+
+def test_worker_error_is_raised_to_the_caller_and_service_survives(index_path, service):
+    _, ids, vectors = index_path
+    started = time.monotonic()
+    with pytest.raises(ValueError):
+        service.search(np.ones(7, dtype=np.float32))
+    assert time.monotonic() - started < 5
+    assert service.search(vectors[0], top_k=1)[0][0] == ids[0]
+
+
+def test_dead_worker_fails_fast(service):
+    service._processes[0].kill()
+    service._processes[0].join()
+    started = time.monotonic()
+    with pytest.raises(RuntimeError, match="not running"):
+        service.search(np.ones(16, dtype=np.float32))
+    assert time.monotonic() - started < 5
+
+
+def test_reload_after_add(index_path, service):
+    path, _, _ = index_path
+    index = ShardedEmbeddingIndex(path)
+    query = np.zeros(16, dtype=np.float32)
+    query[3] = 1.0
+    index.add(["new-paper"], query[None, :])
+    service.reload()
+    assert service.search(query, top_k=1)[0][0] == "new-paper"
+
+
+def test_add_writes_a_delta_segment_and_rebalance_folds_it(index_path):
+    path, ids, vectors = index_path
+    index = ShardedEmbeddingIndex(path, max_delta_size=3)
+    shard_names = [shard["name"] for shard in index.shards]
+
+    assert not index.add(["d1", "d2"], np.ones((2, 16), dtype=np.float32))
+    assert [shard["name"] for shard in index.shards] == shard_names
+    assert [segment["count"] for segment in index.delta] == [2]
+    assert len(index) == len(ids) + 2
+
+    assert index.add(["d3", "d4"], np.ones((2, 16), dtype=np.float32))
+    assert index.delta == []
+    assert len(index) == len(ids) + 4
+    assert sum(shard["count"] for shard in index.shards) == len(ids) + 4
+
+
+def test_start_timeout_stops_the_workers(index_path):
+    path, _, _ = index_path
+    service = ShardedSearchService(path, workers=2, timeout=0.01)
+    with pytest.raises(TimeoutError):
+        service.start()
+    assert not [child for child in multiprocessing.active_children() if child.name.startswith("shard-worker")]